@@ -0,0 +1,334 @@
+"""
+Benchmark /analytics: full-table aggregates vs. the rollup tables.
+
+Usage:
+    python analytics_bench.py --database-url postgresql://localhost/call_light_bench --rows 5000000
+
+Seeds `--rows` synthetic requests spread over `--days` (skipped with --reuse
+if the table already has at least that many), labels them (request_labels),
+rebuilds the rollups, then reports for each path the median of `--repeat` runs:
+    legacy      the six aggregate queries /analytics used to run on requests,
+                grouping labels by label_id (and once by user_input text)
+    rollup      analytics_rollup.summary()
+    page        GET /analytics through the Flask test client (rollup path)
+    filtered    GET /analytics for the last 7 days, cold and from analytics_cache
+    sketch      p50/p90/p99 from response_sketch over all time and the last
+                30 days, vs. exact percentile_cont over requests
+    write       log_request_to_db-style insert with vs. without rollup upkeep
+    columnar    building the columnar snapshot (columnar_analytics), refreshing
+                it after the write pass, and everything /analytics charts
+                (_analytics_data) per filter set from it vs. the rollups
+and checks that legacy and rollup agree, that sketch percentiles are
+within 1% of the exact ones and that the columnar snapshot charts exactly
+what the rollups do. Use a scratch database: seeding TRUNCATEs requests.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+import analytics_rollup
+import columnar_analytics
+import response_sketch
+
+BUTTON_LABELS = [
+    "I need ice chips", "I need ice water", "Diapers", "Wipes", "Pain", "Gas pain",
+    "My IV pump is beeping", "Blankets", "Pads", "Mesh underwear", "Breastfeeding help",
+    "Bathroom help", "Formula", "Pacifier", "Swaddle", "Tucks pads", "Dermoplast",
+]
+
+LEGACY_QUERIES = {
+    "avg_response": """
+        SELECT AVG(EXTRACT(EPOCH FROM (completion_timestamp - timestamp)))
+        FROM requests WHERE completion_timestamp IS NOT NULL;""",
+    "by_category": """
+        SELECT category, COUNT(id) FROM requests GROUP BY category ORDER BY COUNT(id) DESC;""",
+    "top_labels": """
+        SELECT label_id, COUNT(id) AS count FROM requests
+        GROUP BY label_id ORDER BY count DESC LIMIT 5;""",
+    "by_hour": """
+        SELECT EXTRACT(HOUR FROM timestamp) AS hour, COUNT(id) FROM requests GROUP BY hour ORDER BY hour;""",
+    "top_first_baby": """
+        SELECT label_id, COUNT(id) AS count FROM requests WHERE is_first_baby IS TRUE
+        GROUP BY label_id ORDER BY count DESC LIMIT 5;""",
+    "top_multi_baby": """
+        SELECT label_id, COUNT(id) AS count FROM requests WHERE is_first_baby IS FALSE
+        GROUP BY label_id ORDER BY count DESC LIMIT 5;""",
+}
+
+# What top_labels grouped on before request_labels
+TEXT_GROUP_QUERY = """
+    SELECT user_input, COUNT(id) AS count FROM requests
+    GROUP BY user_input ORDER BY count DESC LIMIT 5;"""
+
+
+def seed(engine, rows, days, note_ratio):
+    labels = "ARRAY[" + ", ".join("'" + label.replace("'", "''") + "'" for label in BUTTON_LABELS) + "]"
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        with connection.begin():
+            connection.execute(text("TRUNCATE requests RESTART IDENTITY;"))
+            connection.execute(text(f"""
+                INSERT INTO requests (request_id, timestamp, completion_timestamp, room, user_input,
+                                      category, reply, is_first_baby, tier)
+                SELECT 'bench_' || g,
+                       ts,
+                       CASE WHEN random() < 0.9 THEN ts + make_interval(secs => -240 * ln(1 - random())) END,
+                       (231 + (g % 29))::text,
+                       CASE WHEN random() < :note_ratio THEN 'Note ' || md5(g::text)
+                            ELSE ({labels})[1 + floor(power(random(), 2) * {len(BUTTON_LABELS)})::int] END,
+                       CASE WHEN random() < 0.6 THEN 'cna' ELSE 'nurse' END,
+                       'bench',
+                       CASE WHEN random() < 0.05 THEN NULL ELSE random() < 0.4 END,
+                       CASE WHEN random() < 0.1 THEN 'emergent' ELSE 'routine' END
+                FROM (
+                    SELECT g, now() - make_interval(secs => random() * :days * 86400) AS ts
+                    FROM generate_series(1, :rows) AS g
+                ) s;
+            """), {"rows": rows, "days": days, "note_ratio": note_ratio})
+        connection.execute(text("ANALYZE requests;"))
+    return time.perf_counter() - started
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def legacy(engine):
+    with engine.connect() as connection:
+        return {name: connection.execute(text(sql)).fetchall() for name, sql in LEGACY_QUERIES.items()}
+
+
+def one_query(engine, sql):
+    with engine.connect() as connection:
+        return connection.execute(text(sql)).fetchall()
+
+
+def rollup(engine):
+    with engine.connect() as connection:
+        return analytics_rollup.summary(connection)
+
+
+def compare(old, new):
+    """Legacy vs rollup results; returns a list of mismatches."""
+    problems = []
+    old_avg = old["avg_response"][0][0]
+    if (old_avg is None) != (new["avg_response_seconds"] is None) or (
+            old_avg is not None and abs(float(old_avg) - new["avg_response_seconds"]) > 0.01):
+        problems.append(f"avg response {old_avg} != {new['avg_response_seconds']}")
+    if {c: n for c, n in old["by_category"]} != dict(new["by_category"]):
+        problems.append("by_category differs")
+    if {int(h): n for h, n in old["by_hour"]} != new["by_hour"]:
+        problems.append("by_hour differs")
+    for legacy_key, rollup_key in (("top_labels", "top_labels"), ("top_first_baby", "top_first_baby"),
+                                   ("top_multi_baby", "top_multi_baby")):
+        # Ties may come back in a different order; the counts must match
+        if [n for _, n in old[legacy_key]] != [n for _, n in new[rollup_key]]:
+            problems.append(f"{legacy_key} counts differ")
+    return problems
+
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def exact_percentiles(engine, start, end):
+    with engine.connect() as connection:
+        row = connection.execute(text("""
+            SELECT percentile_cont(CAST(:qs AS DOUBLE PRECISION[])) WITHIN GROUP (
+                       ORDER BY EXTRACT(EPOCH FROM (completion_timestamp - timestamp)))
+            FROM requests
+            WHERE completion_timestamp IS NOT NULL
+              AND timestamp >= COALESCE(CAST(:start AS TIMESTAMPTZ), '-infinity')
+              AND timestamp < COALESCE(CAST(:end AS TIMESTAMPTZ), 'infinity');
+        """), {"qs": list(QUANTILES), "start": start, "end": end}).scalar()
+    return [float(v) for v in row]
+
+
+def sketch_percentiles(engine, start, end):
+    with engine.connect() as connection:
+        sketch = response_sketch.load(connection, start, end).get(())
+    return [sketch.quantile(q) for q in QUANTILES]
+
+
+def write_cost(engine, labeler, n):
+    """Per-request cost of the insert alone vs. insert + label lookup + rollup upkeep."""
+    results = {}
+    for with_rollup in (False, True):
+        started = time.perf_counter()
+        for i in range(n):
+            created_at = datetime.now(timezone.utc)
+            with engine.connect() as connection:
+                with connection.begin():
+                    label_id = labeler.label_id(connection, "Diapers") if with_rollup else None
+                    connection.execute(text("""
+                        INSERT INTO requests (request_id, timestamp, room, category, user_input, reply, is_first_baby,
+                                              label_id)
+                        VALUES (:request_id, :timestamp, '241', 'cna', 'Diapers', 'bench', TRUE, :label_id);
+                    """), {"request_id": f"write_{with_rollup}_{i}_{time.time_ns()}", "timestamp": created_at,
+                           "label_id": label_id})
+                    if with_rollup:
+                        analytics_rollup.record_request(connection, created_at, "cna", label_id, True)
+        results["insert_plus_rollup_ms" if with_rollup else "insert_only_ms"] = \
+            round((time.perf_counter() - started) * 1000 / n, 3)
+    # Keep the rollups consistent with the extra insert-only rows
+    with engine.connect() as connection:
+        with connection.begin():
+            labeler.backfill(connection)
+            analytics_rollup.rebuild(connection)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--note-ratio", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--reuse", action="store_true", help="keep existing rows if there are enough")
+    parser.add_argument("--snapshot-dir", default=os.path.join(tempfile.gettempdir(), "calllight_analytics_bench"),
+                        help="where to build the columnar snapshot (deleted first)")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url (or BENCH_DATABASE_URL) is required; use a scratch Postgres database")
+
+    # app.py reads DATABASE_URL at import time and creates the tables
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+
+    engine = create_engine(args.database_url)
+    with engine.connect() as connection:
+        existing = connection.execute(text("SELECT COUNT(*) FROM requests;")).scalar()
+    if args.reuse and existing >= args.rows:
+        print(f"Reusing {existing} existing requests")
+    else:
+        print(f"Seeding {args.rows} requests over {args.days} days...")
+        print(f"  seeded in {seed(engine, args.rows, args.days, args.note_ratio):.1f}s")
+
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        with connection.begin():
+            labeled = app_module.request_labeler.backfill(connection)
+        labels = connection.execute(text("SELECT COUNT(*) FROM request_labels;")).scalar()
+    print(f"Label backfill: {time.perf_counter() - started:.1f}s ({labeled} requests labeled, {labels} labels)")
+
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        with connection.begin():
+            analytics_rollup.rebuild(connection)
+        sizes = connection.execute(text("""
+            SELECT (SELECT COUNT(*) FROM requests),
+                   (SELECT COUNT(*) FROM request_rollup_hourly),
+                   (SELECT COUNT(*) FROM request_rollup_shift_label);
+        """)).one()
+    print(f"Rollup rebuild: {time.perf_counter() - started:.1f}s "
+          f"(requests={sizes[0]}, hourly rows={sizes[1]}, shift label rows={sizes[2]})")
+
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        with connection.begin():
+            response_sketch.rebuild(connection)
+        sketch_rows = connection.execute(text("SELECT COUNT(*) FROM response_sketches;")).scalar()
+    print(f"Sketch rebuild: {time.perf_counter() - started:.1f}s ({sketch_rows} sketch rows)")
+
+    client = app_module.app.test_client()
+    legacy_ms, old = timed(lambda: legacy(engine), args.repeat)
+    text_ms, _ = timed(lambda: one_query(engine, TEXT_GROUP_QUERY), args.repeat)
+    label_ms, _ = timed(lambda: one_query(engine, LEGACY_QUERIES["top_labels"]), args.repeat)
+    rollup_ms, new = timed(lambda: rollup(engine), args.repeat)
+
+    def uncached(path):
+        app_module.analytics_cache.clear()
+        return client.get(path)
+
+    page_ms, response = timed(lambda: uncached("/analytics"), args.repeat)
+    week = f"/analytics?start={date.today() - timedelta(days=6)}&end={date.today()}"
+    filtered_ms, _ = timed(lambda: uncached(week), args.repeat)
+    cached_ms, _ = timed(lambda: client.get(week), args.repeat)
+
+    print(f"\n{'path':10s} {'median ms':>10s}")
+    print(f"{'legacy':10s} {legacy_ms:10.1f}")
+    print(f"{'by text':10s} {text_ms:10.1f}   (top labels, full scan GROUP BY user_input)")
+    print(f"{'by id':10s} {label_ms:10.1f}   (top labels, full scan GROUP BY label_id)")
+    print(f"{'rollup':10s} {rollup_ms:10.1f}")
+    print(f"{'page':10s} {page_ms:10.1f}   (HTTP {response.status_code})")
+    print(f"{'filtered':10s} {filtered_ms:10.1f}   (last 7 days)")
+    print(f"{'cached':10s} {cached_ms:10.1f}   ({app_module.analytics_cache.stats()['hit_rate']} hit rate)")
+    print(f"speedup    {legacy_ms / rollup_ms:10.1f}x")
+
+    # Whole hours, so the exact query covers the same window as the sketches
+    with engine.connect() as connection:
+        now_hour, month_ago = connection.execute(text(
+            "SELECT date_trunc('hour', now()), date_trunc('day', now() - INTERVAL '30 days');"
+        )).one()
+    sketch_errors = []
+    print(f"\n{'window':10s} {'path':8s} {'ms':>8s}   " + "  ".join(f"p{round(q * 100):<8d}" for q in QUANTILES))
+    for window, start, end in (("all", None, None), ("30 days", month_ago, now_hour)):
+        exact_ms, exact = timed(lambda: exact_percentiles(engine, start, end), args.repeat)
+        sketch_ms, approx = timed(lambda: sketch_percentiles(engine, start, end), args.repeat)
+        print(f"{window:10s} {'exact':8s} {exact_ms:8.1f}   " + "  ".join(f"{v:<9.1f}" for v in exact))
+        print(f"{'':10s} {'sketch':8s} {sketch_ms:8.1f}   " + "  ".join(f"{v:<9.1f}" for v in approx))
+        sketch_errors += [abs(a - e) / e for a, e in zip(approx, exact) if e]
+
+    shutil.rmtree(args.snapshot_dir, ignore_errors=True)
+    snapshot = columnar_analytics.ColumnarAnalytics(engine, args.snapshot_dir)
+    built = snapshot.refresh()
+    print(f"\nColumnar snapshot: built {built['rows']} rows in {built['ms'] / 1000:.1f}s "
+          f"({snapshot.stats()['bytes'] / 1e6:.0f} MB)")
+
+    print(f"\nWrite path over {args.writes} requests: {write_cost(engine, app_module.request_labeler, args.writes)}")
+    refreshed = snapshot.refresh()
+    print(f"Columnar refresh after the writes: {refreshed['mode']}, {refreshed['appended']} appended, "
+          f"{refreshed['updated']} updated in {refreshed['ms']:.1f} ms")
+
+    today = date.today()
+    filter_sets = (
+        ("all time", (None, None, None, None)),
+        ("last 7 days", (today - timedelta(days=6), today, None, None)),
+        ("last night", (today - timedelta(days=1), today - timedelta(days=1), None, "night")),
+        ("cna", (None, None, "cna", None)),
+        ("night", (None, None, None, "night")),
+        ("30d nurse day", (today - timedelta(days=29), today, "nurse", "day")),
+    )
+    columnar_problems = []
+    print(f"\n{'filters':14s} {'sql ms':>8s} {'columnar ms':>12s}   same")
+    for name, filters in filter_sets:
+        sql_ms, sql_data = timed(lambda: app_module._analytics_data(*filters), args.repeat)
+        col_ms, col_data = timed(lambda: app_module._analytics_data(*filters, snapshot=snapshot), args.repeat)
+        same = sql_data == col_data
+        if not same:
+            columnar_problems.append(name)
+            for key in sql_data:
+                if sql_data[key] != col_data[key]:
+                    print(f"    {key}: sql={sql_data[key]!r} columnar={col_data[key]!r}")
+        print(f"{name:14s} {sql_ms:8.1f} {col_ms:12.1f}   {'yes' if same else 'NO'}")
+
+    problems = compare(old, new)
+    if columnar_problems:
+        problems.append("columnar charts differ for " + ", ".join(columnar_problems))
+    if sketch_errors and max(sketch_errors) > response_sketch.RELATIVE_ACCURACY:
+        problems.append(f"sketch percentile off by {max(sketch_errors):.2%}")
+    if problems:
+        print("\nMISMATCH: " + "; ".join(problems))
+        raise SystemExit(1)
+    print("\nLegacy, rollup and columnar results agree; sketch percentiles within "
+          f"{max(sketch_errors, default=0):.2%} of exact.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Rollup tables behind /analytics.
+
+Instead of aggregating the whole requests table on every page view, small
+tables are kept up to date as requests are written (in a transaction of
+their own, right after the request's; see app._update_analytics):
+
+    request_rollup_hourly        (bucket_hour, category)
+        request_count, completed_count, response_seconds_sum
+    request_rollup_shift_label   (shift_date, shift, category, label_id)
+        request_count, first_baby_count, multi_baby_count
+    request_rollup_label         (label_id)  all-time totals of the above
+
+Labels are request_labels ids (see request_labels.py): button labels in
+English, free-text notes bucketed by triage pattern. The unfiltered top-5
+lists read the all-time table through its count indexes; filtered ones group
+the shift_label rows of the selected dates. Names are joined in last.
+
+Hours and days are cut in the database session time zone, the same way the
+old EXTRACT(HOUR FROM timestamp) query did. Shifts follow _infer_shift_now:
+'day' is 07:00-18:59, 'night' the rest, and a night shift belongs to the date
+it started on (SHIFT_DATE_SQL), so "last night" is one shift_date. Response
+time is attributed to the hour the request was created.
+
+rebuild() recomputes all three tables from requests (first deploy, or after a
+bulk import); it is idempotent. Requests without a timestamp are not counted.
+Call lights imported from the old CSV logs (legacy_requests rows with a role,
+see legacy_import.py) are counted too, as never completed; they only change
+through an import, which rebuilds.
+"""
+
+from sqlalchemy import text
+
+from request_labels import UNKNOWN_LABEL_ID_SQL
+
+UNKNOWN_CATEGORY = "unknown"
+
+SHIFTS = ("day", "night")
+
+CATEGORY_SQL = f"COALESCE({{col}}, '{UNKNOWN_CATEGORY}')"
+SHIFT_SQL = "CASE WHEN EXTRACT(HOUR FROM {col}) BETWEEN 7 AND 18 THEN 'day' ELSE 'night' END"
+SHIFT_DATE_SQL = "CAST({col} - INTERVAL '7 hours' AS DATE)"
+
+LABEL_COUNT_COLUMNS = ("request_count", "first_baby_count", "multi_baby_count")
+
+# Everything rebuild() counts: live requests plus imported legacy call lights
+_REBUILD_SOURCE_SQL = """
+    SELECT timestamp, category, label_id, is_first_baby, completion_timestamp
+    FROM requests
+    WHERE timestamp IS NOT NULL
+    UNION ALL
+    SELECT timestamp, role, label_id, NULL, NULL
+    FROM legacy_requests
+    WHERE role IS NOT NULL
+"""
+
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS request_rollup_hourly (
+            bucket_hour TIMESTAMPTZ NOT NULL,
+            category VARCHAR(255) NOT NULL,
+            request_count INTEGER NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            response_seconds_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket_hour, category)
+        );
+    """))
+    # Superseded by request_rollup_shift_label; rebuild_if_empty() refills it from requests
+    connection.execute(text("DROP TABLE IF EXISTS request_rollup_daily_label;"))
+    # Label tables from before request_labels were keyed by the label text
+    keyed_by_text = connection.execute(text("""
+        SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'request_rollup_shift_label' AND column_name = 'label');
+    """)).scalar()
+    if keyed_by_text:
+        connection.execute(text("DROP TABLE request_rollup_shift_label;"))
+        connection.execute(text("DROP TABLE IF EXISTS request_rollup_label;"))
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS request_rollup_shift_label (
+            shift_date DATE NOT NULL,
+            shift VARCHAR(10) NOT NULL,
+            category VARCHAR(255) NOT NULL,
+            label_id INTEGER NOT NULL,
+            request_count INTEGER NOT NULL DEFAULT 0,
+            first_baby_count INTEGER NOT NULL DEFAULT 0,
+            multi_baby_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (shift_date, shift, category, label_id)
+        );
+    """))
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS request_rollup_label (
+            label_id INTEGER PRIMARY KEY,
+            request_count INTEGER NOT NULL DEFAULT 0,
+            first_baby_count INTEGER NOT NULL DEFAULT 0,
+            multi_baby_count INTEGER NOT NULL DEFAULT 0
+        );
+    """))
+    for column in LABEL_COUNT_COLUMNS:
+        connection.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS request_rollup_label_{column}_idx
+            ON request_rollup_label ({column} DESC, label_id);
+        """))
+
+
+# --- incremental maintenance (call once the request write has committed) ---
+
+def _baby_counts(is_first_baby, n=1):
+    return {"first": n if is_first_baby is True else 0, "multi": n if is_first_baby is False else 0}
+
+
+def _add_shift_label(connection, created_at, category, label_id, is_first_baby, n):
+    connection.execute(text(f"""
+        INSERT INTO request_rollup_shift_label
+            (shift_date, shift, category, label_id, request_count, first_baby_count, multi_baby_count)
+        VALUES ({SHIFT_DATE_SQL.format(col='CAST(:created_at AS TIMESTAMPTZ)')},
+                {SHIFT_SQL.format(col='CAST(:created_at AS TIMESTAMPTZ)')},
+                {CATEGORY_SQL.format(col=':category')}, COALESCE(:label_id, {UNKNOWN_LABEL_ID_SQL}),
+                :n, :first, :multi)
+        ON CONFLICT (shift_date, shift, category, label_id)
+        DO UPDATE SET request_count = request_rollup_shift_label.request_count + EXCLUDED.request_count,
+                      first_baby_count = request_rollup_shift_label.first_baby_count + EXCLUDED.first_baby_count,
+                      multi_baby_count = request_rollup_shift_label.multi_baby_count + EXCLUDED.multi_baby_count;
+    """), {"created_at": created_at, "category": category, "label_id": label_id, "n": n,
+           **_baby_counts(is_first_baby, n)})
+
+
+def record_request(connection, created_at, category, label_id, is_first_baby):
+    """Count a newly inserted request (label_id from RequestLabeler.label_id)."""
+    _add_hourly(connection, created_at, category, 1, 0, 0.0)
+    _add_shift_label(connection, created_at, category, label_id, is_first_baby, 1)
+    connection.execute(text(f"""
+        INSERT INTO request_rollup_label (label_id, request_count, first_baby_count, multi_baby_count)
+        VALUES (COALESCE(:label_id, {UNKNOWN_LABEL_ID_SQL}), 1, :first, :multi)
+        ON CONFLICT (label_id)
+        DO UPDATE SET request_count = request_rollup_label.request_count + 1,
+                      first_baby_count = request_rollup_label.first_baby_count + EXCLUDED.first_baby_count,
+                      multi_baby_count = request_rollup_label.multi_baby_count + EXCLUDED.multi_baby_count;
+    """), {"label_id": label_id, **_baby_counts(is_first_baby)})
+
+
+def _add_hourly(connection, created_at, category, requests, completed, seconds):
+    connection.execute(text(f"""
+        INSERT INTO request_rollup_hourly (bucket_hour, category, request_count, completed_count, response_seconds_sum)
+        VALUES (date_trunc('hour', CAST(:created_at AS TIMESTAMPTZ)), {CATEGORY_SQL.format(col=':category')},
+                :requests, :completed, :seconds)
+        ON CONFLICT (bucket_hour, category)
+        DO UPDATE SET request_count = request_rollup_hourly.request_count + EXCLUDED.request_count,
+                      completed_count = request_rollup_hourly.completed_count + EXCLUDED.completed_count,
+                      response_seconds_sum = request_rollup_hourly.response_seconds_sum + EXCLUDED.response_seconds_sum;
+    """), {"created_at": created_at, "category": category,
+           "requests": requests, "completed": completed, "seconds": seconds})
+
+
+def record_completion(connection, created_at, category, completed_at):
+    """Count the first completion of a request (pass the values RETURNING gave you)."""
+    if created_at is None or completed_at is None:
+        return
+    _add_hourly(connection, created_at, category, 0, 1, (completed_at - created_at).total_seconds())
+
+
+def record_category_change(connection, created_at, old_category, new_category, label_id, is_first_baby,
+                           completed_at=None):
+    """Move a request (and its response time, if completed) to another category."""
+    if created_at is None or (old_category or UNKNOWN_CATEGORY) == (new_category or UNKNOWN_CATEGORY):
+        return
+    done = completed_at is not None
+    seconds = (completed_at - created_at).total_seconds() if done else 0.0
+    _add_hourly(connection, created_at, old_category, -1, -int(done), -seconds)
+    _add_hourly(connection, created_at, new_category, 1, int(done), seconds)
+    _add_shift_label(connection, created_at, old_category, label_id, is_first_baby, -1)
+    _add_shift_label(connection, created_at, new_category, label_id, is_first_baby, 1)
+
+
+# --- full recompute ---
+
+def rebuild(connection):
+    """Recompute the rollups from requests (label them first: RequestLabeler.backfill). Call inside a transaction."""
+    # Hold off writers so no request is counted twice or missed
+    connection.execute(text("LOCK TABLE requests IN SHARE MODE;"))
+    connection.execute(text("DELETE FROM request_rollup_hourly;"))
+    connection.execute(text("DELETE FROM request_rollup_shift_label;"))
+    connection.execute(text("DELETE FROM request_rollup_label;"))
+    connection.execute(text(f"""
+        INSERT INTO request_rollup_hourly (bucket_hour, category, request_count, completed_count, response_seconds_sum)
+        SELECT date_trunc('hour', timestamp), {CATEGORY_SQL.format(col='category')},
+               COUNT(*), COUNT(completion_timestamp),
+               COALESCE(SUM(EXTRACT(EPOCH FROM (completion_timestamp - timestamp))), 0)
+        FROM ({_REBUILD_SOURCE_SQL}) AS source
+        GROUP BY 1, 2;
+    """))
+    connection.execute(text(f"""
+        INSERT INTO request_rollup_shift_label
+            (shift_date, shift, category, label_id, request_count, first_baby_count, multi_baby_count)
+        SELECT {SHIFT_DATE_SQL.format(col='timestamp')}, {SHIFT_SQL.format(col='timestamp')},
+               {CATEGORY_SQL.format(col='category')}, COALESCE(label_id, {UNKNOWN_LABEL_ID_SQL}),
+               COUNT(*),
+               COUNT(*) FILTER (WHERE is_first_baby IS TRUE),
+               COUNT(*) FILTER (WHERE is_first_baby IS FALSE)
+        FROM ({_REBUILD_SOURCE_SQL}) AS source
+        GROUP BY 1, 2, 3, 4;
+    """))
+    connection.execute(text("""
+        INSERT INTO request_rollup_label (label_id, request_count, first_baby_count, multi_baby_count)
+        SELECT label_id, SUM(request_count), SUM(first_baby_count), SUM(multi_baby_count)
+        FROM request_rollup_shift_label
+        GROUP BY label_id;
+    """))
+
+
+def rebuild_if_empty(connection):
+    """Backfill on first start against a database that already has requests."""
+    has_rollups = connection.execute(text("""
+        SELECT EXISTS (SELECT 1 FROM request_rollup_hourly)
+           AND EXISTS (SELECT 1 FROM request_rollup_shift_label);
+    """)).scalar()
+    has_requests = connection.execute(text("SELECT EXISTS (SELECT 1 FROM requests);")).scalar()
+    if has_requests and not has_rollups:
+        print("Backfilling analytics rollups from requests...")
+        rebuild(connection)
+        return True
+    return False
+
+
+# --- reads for /analytics ---
+
+def shift_window(connection, start_date=None, end_date=None):
+    """[start, end) timestamps covering the shifts of start_date..end_date (None = open)."""
+    if start_date is None and end_date is None:
+        return None, None
+    # Inverse of SHIFT_DATE_SQL: shift date d runs from d 07:00 to d+1 07:00
+    return tuple(connection.execute(text("""
+        SELECT CAST(CAST(:start_date AS DATE) + INTERVAL '7 hours' AS TIMESTAMPTZ),
+               CAST(CAST(:end_date AS DATE) + 1 + INTERVAL '7 hours' AS TIMESTAMPTZ);
+    """), {"start_date": start_date, "end_date": end_date}).one())
+
+
+def summary(connection, start_date=None, end_date=None, role=None, shift=None, top_n=5):
+    """
+    Everything the analytics page shows, read from the rollups only.
+    start_date/end_date are shift dates (inclusive), role a category, shift 'day' or 'night'.
+    """
+    start, end = shift_window(connection, start_date, end_date)
+    params = {"start": start, "end": end, "start_date": start_date, "end_date": end_date,
+              "role": role, "shift": shift, "top_n": top_n}
+    hourly_filters = []
+    label_filters = []
+    if start is not None:
+        hourly_filters.append("bucket_hour >= :start")
+        label_filters.append("shift_date >= :start_date")
+    if end is not None:
+        hourly_filters.append("bucket_hour < :end")
+        label_filters.append("shift_date <= :end_date")
+    if role is not None:
+        hourly_filters.append("category = :role")
+        label_filters.append("category = :role")
+    if shift is not None:
+        hourly_filters.append(f"{SHIFT_SQL.format(col='bucket_hour')} = :shift")
+        label_filters.append("shift = :shift")
+    hourly_where = ("WHERE " + " AND ".join(hourly_filters)) if hourly_filters else ""
+
+    by_category = connection.execute(text(f"""
+        SELECT category, SUM(request_count), SUM(completed_count), SUM(response_seconds_sum)
+        FROM request_rollup_hourly
+        {hourly_where}
+        GROUP BY category;
+    """), params).fetchall()
+    completed = sum(row[2] for row in by_category)
+    seconds = sum(row[3] for row in by_category)
+
+    by_hour = connection.execute(text(f"""
+        SELECT EXTRACT(HOUR FROM bucket_hour) AS hour, SUM(request_count)
+        FROM request_rollup_hourly
+        {hourly_where}
+        GROUP BY hour;
+    """), params).fetchall()
+
+    top = {column: [] for column in LABEL_COUNT_COLUMNS}
+    if label_filters:
+        # Sum the selected shifts once, then take the top of each count
+        picks = " UNION ALL ".join(f"""
+            (SELECT '{column}', label_id, {column} FROM totals WHERE {column} > 0
+             ORDER BY {column} DESC, label_id LIMIT :top_n)""" for column in LABEL_COUNT_COLUMNS)
+        rows = connection.execute(text(f"""
+            WITH totals AS (
+                SELECT label_id, SUM(request_count) AS request_count,
+                       SUM(first_baby_count) AS first_baby_count, SUM(multi_baby_count) AS multi_baby_count
+                FROM request_rollup_shift_label
+                WHERE {" AND ".join(label_filters)}
+                GROUP BY label_id
+            ),
+            picks AS ({picks})
+            SELECT picks.*, l.label FROM picks JOIN request_labels l ON l.id = picks.label_id;
+        """), params).fetchall()
+        for column, _, n, label in rows:
+            top[column].append((label, int(n)))
+    else:
+        for column in LABEL_COUNT_COLUMNS:
+            # Served by request_rollup_label_<column>_idx
+            top[column] = [(row[0], row[1]) for row in connection.execute(text(f"""
+                SELECT l.label, t.{column}
+                FROM (
+                    SELECT label_id, {column}
+                    FROM request_rollup_label
+                    WHERE {column} > 0
+                    ORDER BY {column} DESC, label_id
+                    LIMIT :top_n
+                ) t
+                JOIN request_labels l ON l.id = t.label_id;
+            """), params)]
+    for column in LABEL_COUNT_COLUMNS:
+        top[column].sort(key=lambda item: (-item[1], item[0]))
+
+    return {
+        "avg_response_seconds": seconds / completed if completed else None,
+        "by_category": sorted(((row[0], int(row[1])) for row in by_category if row[1] > 0),
+                              key=lambda item: (-item[1], item[0])),
+        "by_hour": {int(hour): int(n) for hour, n in by_hour if n},
+        "top_labels": top["request_count"],
+        "top_first_baby": top["first_baby_count"],
+        "top_multi_baby": top["multi_baby_count"],
+    }
+
+
+def categories(connection):
+    """Roles that have any requests, for the filter drop-down."""
+    return [row[0] for row in connection.execute(text("""
+        SELECT DISTINCT category FROM request_rollup_hourly ORDER BY category;
+    """))]
@@ -2,19 +2,47 @@ import eventlet
 eventlet.monkey_patch()
 
 import os
+import hmac
 import json
+import secrets
 import smtplib
-import importlib
+import tempfile
+import importlib.util
 
-from datetime import datetime, date, time, timezone
+from datetime import datetime, date, time, timedelta, timezone
+from time import perf_counter
 from email.message import EmailMessage
 
-from flask import Flask, render_template, request, session, redirect, url_for, flash, jsonify, abort
+from flask import Flask, Response, render_template, request, session, redirect, url_for, flash, jsonify, abort
 from flask_socketio import SocketIO, join_room
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import ProgrammingError
 from werkzeug.security import generate_password_hash, check_password_hash
 from triage_engine import TriageEngine
+from translations import to_english_label
+import analytics_rollup
+import button_flow
+import button_registry
+import chat_page
+import columnar_analytics
+import compact_events
+import data_export
+import education_index
+import idempotency
+import legacy_import
+import rate_limit
+import request_coalescing
+import request_labels
+import response_sketch
+import session_store
+import shift_reports
+import staff_workload
+import translations
+from emit_queue import EmitQueue
+from metrics import latency
+from patient_presence import PatientPresence
+from ttl_cache import TTLCache
+from unit_census import UnitCensus
 
 
 # --- App Configuration ---
@@ -24,6 +52,9 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY", "a-strong-fallback-secret-key-for
 # Initialize the Triage Engine here
 triage = TriageEngine()
 
+# user_input -> request_labels id (button label, or triage bucket for notes) for analytics
+request_labeler = request_labels.RequestLabeler(triage.classify)
+
 socketio = SocketIO(
     app,
     async_mode='eventlet',
@@ -33,6 +64,23 @@ socketio = SocketIO(
     ping_interval=25   # was 10
 )
 
+def _send_dashboard_event(sid, event, payload, ack):
+    socketio.emit(event, payload, to=sid, callback=ack)
+
+# Opt-in compact-v1 dashboard protocol (short keys + batched frames)
+DASHBOARD_COMPACT_PROTOCOL = os.getenv("DASHBOARD_COMPACT_PROTOCOL", "0") == "1"
+
+# Dashboard fan-out goes through per-client bounded queues (see emit_queue.py)
+dashboard_events = EmitQueue(
+    send=_send_dashboard_event,
+    spawn=socketio.start_background_task,
+    max_pending=int(os.getenv("DASHBOARD_MAX_PENDING", "200")),
+    max_in_flight=int(os.getenv("DASHBOARD_MAX_IN_FLIGHT", "8")),
+    batch_encoder=compact_events.encode_batch if DASHBOARD_COMPACT_PROTOCOL else None,
+    batch_event=compact_events.BATCH_EVENT,
+    batch_window=float(os.getenv("DASHBOARD_BATCH_WINDOW_MS", "50")) / 1000,
+)
+
 @app.after_request
 def add_no_cache_headers(response):
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
@@ -50,6 +98,21 @@ if not DATABASE_URL:
 engine = create_engine(DATABASE_URL, pool_recycle=280, pool_pre_ping=True)
 
 # --- Database Setup ---
+def _setup_tables(what, *steps):
+    """Run each step(connection) in one transaction of its own; a failure is logged, not raised."""
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                for step in steps:
+                    step(connection)
+    except Exception as e:
+        print(f"ERROR setting up {what}: {e}")
+
+def _backfill_request_labels(connection):
+    labeled = sum(request_labeler.backfill(connection, table) for table in ("requests", "legacy_requests"))
+    if labeled:
+        print(f"Request labels: labeled {labeled} rows.")
+
 def setup_database():
     try:
         with engine.connect() as connection:
@@ -68,7 +131,8 @@ def setup_database():
                         user_input TEXT,
                         category VARCHAR(255),
                         reply TEXT,
-                        is_first_baby BOOLEAN
+                        is_first_baby BOOLEAN,
+                        tier VARCHAR(20)
                     );
                 """))
 
@@ -218,9 +282,31 @@ def setup_database():
                         ALTER TABLE requests
                         ADD COLUMN IF NOT EXISTS deferral_timestamp TIMESTAMPTZ;
                     """))
+                    # Escalation tier at creation ('emergent' | 'routine'), for response-time sketches
+                    connection.execute(text("""
+                        ALTER TABLE requests
+                        ADD COLUMN IF NOT EXISTS tier VARCHAR(20);
+                    """))
         except Exception:
             pass
 
+        # Columns the request INSERT writes, before anything optional can fail
+        _setup_tables("request labels", legacy_import.ensure_tables, request_labels.ensure_tables)
+        _setup_tables("idempotency keys", idempotency.ensure_tables)
+        _setup_tables("repeat counts", request_coalescing.ensure_tables)
+
+        # Analytics, one module at a time (rollups backfilled once from existing requests):
+        # a module that fails leaves its feature stale, not the others or request logging
+        _setup_tables("request label backfill", _backfill_request_labels)
+        _setup_tables("analytics rollups", analytics_rollup.ensure_tables, analytics_rollup.rebuild_if_empty)
+        _setup_tables("response-time sketches", response_sketch.ensure_tables, response_sketch.rebuild_if_empty)
+        _setup_tables("shift reports", shift_reports.ensure_tables)
+        _setup_tables("columnar analytics", columnar_analytics.ensure_tables)
+        _setup_tables("staff workload", staff_workload.ensure_tables)
+
+        _setup_tables("session table", session_store.ensure_tables)
+        _setup_tables("rate limit table", rate_limit.ensure_tables)
+
         print("Database setup complete. Tables are ready.")
     except Exception as e:
         print(f"CRITICAL ERROR during database setup: {e}")
@@ -243,129 +329,116 @@ def load_rooms_from_db():
 # Initialize the global variables the rest of the app expects
 ALL_ROOMS = load_rooms_from_db()
 VALID_ROOMS = set(ALL_ROOMS)
+CNA_FRONT_ROOMS = staff_workload.cna_front_rooms(ALL_ROOMS)
+
+# Attribute any requests written while the app was down (or before the table existed)
+try:
+    with engine.connect() as connection:
+        with connection.begin():
+            added = staff_workload.refresh(connection, CNA_FRONT_ROOMS)
+    if added:
+        print(f"Staff workload: attributed {added} requests.")
+except Exception as e:
+    print(f"ERROR refreshing staff workload: {e}")
+
+# Open requests by role/tier/age for /metrics/unit; kept current by the request handlers
+unit_census = UnitCensus(sla_seconds={
+    "emergent": int(os.getenv("UNIT_SLA_EMERGENT_SECONDS", "120")),
+    "routine": int(os.getenv("UNIT_SLA_ROUTINE_SECONDS", "600")),
+})
+try:
+    with engine.connect() as connection:
+        unit_census.load(connection.execute(text("""
+            SELECT COALESCE(request_id, CAST(id AS VARCHAR)), category, tier, room, timestamp
+            FROM requests
+            WHERE completion_timestamp IS NULL
+            ORDER BY timestamp;
+        """)))
+except Exception as e:
+    print(f"ERROR loading unit census: {e}")
+
+# Open (room, label) pairs, so repeat presses bump the open request instead of adding rows
+open_requests = request_coalescing.OpenRequestIndex(
+    window=float(os.getenv("REQUEST_COALESCE_SECONDS", str(request_coalescing.DEFAULT_WINDOW_SECONDS))),
+)
+try:
+    with engine.connect() as connection:
+        open_requests.load(connection.execute(text("""
+            SELECT request_id, room, user_input, timestamp, repeat_count
+            FROM requests
+            WHERE completion_timestamp IS NULL
+            ORDER BY timestamp;
+        """)))
+except Exception as e:
+    print(f"ERROR loading open requests for coalescing: {e}")
+
+# Shift summaries written after each 07:00 / 19:00 boundary (catches up on start)
+shift_report_scheduler = shift_reports.ShiftReportScheduler(
+    engine,
+    sleep=socketio.sleep,
+    catch_up_days=int(os.getenv("SHIFT_REPORT_CATCH_UP_DAYS", "14")),
+    delay_seconds=int(os.getenv("SHIFT_REPORT_DELAY_SECONDS", "300")),
+)
+if os.getenv("SHIFT_REPORTS_ENABLED", "1") == "1":
+    socketio.start_background_task(shift_report_scheduler.run_forever)
 
 print(f"System loaded {len(ALL_ROOMS)} rooms from the database.")
 
-# --- Localized label -> English maps for structured buttons ---
-ES_TO_EN = {
-    "Tengo una emergencia": "I'm having an emergency",
-    "Necesito suministros": "I need supplies",
-    "Necesito medicamentos": "I need medication",
-    "Mi bomba de IV está sonando": "My IV pump is beeping",
-    "Tengo preguntas": "I have questions",
-    "Quiero saber sobre el alta": "I want to know about going home",
-    "Baño / Ducha": "Bathroom/Shower",
-    "Necesito ayuda para amamantar": "I need help breastfeeding",
-    "Azúcar en la sangre": "Blood sugar",
-    "Hielo / Agua": "Ice Chips/Water",
-
-    "Mamá (azúcar en la sangre)": "Mom (blood sugar)",
-    "Bebé (azúcar en la sangre)": "Baby (blood sugar)",
-
-    "Necesito agua con hielo": "I need ice water",
-    "Necesito hielo picado": "I need ice chips",
-    "Necesito agua, sin hielo": "I need water, no ice",
-    "Necesito agua caliente": "I need hot water",
-
-    "Necesito ayuda para ir al baño": "I need help to the bathroom",
-    "Necesito cubrir mi vía IV para bañarme": "I need my IV covered to shower",
-    "¿Puedo tomar una ducha?": "Can I take a shower?",
-
-    "Artículos para bebé": "Baby items",
-    "Artículos para mamá": "Mom items",
-    "Pañales": "Diapers",
-    "Fórmula": "Formula",
-    "Manta para envolver": "Swaddle",
-    "Toallitas húmedas": "Wipes",
-    "Toallas sanitarias": "Pads",
-    "Ropa interior de malla": "Mesh underwear",
-    "Compresa de hielo": "Ice pack",
-    "Almohadas": "Pillows",
-
-    "Toallas azules": "Blue pads",
-    "Toallas blancas": "White pads",
-
-    "Compresa de hielo para el perineo": "Ice Pack for Bottom",
-    "Compresa de hielo para la incisión de la cesárea": "Ice Pack for C-section incision",
-    "Compresa de hielo para los senos": "Ice Pack for Breasts",
-
-    "Similac Total Comfort (etiqueta morada)": "Similac Total Comfort (purple label)",
-    "Similac 360 (etiqueta azul)": "Similac 360 (blue label)",
-    "Similac Neosure (etiqueta amarilla)": "Similac Neosure (yellow label)",
-    "Enfamil Newborn (etiqueta amarilla)": "Enfamil Newborn (yellow label)",
-    "Enfamil Gentlease (etiqueta morada)": "Enfamil Gentlease (purple label)",
-
-    "Dolor": "Pain",
-    "Náuseas/Vómitos": "Nausea/Vomiting",
-    "Picazón": "Itchy",
-    "Dolor por gases": "Gas pain",
-    "Estreñimiento": "Constipation",
-}
-
-ZH_TO_EN = {
-    "我有紧急情况": "I'm having an emergency",
-    "我需要用品": "I need supplies",
-    "我需要药物": "I need medication",
-    "我的静脉输液泵在响": "My IV pump is beeping",
-    "我有问题": "I have questions",
-    "我想了解出院信息": "I want to know about going home",
-    "浴室/淋浴": "Bathroom/Shower",
-    "我需要母乳喂养方面的帮助": "I need help breastfeeding",
-    "血糖": "Blood sugar",
-    "冰块/水": "Ice Chips/Water",
-
-    "妈妈（血糖）": "Mom (blood sugar)",
-    "宝宝（血糖）": "Baby (blood sugar)",
-
-    "我需要冰水": "I need ice water",
-    "我需要冰块": "I need ice chips",
-    "我需要不加冰的水": "I need water, no ice",
-    "我需要热水": "I need hot water",
-
-    "我需要帮助去卫生间": "I need help to the bathroom",
-    "我需要包裹我的静脉输液管以便洗澡": "I need my IV covered to shower",
-    "我可以洗澡吗？": "Can I take a shower?",
-
-    "宝宝用品": "Baby items",
-    "妈妈用品": "Mom items",
-    "尿布": "Diapers",
-    "配方奶": "Formula",
-    "襁褓巾": "Swaddle",
-    "湿巾": "Wipes",
-    "卫生巾": "Pads",
-    "网眼内裤": "Mesh underwear",
-    "冰袋": "Ice pack",
-    "枕头": "Pillows",
-
-    "蓝色卫生巾": "Blue pads",
-    "白色卫生巾": "White pads",
-
-    "用于会阴部的冰袋": "Ice Pack for Bottom",
-    "用于剖腹产切口的冰袋": "Ice Pack for C-section incision",
-    "用于乳房的冰袋": "Ice Pack for Breasts",
-
-    "Similac Total Comfort (紫色标签)": "Similac Total Comfort (purple label)",
-    "Similac 360 (蓝色标签)": "Similac 360 (blue label)",
-    "Similac Neosure (黄色标签)": "Similac Neosure (yellow label)",
-    "Enfamil Newborn (黄色标签)": "Enfamil Newborn (yellow label)",
-    "Enfamil Gentlease (紫色标签)": "Enfamil Gentlease (purple label)",
-
-    "疼痛": "Pain",
-    "恶心/呕吐": "Nausea/Vomiting",
-    "瘙痒": "Itchy",
-    "胀气痛": "Gas pain",
-    "便秘": "Constipation",
-}
-
-def to_english_label(text: str, lang: str) -> str:
-    """Return an English label for structured buttons. For unknown/custom notes, tag language."""
-    if not text:
-        return text
-    if lang == "es":
-        return ES_TO_EN.get(text, f"[ES] {text}")
-    if lang == "zh":
-        return ZH_TO_EN.get(text, f"[ZH] {text}")
-    return text
+# Button configs per (pathway, language), validated once; edited files are picked up by the watcher
+button_configs = button_registry.ButtonRegistry(os.path.dirname(os.path.abspath(__file__)))
+loaded = button_configs.load()
+print(f"Loaded {loaded} button configs in {button_configs.load_ms} ms.")
+# Education search index (library + knowledge base), loaded from its saved copy when current
+_started = perf_counter()
+education_search = education_index.get_index()
+print(f"Education index ready in {(perf_counter() - _started) * 1000:.1f} ms: {education_search.stats()}")
+# Localized -> English label maps are generated from the same configs (see translations.py)
+for gap in translations.COVERAGE_GAPS:
+    print(f"WARN: translation coverage: {gap}")
+
+def _rebuild_label_maps(registry):
+    """A reloaded config's new or renamed buttons get their translation and analytics label right away."""
+    configs = registry.button_data()
+    for gap in translations.rebuild(configs):
+        print(f"WARN: translation coverage: {gap}")
+    request_labeler.set_buttons(request_labels.button_labels(configs.values()))
+
+button_configs.on_reload.append(_rebuild_label_maps)
+BUTTON_CONFIG_RELOAD_SECONDS = float(os.getenv("BUTTON_CONFIG_RELOAD_SECONDS", "5"))
+if BUTTON_CONFIG_RELOAD_SECONDS > 0:
+    socketio.start_background_task(button_configs.watch, socketio.sleep, BUTTON_CONFIG_RELOAD_SECONDS)
+
+# Where Flask sessions live: "cookie" (Flask's signed cookie), or server-side with only a
+# signed id in the cookie: "memory" (single worker) or "db" (chat_sessions; any number of workers)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cookie").strip().lower()
+if SESSION_BACKEND not in session_store.BACKENDS:
+    print(f"WARN: unknown SESSION_BACKEND '{SESSION_BACKEND}'; using cookie sessions.")
+    SESSION_BACKEND = "cookie"
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(session_store.DEFAULT_TTL_SECONDS)))
+if SESSION_BACKEND == "memory":
+    app.session_interface = session_store.ServerSessionInterface(session_store.MemorySessionStore(
+        ttl=SESSION_TTL_SECONDS,
+        maxsize=int(os.getenv("SESSION_MEMORY_MAXSIZE", str(session_store.DEFAULT_MEMORY_MAXSIZE))),
+    ))
+elif SESSION_BACKEND == "db":
+    app.session_interface = session_store.ServerSessionInterface(
+        session_store.DbSessionStore(engine, ttl=SESSION_TTL_SECONDS))
+    socketio.start_background_task(app.session_interface.store.purge_forever, socketio.sleep)
+
+# Token buckets for patient steps, /debug/ping_patient and staff socket events (see rate_limit.py):
+# "memory" (single worker), "db" (rate_limit_buckets; shared by every worker) or "off"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+if RATE_LIMIT_BACKEND not in rate_limit.BACKENDS:
+    print(f"WARN: unknown RATE_LIMIT_BACKEND '{RATE_LIMIT_BACKEND}'; using memory buckets.")
+    RATE_LIMIT_BACKEND = "memory"
+if RATE_LIMIT_BACKEND == "memory":
+    rate_limiter = rate_limit.RateLimiter(rate_limit.MemoryBuckets(
+        maxsize=int(os.getenv("RATE_LIMIT_MEMORY_MAXSIZE", str(rate_limit.DEFAULT_MAXSIZE)))))
+elif RATE_LIMIT_BACKEND == "db":
+    rate_limiter = rate_limit.RateLimiter(rate_limit.DbBuckets(engine))
+    socketio.start_background_task(rate_limiter.store.purge_forever, socketio.sleep)
+else:
+    rate_limiter = rate_limit.RateLimiter(None)
 
 def migrate_schema():
     try:
@@ -439,7 +512,7 @@ def log_to_audit_trail(event_type, details):
                     "details": details
                 })
 
-        socketio.emit('new_audit_log', {
+        dashboard_events.publish('new_audit_log', {
             'timestamp': now_utc.strftime('%Y-%m-%d %H:%M:%S') + ' UTC',
             'event_type': event_type,
             'details': details
@@ -448,10 +521,37 @@ def log_to_audit_trail(event_type, details):
     except Exception as e:
         print(f"ERROR logging to audit trail: {e}")
 
-def log_request_to_db(request_id, category, user_input, reply, room, is_first_baby):
+def _update_analytics(what, *updates):
+    """
+    Run the analytics upkeep for a request row that is already committed:
+    each update(connection) in a savepoint of a transaction of its own, so a
+    failure only leaves that rollup stale; it never loses or undoes the row.
+    """
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                for update in updates:
+                    try:
+                        with connection.begin_nested():
+                            update(connection)
+                    except Exception as e:
+                        print(f"ERROR updating analytics for {what}: {e}")
+    except Exception as e:
+        print(f"ERROR updating analytics for {what}: {e}")
+
+def _forget_request(request_id):
+    """Undo process_request's bookkeeping for a request whose row was never stored."""
+    open_requests.close(request_id)
+    request_rooms.pop(request_id)
+
+def log_request_to_db(request_id, category, user_input, reply, room, is_first_baby, tier=None,
+                      idempotency_key=None):
     """
     Persist a request and emit a clear server-side debug line showing the resolved room.
+    A row already stored under idempotency_key (a replay another worker took) is left alone.
+    The request row commits on its own; the rollups follow in a second transaction.
     """
+    stored = False
     try:
         # Normalize room for storage + debugging
         room_str = str(room).strip() if room is not None else None
@@ -464,20 +564,46 @@ def log_request_to_db(request_id, category, user_input, reply, room, is_first_ba
         else:
             print(f"[log_request_to_db] WARN| request_id={request_id} invalid/unknown room='{room_str}' role={category}")
 
+        created_at = datetime.now(timezone.utc)
         with engine.connect() as connection:
+            try:
+                label_id = request_labeler.label_id(connection, user_input)
+            except Exception as e:
+                label_id = None  # labeled by the backfill at the next startup
+                print(f"ERROR labeling request {request_id}: {e}")
             with connection.begin():
-                connection.execute(text("""
-                    INSERT INTO requests (request_id, timestamp, room, category, user_input, reply, is_first_baby)
-                    VALUES (:request_id, :timestamp, :room, :category, :user_input, :reply, :is_first_baby);
+                inserted = connection.execute(text("""
+                    INSERT INTO requests (request_id, timestamp, room, category, user_input, reply, is_first_baby, tier,
+                                          label_id, idempotency_key, repeat_count)
+                    VALUES (:request_id, :timestamp, :room, :category, :user_input, :reply, :is_first_baby, :tier,
+                            :label_id, :idempotency_key, :repeat_count)
+                    ON CONFLICT (idempotency_key) DO NOTHING;
                 """), {
                     "request_id": request_id,
-                    "timestamp": datetime.now(timezone.utc),
+                    "timestamp": created_at,
                     "room": room_str,  # store the normalized string (e.g., "241")
                     "category": category,
                     "user_input": user_input,
                     "reply": reply,
-                    "is_first_baby": is_first_baby
+                    "is_first_baby": is_first_baby,
+                    "tier": tier,
+                    "label_id": label_id,
+                    "idempotency_key": idempotency_key,
+                    # Presses coalesced before this INSERT ran (see request_coalescing.py)
+                    "repeat_count": open_requests.repeats(request_id),
                 })
+            if inserted.rowcount == 0:
+                print(f"[log_request_to_db] DUP | request_id={request_id} key={idempotency_key} already stored")
+                _forget_request(request_id)
+                return
+        stored = True
+        _update_analytics(
+            request_id,
+            lambda c: analytics_rollup.record_request(c, created_at, category, label_id, is_first_baby),
+            lambda c: staff_workload.record_request(c, request_id, CNA_FRONT_ROOMS),
+        )
+        invalidate_analytics_for(created_at)
+        unit_census.opened(request_id, category, tier, room_str, created_at)
 
         log_to_audit_trail(
             "Request Created",
@@ -486,6 +612,8 @@ def log_request_to_db(request_id, category, user_input, reply, room, is_first_ba
 
     except Exception as e:
         print(f"ERROR logging to database: {e}")
+        if not stored:
+            _forget_request(request_id)
 
 def process_request(
     role,
@@ -495,6 +623,7 @@ def process_request(
     tier_override: str | None = None,
     classify_from_text: bool = True,
     from_button: bool = False,
+    idempotency_key: str | None = None,
 ):
     """
     Persist the request, emit dashboard updates, and (optionally) email.
@@ -506,21 +635,22 @@ def process_request(
 
     from_button is currently just for future logging/analytics; it does not
     change behavior inside this function.
+
+    Returns the new request's id. A submission whose idempotency_key is
+    already claimed creates nothing and returns the first request's id. The
+    same request from the same room while the first is open (inside
+    REQUEST_COALESCE_SECONDS) is a repeat: it returns the open request's id
+    and only bumps its repeat count. Emergent requests are never coalesced.
     """
     # Language-normalize the user_input for analytics/dashboards
     lang = session.get("language", "en")
     english_user_input = to_english_label(user_input, lang)
 
-    # Unique request id
-    request_id = "req_" + str(datetime.now(timezone.utc).timestamp()).replace(".", "")
-
     # Prefer URL ?room=... then fall back to session
     room_number = _current_room() or session.get("room_number")
     if not room_number or not _valid_room(room_number):
         room_number = None  # store as NULL/None instead of "N/A"
 
-    is_first_baby = session.get("is_first_baby")
-
     # --- Decide escalation tier ---
     if tier_override is not None:
         tier = tier_override
@@ -531,6 +661,27 @@ def process_request(
     else:
         tier = "routine"
 
+    # Unique request id, or the open one this press repeats (an emergency is
+    # never folded into an earlier card: every press alerts)
+    repeat_of = open_requests.repeat_of(room_number, english_user_input) if tier != "emergent" else None
+    request_id = repeat_of or "req_" + str(datetime.now(timezone.utc).timestamp()).replace(".", "")
+    if idempotency_key:
+        owner = request_keys.claim(idempotency_key, request_id)
+        if owner != request_id:
+            return owner
+
+    if repeat_of:
+        _record_repeat(repeat_of)
+        return repeat_of
+    if tier != "emergent":
+        open_requests.open(request_id, room_number, english_user_input)
+
+    is_first_baby = session.get("is_first_baby")
+
+    # Remember where this request lives so ack/complete skip the DB lookup
+    if room_number:
+        request_rooms.set(request_id, room_number)
+
     # Write to DB in background (non-blocking)
     socketio.start_background_task(
         log_request_to_db,
@@ -540,6 +691,8 @@ def process_request(
         reply_message,
         room_number,        # None if unknown/invalid
         is_first_baby,
+        tier,
+        idempotency_key,
     )
 
     # (Optional) email alert
@@ -550,8 +703,8 @@ def process_request(
     #     room_number or "Unknown",
     # )
 
-    # Live update to dashboards
-    socketio.emit(
+    # Live update to dashboards (queued; never waits on slow clients)
+    dashboard_events.publish(
         "new_request",
         {
             "id": request_id,
@@ -563,7 +716,28 @@ def process_request(
         },
     )
 
-    return reply_message
+    return request_id
+
+def log_repeat_to_db(request_id, repeat_count, repeated_at):
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                request_coalescing.record_repeat(connection, request_id, repeat_count, repeated_at)
+    except Exception as e:
+        print(f"ERROR logging repeat of {request_id}: {e}")
+
+def _record_repeat(request_id):
+    """A repeat press of an open request: count it, store it, update the dashboard card."""
+    bumped = open_requests.bump(request_id)
+    if bumped is None:
+        return
+    repeat_count, at = bumped
+    repeated_at = datetime.fromtimestamp(at, timezone.utc)
+    socketio.start_background_task(log_repeat_to_db, request_id, repeat_count, repeated_at)
+    dashboard_events.publish(
+        "request_updated",
+        {"id": request_id, "repeat_count": repeat_count, "last_repeat_at": repeated_at.isoformat()},
+    )
 
 # --- App Routes ---
 @app.route("/room/<room_id>")
@@ -595,12 +769,10 @@ def language_selector():
 @app.route("/demographics", methods=["GET", "POST"])
 def demographics():
     lang = session.get("language", "en")
-    config_module_name = f"button_config_{lang}"
-    try:
-        button_config = importlib.import_module(config_module_name)
-        button_data = button_config.button_data
-    except (ImportError, AttributeError):
+    config = button_configs.get("standard", lang)
+    if config is None:
         return "Error: Language configuration file is missing or invalid."
+    button_data = config.data
     if request.method == "POST":
         is_first_baby_response = request.form.get("is_first_baby")
         session["is_first_baby"] = True if is_first_baby_response == 'yes' else False
@@ -653,6 +825,183 @@ def _emit_received_for(room_number: str, user_text: str, kind: str):
     except Exception as e:
         print(f"WARN: could not emit request:received for room {room_number}: {e}")
 
+def _rate_limit_client() -> str:
+    """Key for the per-session chat limit: a random id kept in the patient's session."""
+    client = session.get("rate_limit_id")
+    if not client:
+        client = session["rate_limit_id"] = secrets.token_hex(8)
+    return client
+
+def _patient_rate_limited(room_number, client=None):
+    """(limit, retry_after seconds) if this patient step is over its session or room limit, else None."""
+    return rate_limiter.check(
+        ("chat_session", client or _rate_limit_client()),
+        ("chat_room", room_number),
+    )
+
+class _PatientRateLimited(Exception):
+    """A patient step refused by _charge_patient_step; nothing was sent."""
+
+    def __init__(self, limit, retry_after):
+        super().__init__(limit)
+        self.limit = limit
+        self.retry_after = retry_after
+
+def _charge_patient_step(room_number, tier, client=None):
+    """
+    Take a token for a resolved step, or raise _PatientRateLimited. Emergent
+    steps (the emergency button, a note triaged emergent) are never limited
+    or charged: a room that spent its burst on routine taps still gets through.
+    """
+    if tier == "emergent":
+        return
+    limited = _patient_rate_limited(room_number, client)
+    if limited:
+        raise _PatientRateLimited(*limited)
+
+def _chat_step(config, room_number, node_id=None, label=None, note=None, idempotency_key=None,
+               rate_limit_client=None):
+    """
+    One patient tap (a button node id, or a legacy label) or free-text note,
+    shared by the /chat form, /api/chat/step and the 'chat:step' socket event.
+    Returns (node to show next, id of the request sent or None). A replayed
+    step (idempotency_key already used) returns the first request's id, sends
+    nothing and isn't charged to the rate limits. Raises _PatientRateLimited for a non-emergent step over
+    its session (rate_limit_client, default the session's) or room limit.
+    """
+    request_id = None
+    # ===========================================
+    # 1) Free-text note path  (CUSTOM NOTE BOX)
+    #    -> NOW USES NEW TRIAGE ENGINE
+    # ===========================================
+    if note is not None:
+        note_text = note.strip()
+        if not note_text:
+            return config.flow.nodes[button_flow.EMPTY_NOTE], None
+
+        # --- NEW LOGIC START ---
+        # 1. Classify using spaCy
+        classification = triage.classify(note_text)
+        
+        # 2. Extract results (lowercase to match your system's expectations)
+        role = classification.routing.value.lower()  # "nurse" or "cna"
+        tier = classification.tier.value.lower()     # "routine" or "emergent"
+        
+        # 3. Notification message for that role (see button_flow.py)
+        sent = config.flow.sent(role)
+        replayed = request_keys.seen(idempotency_key) if idempotency_key else None
+        if replayed:
+            return sent, replayed  # a retry of a step already sent: not charged again
+        _charge_patient_step(room_number, tier, rate_limit_client)
+
+        # 4. Process Request (Pass the explicit tier we just calculated)
+        request_id = process_request(
+            role=role,
+            subject="Custom Patient Note",
+            user_input=note_text,
+            reply_message=sent.reply,
+            tier_override=tier,       # ✅ Pass the calculated tier (emergent/routine)
+            classify_from_text=False, # ✅ Disable old logic, we just did it above
+            from_button=False,
+            idempotency_key=idempotency_key,
+        )
+        # --- NEW LOGIC END ---
+
+        # Notify patient page that the request was received
+        if room_number:
+            _emit_received_for(room_number, note_text, kind="note")
+        return sent, request_id
+
+    # ===========================================
+    # 2) Button click path
+    #    Buttons post node ids (labels still resolve, for older pages).
+    #    Replies, menus and actions -- including the emergency button's
+    #    emergent tier and the shower follow-up -- are declared in the
+    #    button config and compiled by button_flow.py.
+    #    -> NO emergent scoring: the tier comes from the config
+    # ===========================================
+    node = config.flow.resolve(node_id, (label or "").strip())
+    replayed = request_keys.seen(idempotency_key) if node.role and idempotency_key else None
+    if replayed:
+        return node, replayed  # a retry of a step already sent: not charged again
+    _charge_patient_step(room_number, node.tier, rate_limit_client)
+
+    # Action button -> notify CNA/Nurse + log
+    if node.role:
+        request_id = process_request(
+            role=node.role,
+            subject=node.subject,
+            user_input=node.request_text,
+            reply_message=node.reply,
+            tier_override=node.tier,
+            classify_from_text=False,  # ✅ BUTTON: no emergent scoring
+            from_button=True,
+            idempotency_key=idempotency_key,
+        )
+        if room_number:
+            _emit_received_for(room_number, node.request_text, kind="option")
+    return node, request_id
+
+def _chat_step_result(config, node, request_id):
+    """JSON body for a step: the reply and options chat.html shows next."""
+    return {
+        "ok": True,
+        "node": node.id,
+        "reply": node.reply,
+        "options": [{"id": id, "label": label}
+                    for id, label in config.flow.menus.get(node.menu, config.flow.menus[button_flow.MAIN])],
+        "request_id": request_id,
+    }
+
+def _api_chat_step(data, client=None):
+    """
+    A step from /api/chat/step or 'chat:step': {"node": id} or {"note": text},
+    optional "room" and "idempotency_key". client is the per-session rate
+    limit key when the session can't hold one (socket events).
+    """
+    if not isinstance(data, dict):
+        return {"ok": False, "error": "expected a JSON object"}, 400
+    config = button_configs.get(session.get("pathway", "standard"), session.get("language", "en"))
+    if config is None:
+        return {"ok": False, "error": "button config not loaded"}, 503
+
+    room_number = _current_room()
+    room = str(data.get("room") or "").strip()
+    if _valid_room(room):
+        session["room_number"] = room
+        room_number = room
+
+    note = data.get("note")
+    try:
+        node, request_id = _chat_step(
+            config,
+            room_number,
+            node_id=str(data.get("node") or ""),
+            label=str(data.get("label") or ""),
+            note=str(note) if note is not None else None,
+            idempotency_key=idempotency.clean_key(data.get("idempotency_key")),
+            rate_limit_client=client,
+        )
+    except _PatientRateLimited as limited:
+        return {
+            "ok": False,
+            "error": "rate_limited",
+            "reply": rate_limit.patient_message(session.get("language", "en")),
+            "retry_after": round(limited.retry_after, 1),
+        }, 429
+    # A reload of the page shows where the patient is (socket steps: chat.html's ?node=)
+    session["node"] = node.id
+    return _chat_step_result(config, node, request_id), 200
+
+@app.post("/api/chat/step")
+def api_chat_step():
+    """
+    JSON version of a /chat POST for chat.html's in-place updates: one
+    round trip instead of POST, redirect and page GET.
+    """
+    body, status = _api_chat_step(request.get_json(silent=True))
+    return jsonify(body), status
+
 @app.route("/chat", methods=["GET", "POST"])
 def handle_chat():
     # --- Resolve pathway: allow URL override, otherwise honor existing session ---
@@ -663,17 +1012,11 @@ def handle_chat():
     pathway = session.get("pathway", "standard")
     lang = session.get("language", "en")
 
-    # Load the correct button config module based on pathway + language
-    config_module_name = (
-        f"button_config_bereavement_{lang}"
-        if pathway == "bereavement"
-        else f"button_config_{lang}"
-    )
-    try:
-        button_config = importlib.import_module(config_module_name)
-        button_data = button_config.button_data
-    except (ImportError, AttributeError) as e:
-        print(f"ERROR: Could not load configuration module '{config_module_name}'. Error: {e}")
+    # Button config for pathway + language (preloaded; see button_registry.py)
+    config = button_configs.get(pathway, lang)
+    if config is None:
+        config_module_name = button_registry.module_name(pathway, lang)
+        print(f"ERROR: No button config loaded for {pathway}/{lang} ('{config_module_name}').")
         return (
             f"Error: Configuration file '{config_module_name}.py' is missing or invalid. "
             "Please contact support."
@@ -693,175 +1036,41 @@ def handle_chat():
         session["room_number"] = room_number
 
     if request.method == "POST":
-        # ===========================================
-        # 1) Free-text note path  (CUSTOM NOTE BOX)
-        #    -> NOW USES NEW TRIAGE ENGINE
-        # ===========================================
-        if request.form.get("action") == "send_note":
-            note_text = (request.form.get("custom_note") or "").strip()
-            if note_text:
-                # --- NEW LOGIC START ---
-                # 1. Classify using spaCy
-                classification = triage.classify(note_text)
-                
-                # 2. Extract results (lowercase to match your system's expectations)
-                role = classification.routing.value.lower()  # "nurse" or "cna"
-                tier = classification.tier.value.lower()     # "routine" or "emergent"
-                
-                # 3. Get notification message based on role
-                reply_message = button_data.get(f"{role}_notification", "Your request has been sent.")
-
-                # 4. Process Request (Pass the explicit tier we just calculated)
-                session["reply"] = process_request(
-                    role=role,
-                    subject="Custom Patient Note",
-                    user_input=note_text,
-                    reply_message=reply_message,
-                    tier_override=tier,       # ✅ Pass the calculated tier (emergent/routine)
-                    classify_from_text=False, # ✅ Disable old logic, we just did it above
-                    from_button=False,
-                )
-                # --- NEW LOGIC END ---
-
-                session["options"] = button_data["main_buttons"]
-
-                # Notify patient page that the request was received
-                if room_number:
-                    _emit_received_for(room_number, note_text, kind="note")
-            else:
-                session["reply"] = button_data.get("empty_custom_note", "Please type a message in the box.")
-                session["options"] = button_data["main_buttons"]
-
-        # ===========================================
-        # 2) Button click path
-        #    -> NO emergent scoring, except explicit emergency button
-        # ===========================================
-        else:
-            user_input = (request.form.get("user_input") or "").strip()
-            back_text = button_data.get("back_text", "⬅ Back")
-
-            # ----------------------------
-            # HARD-CODED EMERGENCY BUTTON
-            # ----------------------------
-            if user_input == "I'm having an emergency":
-                request_text = "Patient pressed EMERGENCY button: 'I'm having an emergency'."
-                session["reply"] = process_request(
-                    role="nurse",
-                    subject="EMERGENCY – patient pressed emergency button",
-                    user_input=request_text,
-                    reply_message=button_data.get("nurse_notification", "Your care team has been notified."),
-                    tier_override="emergent",   # ✅ FORCE emergent
-                    classify_from_text=False,   # don't re-score text
-                    from_button=True,
-                )
-                session["options"] = button_data["main_buttons"]
-                if room_number:
-                    _emit_received_for(room_number, request_text, kind="option")
-
-            # ----------------------------
-            # SPECIAL FLOW: Shower follow-up
-            # ----------------------------
-            elif user_input == "Can I take a shower?":
-                session["reply"] = (
-                    "Usually yes — but please check with your nurse if you have an IV, "
-                    "had a C-section, or have special instructions."
-                )
-                session["options"] = [
-                    "Ask my nurse about taking a shower",
-                    "Got it, I'll wait for now",
-                ]
-                if back_text not in session["options"]:
-                    session["options"].append(back_text)
-
-            elif user_input == "Ask my nurse about taking a shower":
-                request_text = "Patient would like to ask about taking a shower."
-                session["reply"] = process_request(
-                    role="nurse",
-                    subject="Shower permission request",
-                    user_input=request_text,
-                    reply_message=button_data.get("nurse_notification", "Your request has been sent."),
-                    tier_override=None,        # nurse, but not emergent
-                    classify_from_text=False,  # ✅ BUTTON: no emergent scoring
-                    from_button=True,
-                )
-                session["options"] = button_data["main_buttons"]
-                if room_number:
-                    _emit_received_for(room_number, request_text, kind="option")
-
-            elif user_input == "Got it, I'll wait for now":
-                session["reply"] = "Okay — if you change your mind, just let me know anytime."
-                session["options"] = button_data["main_buttons"]
-
-            # ----------------------------
-            # Back / Home
-            # ----------------------------
-            elif user_input == back_text:
-                session.pop("reply", None)
-                session.pop("options", None)
-                return redirect(url_for("handle_chat", room=room_number) if room_number else url_for("handle_chat"))
-
-            # ----------------------------
-            # Standard known-button handling via button_data
-            # ALL of these should be NON-emergent
-            # ----------------------------
-            elif user_input in button_data:
-                button_info = button_data[user_input]
-                session["reply"] = button_info.get("question") or button_info.get("note", "")
-                session["options"] = button_info.get("options", [])
-
-                if session["options"] and back_text not in session["options"]:
-                    session["options"].append(back_text)
-                elif not session["options"]:
-                    session["options"] = button_data["main_buttons"]
-
-                # Action button -> notify CNA/Nurse + log
-                if "action" in button_info:
-                    action = button_info["action"]
-                    role = "cna" if action == "Notify CNA" else "nurse"
-                    subject = f"{role.upper()} Request"
-                    notification_message = button_info.get(
-                        "note",
-                        button_data.get(f"{role}_notification", "Your request has been sent.")
-                    )
-
-                    # BUTTON request: NEVER emergent via classifier
-                    session["reply"] = process_request(
-                        role=role,
-                        subject=subject,
-                        user_input=user_input,
-                        reply_message=notification_message,
-                        tier_override=None,        # no forced emergent
-                        classify_from_text=False,  # ✅ BUTTON: no emergent scoring
-                        from_button=True,
-                    )
-                    session["options"] = button_data["main_buttons"]
-
-                    if room_number:
-                        _emit_received_for(room_number, user_input, kind="option")
-
-            # ----------------------------
-            # Unknown input
-            # ----------------------------
+        key = idempotency.clean_key(request.form.get("idempotency_key"))
+        try:
+            if request.form.get("action") == "send_note":
+                node, _ = _chat_step(config, room_number, note=request.form.get("custom_note") or "",
+                                     idempotency_key=key)
             else:
-                session["reply"] = button_data.get(
-                    "fallback_unrecognized",
-                    "I'm sorry, I didn't understand that. Please use the buttons provided.",
-                )
-                session["options"] = button_data["main_buttons"]
+                node, _ = _chat_step(config, room_number, node_id=request.form.get("node"),
+                                     label=request.form.get("user_input"), idempotency_key=key)
+        except _PatientRateLimited as limited:
+            # Same page, the limit message in place of the reply; nothing is sent
+            _, options = config.flow.page(session.get("node"))
+            page = _render_chat_page(rate_limit.patient_message(lang), options, room_number)
+            return page, 429, {"Retry-After": str(int(limited.retry_after) + 1)}
+        session["node"] = node.id
 
         # Always redirect after POST (PRG)
         return redirect(url_for("handle_chat", room=room_number) if room_number else url_for("handle_chat"))
 
-    # --- GET: render page ---
-    reply = session.pop("reply", button_data["greeting"])
-    options = session.pop("options", button_data["main_buttons"])
+    # --- GET: render page (cached per config and menu; see chat_page.py) ---
+    # In-place steps keep their node in the URL (?node=): a socket step can't
+    # update a cookie session. Otherwise the node from the last form post.
+    session_node = session.pop("node", None)
+    node = config.flow.current(request.args.get("node") or session_node)
+    return chat_pages.render(config, node, room_number)
+
+def _render_chat_page(reply, options, room_number):
     return render_template(
         "chat.html",
         reply=reply,
         options=options,
-        button_data=button_data,
         room_number=room_number,  # used by chat.html Socket.IO connect
     )
+
+chat_pages = chat_page.ChatPages(_render_chat_page)
+
 @app.route("/reset-language")
 def reset_language():
     """
@@ -870,8 +1079,7 @@ def reset_language():
     """
     session.pop("language", None)
     session.pop("is_first_baby", None)  # so standard pathway re-asks the question
-    session.pop("reply", None)          # clear any old reply text
-    session.pop("options", None)        # clear old button set
+    session.pop("node", None)           # clear any old reply and button set
 
     return redirect(url_for("language_selector"))
     
@@ -886,23 +1094,25 @@ def dashboard():
                     room,
                     user_input,
                     category AS role,
-                    timestamp
+                    timestamp,
+                    repeat_count,
+                    tier
                 FROM requests
                 WHERE completion_timestamp IS NULL
                 ORDER BY timestamp DESC;
             """))
 
             for row in result:
-                # 1. Get the text
-                text_for_tier = (row.user_input or "").strip()
-
-                # 2. Use the NEW Triage Engine to decide urgency
-                if "patient pressed emergency button" in text_for_tier.lower():
-                    tier = "emergent"
-                else:
-                    # Rerunning classification on-the-fly for the dashboard
-                    classification = triage.classify(text_for_tier)
-                    tier = classification.tier.value.lower()
+                # The tier stored at creation (config for buttons, triage for notes)
+                tier = row.tier
+                if not tier:
+                    # Rows from before the tier column: classify the text on the fly
+                    text_for_tier = (row.user_input or "").strip()
+                    if "patient pressed emergency button" in text_for_tier.lower():
+                        tier = "emergent"
+                    else:
+                        classification = triage.classify(text_for_tier)
+                        tier = classification.tier.value.lower()
 
                 active_requests.append({
                     "id": row.request_id,
@@ -911,6 +1121,7 @@ def dashboard():
                     "role": row.role,
                     "tier": tier,
                     "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+                    "repeat_count": row.repeat_count or 0,
                 })
 
     except Exception as e:
@@ -921,92 +1132,224 @@ def dashboard():
                            nurse_context=False)
 
 # --- Analytics ---
-@app.route('/analytics')
-def analytics():
-    avg_response_time = "N/A"
-    top_requests_labels, top_requests_values = [], []
-    most_requested_labels, most_requested_values = [], []
-    requests_by_hour_labels, requests_by_hour_values = [], []
-    first_baby_labels, first_baby_values = [], []
-    multi_baby_labels, multi_baby_values = [], []
+def _format_duration(seconds):
+    if seconds is None:
+        return "N/A"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m {seconds}s"
+
+# /analytics results per filter set. Keys carry the data version: a rollup
+# rebuild or bulk import bumps it, while request writes only evict the cached
+# ranges that cover the request's shift date. The cache is per worker, so
+# writes handled by another worker show up within the TTL.
+analytics_cache = TTLCache(
+    maxsize=int(os.getenv("ANALYTICS_CACHE_SIZE", "128")),
+    ttl=float(os.getenv("ANALYTICS_CACHE_TTL", "300")),
+)
+analytics_data_version = 0
+
+# "columnar" serves /analytics from a NumPy snapshot of requests refreshed in the
+# background (columnar_analytics.py) instead of the rollup tables
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "sql")
+analytics_snapshot = columnar_analytics.ColumnarAnalytics(
+    engine,
+    os.getenv("ANALYTICS_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "calllight_analytics")),
+    refresh_seconds=float(os.getenv("ANALYTICS_SNAPSHOT_SECONDS", "60")),
+    sleep=socketio.sleep,
+)
+
+def bump_analytics_version():
+    """Call after rebuilding the rollups or importing requests in bulk."""
+    global analytics_data_version
+    analytics_data_version += 1
+    analytics_cache.clear()
+
+def invalidate_analytics_for(created_at):
+    """Evict cached /analytics results whose date range includes a request created at created_at."""
+    if created_at is None:
+        return
+    # Shift dates are cut in the DB session time zone; a day either side covers any offset
+    day = created_at.date()
+    low, high = day - timedelta(days=1), day + timedelta(days=1)
+    analytics_cache.invalidate(
+        lambda key: (key[1] is None or key[1] <= high) and (key[2] is None or key[2] >= low)
+    )
+
+def _parse_date_arg(value):
+    """YYYY-MM-DD query-string value as a date; None if missing or malformed."""
     try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def _analytics_filters(args):
+    """(start_date, end_date, role, shift) from the query string; unusable values mean "all"."""
+    start_date, end_date = _parse_date_arg(args.get("start")), _parse_date_arg(args.get("end"))
+    if start_date and end_date and start_date > end_date:
+        start_date, end_date = end_date, start_date
+    role = (args.get("role") or "").strip().lower()[:255] or None
+    shift = args.get("shift") if args.get("shift") in analytics_rollup.SHIFTS else None
+    return start_date, end_date, role, shift
+
+def _empty_analytics_data():
+    data = {"avg_response_time": "N/A", "response_percentiles": {}, "response_percentiles_by_group": [], "roles": []}
+    for chart in ("top_requests", "most_requested", "requests_by_hour", "first_baby", "multi_baby"):
+        data[f"{chart}_labels"], data[f"{chart}_values"] = [], []
+    return data
+
+def _analytics_data(start_date=None, end_date=None, role=None, shift=None, snapshot=None):
+    """
+    Everything analytics.html charts, read from the rollups and sketches only,
+    or from `snapshot` (a loaded ColumnarAnalytics) when given one.
+    """
+    data = _empty_analytics_data()
+    if snapshot is not None:
+        rollup = snapshot.summary(start_date, end_date, role, shift)
+        by_group = snapshot.sketches(start_date, end_date, role=role, shift=shift, group_by=("role", "tier"))
+        data["roles"] = snapshot.categories()
+    else:
         with engine.connect() as connection:
-            avg_time_result = connection.execute(text("""
-                SELECT AVG(EXTRACT(EPOCH FROM (completion_timestamp - timestamp))) as avg_seconds
-                FROM requests
-                WHERE completion_timestamp IS NOT NULL;
-            """)).scalar_one_or_none()
-            if avg_time_result is not None:
-                minutes, seconds = divmod(int(avg_time_result), 60)
-                avg_response_time = f"{minutes}m {seconds}s"
-
-            top_requests_result = connection.execute(text("""
-                SELECT category, COUNT(id) FROM requests
-                GROUP BY category
-                ORDER BY COUNT(id) DESC;
-            """)).fetchall()
-            top_requests_labels = [row[0] for row in top_requests_result]
-            top_requests_values = [row[1] for row in top_requests_result]
+            rollup = analytics_rollup.summary(connection, start_date, end_date, role, shift)
+            start, end = analytics_rollup.shift_window(connection, start_date, end_date)
+            by_group = response_sketch.load(connection, start, end, role=role, shift=shift,
+                                            group_by=("role", "tier"))
+            data["roles"] = analytics_rollup.categories(connection)
+
+    overall = response_sketch.DDSketch()
+    for sketch in by_group.values():
+        overall.merge(sketch)
+
+    data["avg_response_time"] = _format_duration(rollup["avg_response_seconds"])
+
+    # Tail latency from the response-time sketches (see response_sketch.py)
+    if overall.count:
+        data["response_percentiles"] = {
+            name: _format_duration(value) for name, value in response_sketch.quantiles(overall).items()
+        }
+    for (group_role, tier), sketch in sorted(by_group.items()):
+        data["response_percentiles_by_group"].append({
+            "role": group_role,
+            "tier": tier,
+            "count": sketch.count,
+            **{name: _format_duration(value) for name, value in response_sketch.quantiles(sketch).items()},
+        })
 
-            most_requested_result = connection.execute(text("""
-                SELECT user_input, COUNT(id) as count
-                FROM requests
-                GROUP BY user_input
-                ORDER BY count DESC
-                LIMIT 5;
-            """)).fetchall()
-            most_requested_labels = [row[0] for row in most_requested_result]
-            most_requested_values = [row[1] for row in most_requested_result]
+    data["top_requests_labels"] = [row[0] for row in rollup["by_category"]]
+    data["top_requests_values"] = [row[1] for row in rollup["by_category"]]
 
-            requests_by_hour_result = connection.execute(text("""
-                SELECT EXTRACT(HOUR FROM timestamp) as hour, COUNT(id)
-                FROM requests
-                GROUP BY hour
-                ORDER BY hour;
-            """)).fetchall()
-            hourly_counts = defaultdict(int)
-            for hour, count in requests_by_hour_result:
-                hourly_counts[int(hour)] = count
-            requests_by_hour_labels = [f"{h}:00" for h in range(24)]
-            requests_by_hour_values = [hourly_counts[h] for h in range(24)]
-
-            first_baby_result = connection.execute(text("""
-                SELECT user_input, COUNT(id) as count
-                FROM requests
-                WHERE is_first_baby IS TRUE
-                GROUP BY user_input
-                ORDER BY count DESC
-                LIMIT 5;
-            """)).fetchall()
-            first_baby_labels = [row[0] for row in first_baby_result]
-            first_baby_values = [row[1] for row in first_baby_result]
+    data["most_requested_labels"] = [row[0] for row in rollup["top_labels"]]
+    data["most_requested_values"] = [row[1] for row in rollup["top_labels"]]
 
-            multi_baby_result = connection.execute(text("""
-                SELECT user_input, COUNT(id) as count
-                FROM requests
-                WHERE is_first_baby IS FALSE
-                GROUP BY user_input
-                ORDER BY count DESC
-                LIMIT 5;
-            """)).fetchall()
-            multi_baby_labels = [row[0] for row in multi_baby_result]
-            multi_baby_values = [row[1] for row in multi_baby_result]
-    except Exception as e:
-        print(f"ERROR fetching analytics data: {e}")
+    data["requests_by_hour_labels"] = [f"{h}:00" for h in range(24)]
+    data["requests_by_hour_values"] = [rollup["by_hour"].get(h, 0) for h in range(24)]
 
-    return render_template(
+    data["first_baby_labels"] = [row[0] for row in rollup["top_first_baby"]]
+    data["first_baby_values"] = [row[1] for row in rollup["top_first_baby"]]
+
+    data["multi_baby_labels"] = [row[0] for row in rollup["top_multi_baby"]]
+    data["multi_baby_values"] = [row[1] for row in rollup["top_multi_baby"]]
+    return data
+
+if ANALYTICS_ENGINE == "columnar":
+    # Refreshed changes evict the cached pages (request writes only reach the snapshot on refresh)
+    socketio.start_background_task(analytics_snapshot.run_forever, bump_analytics_version)
+
+@app.route('/analytics')
+def analytics():
+    start_date, end_date, role, shift = _analytics_filters(request.args)
+    key = (analytics_data_version, start_date, end_date, role, shift)
+
+    started = perf_counter()
+    data = analytics_cache.get(key)
+    from_cache = data is not None
+    if data is None:
+        # Until the first snapshot is built, the rollups answer
+        snapshot = analytics_snapshot if ANALYTICS_ENGINE == "columnar" and analytics_snapshot.ready else None
+        try:
+            data = _analytics_data(start_date, end_date, role, shift, snapshot=snapshot)
+            analytics_cache.set(key, data)
+        except Exception as e:
+            print(f"ERROR fetching analytics data: {e}")
+            data = _empty_analytics_data()
+
+    # Quick ranges, by shift date: the latest night shift that has started, and the last week
+    now = datetime.now()
+    today = now.date()
+    last_night = today if now.time() >= time(19, 0) else today - timedelta(days=1)
+
+    page = render_template(
         'analytics.html',
-        avg_response_time=avg_response_time,
-        top_requests_labels=top_requests_labels,
-        top_requests_values=top_requests_values,
-        most_requested_labels=most_requested_labels,
-        most_requested_values=most_requested_values,
-        requests_by_hour_labels=requests_by_hour_labels,
-        requests_by_hour_values=requests_by_hour_values,
-        first_baby_labels=first_baby_labels,
-        first_baby_values=first_baby_values,
-        multi_baby_labels=multi_baby_labels,
-        multi_baby_values=multi_baby_values
+        filters={"start": start_date, "end": end_date, "role": role, "shift": shift},
+        quick_ranges=[
+            ("Last night", {"start": last_night, "end": last_night, "shift": "night"}),
+            ("Today", {"start": today, "end": today}),
+            ("Last 7 days", {"start": today - timedelta(days=6), "end": today}),
+            ("All time", {}),
+        ],
+        from_cache=from_cache,
+        **data,
+    )
+    latency.observe("analytics_render", perf_counter() - started)
+    return page
+
+@app.get("/api/analytics/staff")
+def api_analytics_staff():
+    """
+    Requests, response times, busiest hour and most-open-at-once per nurse/CNA
+    (see staff_workload.py). Same filters as /analytics; defaults to the last 7 days.
+    Per-staff performance data: managers (or the export token) only, like /export.
+    """
+    if not _export_authorized():
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+    start_date, end_date, role, shift = _analytics_filters(request.args)
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=6)
+    try:
+        with engine.connect() as connection:
+            staff = staff_workload.summary(connection, start_date, end_date, role, shift)
+    except Exception as e:
+        print(f"ERROR fetching staff workload: {e}")
+        return jsonify({"ok": False, "error": "could not load staff workload"}), 500
+    return jsonify({
+        "ok": True,
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        "role": role,
+        "shift": shift,
+        "staff": staff,
+    })
+
+# --- Exports (see data_export.py) ---
+def _export_authorized():
+    """Logged-in manager, or `Authorization: Bearer <EXPORT_API_TOKEN>` for scripted pulls."""
+    if session.get('manager_logged_in'):
+        return True
+    token = os.getenv("EXPORT_API_TOKEN")
+    return bool(token) and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+@app.get("/export/<table>")
+def export_table(table):
+    """Stream requests or audit_log as CSV (default) or Parquet; ?start=&end= are inclusive dates."""
+    if not _export_authorized():
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+    fmt = (request.args.get("format") or "csv").lower()
+    if table not in data_export.TABLES or fmt not in data_export.FORMATS:
+        abort(404)
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        return jsonify({"ok": False, "error": "Parquet export needs pyarrow on the server"}), 501
+    start, end = _parse_date_arg(request.args.get("start")), _parse_date_arg(request.args.get("end"))
+
+    def generate():
+        # Own connection: it has to stay open for as long as the response streams
+        with engine.connect() as connection:
+            yield from data_export.stream(table, fmt, data_export.iter_chunks(connection, table, start, end))
+
+    log_to_audit_trail("Data Export", f"{table} as {fmt}, {start or 'beginning'} to {end or 'now'}")
+    filename = f"{table}_{start or 'all'}_{end or 'all'}.{fmt}"
+    return Response(
+        generate(),
+        mimetype="text/csv" if fmt == "csv" else "application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 # --- Assignments (shift-aware; CNA zones; strict nurse filtering) ---
@@ -1300,6 +1643,7 @@ def manager_dashboard():
     # ----- GET: fetch staff + recent audit log -----
     staff_list = []
     audit_log = []
+    recent_reports = []
     try:
         with engine.connect() as connection:
             # include pin_set_at so UI can show if a PIN exists
@@ -1317,10 +1661,14 @@ def manager_dashboard():
                 LIMIT 50;
             """))
             audit_log = audit_result.fetchall()
+
+            # Precomputed by shift_report_scheduler; no aggregation here
+            recent_reports = shift_reports.recent(connection, limit=4)
     except Exception as e:
         print(f"ERROR fetching manager dashboard data: {e}")
 
-    return render_template('manager_dashboard.html', staff=staff_list, audit_log=audit_log)
+    return render_template('manager_dashboard.html', staff=staff_list, audit_log=audit_log,
+                           shift_reports=recent_reports, format_duration=_format_duration)
 
 # --- Staff Portal (pilot PIN) -----------------------------------------------
 def _infer_shift_now() -> str:
@@ -1470,12 +1818,35 @@ def staff_dashboard_for_nurse(staff_name):
         toggle_url=toggle_url
     )
 
+@app.get("/api/education/search")
+def api_education_search():
+    """
+    Ranked education snippets for a patient question: ?q=...&lang=en|es|zh&limit=3.
+    Each hit has id, title, score, heading_match (a question term is in its
+    title or keywords), snippet and the full section text.
+    """
+    question = (request.args.get("q") or "").strip()
+    if not question:
+        return jsonify({"ok": False, "error": "missing q"}), 400
+    language = request.args.get("lang") or session.get("language", "en")
+    try:
+        limit = max(1, min(int(request.args.get("limit", "3")), 10))
+    except ValueError:
+        limit = 3
+    started = perf_counter()
+    hits = education_search.search(question, language, limit)
+    latency.observe("education_search", perf_counter() - started)
+    return jsonify({"ok": True, "question": question, "results": hits})
+
 @app.get("/debug/ping_patient")
 def debug_ping_patient():
     room = request.args.get("room", "").strip()
     status = request.args.get("status", "ack").strip().lower()  # ack|omw|asap
     if not _valid_room(room):
         return jsonify({"ok": False, "error": "invalid room"}), 400
+    limited = rate_limiter.check(("ping_patient", request.remote_addr))
+    if limited:
+        return jsonify({"ok": False, "error": "rate_limited", "retry_after": round(limited[1], 1)}), 429
     emit_patient_event("request:status", room, {
         "request_id": "debug",
         "status": status,
@@ -1484,6 +1855,38 @@ def debug_ping_patient():
     })
     return jsonify({"ok": True, "room": room, "status": status})
 
+@app.get("/debug/metrics")
+def debug_metrics():
+    """In-process counters (emit queue, caches, handler latency) for troubleshooting."""
+    return jsonify({
+        "emit_queue": dashboard_events.stats(),
+        "request_room_cache": request_rooms.stats(),
+        "idempotency": request_keys.stats(),
+        "coalescing": open_requests.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "education_index": education_search.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "patient_presence": patient_presence.snapshot(),
+        "latency": latency.snapshot(),
+        "shift_reports": shift_report_scheduler.stats(),
+        "analytics_snapshot": analytics_snapshot.stats(),
+        "button_configs": button_configs.stats(),
+        "chat_pages": chat_pages.stats(),
+        "translations": translations.coverage(),
+        "sessions": app.session_interface.stats() if SESSION_BACKEND != "cookie" else {"backend": "cookie"},
+    })
+
+@app.get("/metrics/unit")
+def metrics_unit():
+    """
+    Live unit census (open requests by role/tier, oldest open, age buckets,
+    SLA breaches) from memory; safe to scrape every few seconds.
+    ?format=prometheus returns the Prometheus text format.
+    """
+    if (request.args.get("format") or "").lower() == "prometheus":
+        return Response(unit_census.prometheus(), mimetype="text/plain; version=0.0.4")
+    return jsonify(unit_census.snapshot())
+
 @app.route('/api/active_requests')
 def api_active_requests():
     """JSON: returns active requests for manager or for a nurse's scope."""
@@ -1521,7 +1924,7 @@ def api_active_requests():
                     # Only my rooms
                     if rooms_for_nurse:
                         res = connection.execute(text("""
-                            SELECT request_id, room, user_input, category as role, timestamp
+                            SELECT request_id, room, user_input, category as role, timestamp, repeat_count
                             FROM requests
                             WHERE completion_timestamp IS NULL
                               AND room = ANY(:room_list)
@@ -1532,7 +1935,7 @@ def api_active_requests():
                 else:
                     # 'all' for nurse view
                     res = connection.execute(text("""
-                        SELECT request_id, room, user_input, category as role, timestamp
+                        SELECT request_id, room, user_input, category as role, timestamp, repeat_count
                         FROM requests
                         WHERE completion_timestamp IS NULL
                         ORDER BY timestamp DESC;
@@ -1540,7 +1943,7 @@ def api_active_requests():
             else:
                 # Manager view: all active
                 res = connection.execute(text("""
-                    SELECT request_id, room, user_input, category as role, timestamp
+                    SELECT request_id, room, user_input, category as role, timestamp, repeat_count
                     FROM requests
                     WHERE completion_timestamp IS NULL
                     ORDER BY timestamp DESC;
@@ -1552,7 +1955,8 @@ def api_active_requests():
                     "room": row.room,
                     "request": row.user_input,
                     "role": row.role,
-                    "timestamp": row.timestamp.isoformat() if row.timestamp else None
+                    "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+                    "repeat_count": row.repeat_count or 0,
                 })
 
     except Exception as e:
@@ -1584,17 +1988,61 @@ def debug_assignments_today():
 
 # --- SocketIO Event Handlers ---
 
+# Who is connected per patient room + recent events for reconnect replay
+patient_presence = PatientPresence(
+    buffer_size=int(os.getenv("PATIENT_REPLAY_BUFFER", "20")),
+    replay_window=float(os.getenv("PATIENT_REPLAY_WINDOW", "1800")),
+)
+
 def emit_patient_event(event: str, room_number: str | int, payload: dict):
-    """Emit an event to the patient's socket.io room."""
+    """Emit an event to the patient's socket.io room and buffer it for replay."""
+    body = {"room_id": str(room_number), **(payload or {})}
+    # The buffer keeps a reference to body, so the replayed copy carries seq/epoch too
+    body["seq"] = patient_presence.record(str(room_number), event, body)
+    body["epoch"] = patient_presence.epoch
     socketio.emit(
         event,
-        {"room_id": str(room_number), **(payload or {})},
+        body,
         to=f"patient:{room_number}",
         namespace="/patient",
     )
 
+def _join_patient_room(room_id: str, data: dict | None = None):
+    """Join this socket to its patient room, then replay anything it missed."""
+    join_room(f"patient:{room_id}", namespace="/patient")
+    patient_presence.join(request.sid, room_id)
+    socketio.emit("patient:joined", {
+        "room_id": room_id,
+        "seq": patient_presence.latest_seq(room_id),
+        "epoch": patient_presence.epoch,
+    }, to=request.sid, namespace="/patient")
+
+    data = data or {}
+    for seq, event, payload in patient_presence.missed_since(room_id, data.get("last_seq"), data.get("epoch")):
+        socketio.emit(event, {**payload, "replayed": True}, to=request.sid, namespace="/patient")
+
+# request_id -> room for open requests; filled on create, dropped on complete.
+request_rooms = TTLCache(
+    maxsize=int(os.getenv("REQUEST_ROOM_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("REQUEST_ROOM_CACHE_TTL", str(12 * 3600))),
+)
+
+def _stored_request_id(key: str) -> str | None:
+    with engine.connect() as conn:
+        return idempotency.stored_request_id(conn, key)
+
+# Client idempotency key -> request_id, so replayed patient submissions are absorbed (see idempotency.py)
+request_keys = idempotency.IdempotencyIndex(
+    lookup=_stored_request_id,
+    window=float(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", str(idempotency.DEFAULT_WINDOW_SECONDS))),
+    maxsize=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", str(idempotency.DEFAULT_MAXSIZE))),
+)
+
 def _get_room_for_request(request_id: str | int) -> str | None:
-    """Look up room number for a given request_id from the requests table."""
+    """Room number for a request_id: in-memory cache first, requests table on a miss."""
+    room = request_rooms.get(request_id)
+    if room:
+        return room
     try:
         with engine.connect() as conn:
             row = conn.execute(
@@ -1602,6 +2050,7 @@ def _get_room_for_request(request_id: str | int) -> str | None:
                 {"rid": request_id},
             ).fetchone()
             if row and row[0]:
+                request_rooms.set(request_id, str(row[0]))
                 return str(row[0])
     except Exception as e:
         print(f"ERROR reading room for request {request_id}: {e}")
@@ -1618,9 +2067,7 @@ def patient_connect():
         # If query has room_id and it's valid, we can eagerly join as well.
         room_id = (request.args.get("room_id") or "").strip()
         if _valid_room(room_id):
-            join_room(f"patient:{room_id}", namespace="/patient")
-            # Optional: tell client we auto-joined
-            socketio.emit("patient:joined", {"room_id": room_id}, namespace="/patient")
+            _join_patient_room(room_id)
     except Exception as e:
         print(f"[patient] connect error: {e}")
 
@@ -1630,19 +2077,54 @@ def patient_join(data):
     try:
         room_id = str(data.get("room_id", "")).strip()
         if _valid_room(room_id):
-            join_room(f"patient:{room_id}", namespace="/patient")
-            socketio.emit("patient:joined", {"room_id": room_id}, to=f"patient:{room_id}", namespace="/patient")
+            # last_seq/epoch (optional) come from the client's previous connection
+            _join_patient_room(room_id, data)
         else:
             # Notify this socket that the room id was invalid (no join).
-            socketio.emit("patient:error", {"error": "invalid_room", "room_id": room_id}, namespace="/patient")
+            socketio.emit("patient:error", {"error": "invalid_room", "room_id": room_id},
+                          to=request.sid, namespace="/patient")
     except Exception as e:
         print(f"[patient] join error: {e}")
-        socketio.emit("patient:error", {"error": "join_exception"}, namespace="/patient")
+        socketio.emit("patient:error", {"error": "join_exception"}, to=request.sid, namespace="/patient")
+
+@socketio.on("chat:step", namespace="/patient")
+def patient_chat_step(data):
+    """
+    /api/chat/step over the tablet's socket; the reply is the ack. The session
+    is the one from the socket's handshake (updates to it persist with a
+    server-side SESSION_BACKEND only), so chat.html keeps the node it shows
+    in the page URL and /chat renders that on a reload.
+    """
+    try:
+        body, _ = _api_chat_step(data, client=session.get("rate_limit_id") or request.sid)
+        return body
+    except Exception as e:
+        print(f"[patient] chat:step error: {e}")
+        return {"ok": False, "error": "step_failed"}
 
 @socketio.on("disconnect", namespace="/patient")
 def patient_disconnect(reason=None):
     # You can keep your logging and also see the reason if it's provided
     print("[patient] client disconnected", f"reason={reason!r}")
+    patient_presence.leave(request.sid)
+
+# --- Dashboard (default namespace) connections feed the emit queue ---
+@socketio.on("connect")
+def dashboard_connect(auth=None):
+    dashboard_events.register(request.sid)
+
+@socketio.on("disconnect")
+def dashboard_disconnect(reason=None):
+    dashboard_events.unregister(request.sid)
+
+@socketio.on("dashboard:hello")
+def dashboard_hello(data):
+    """Protocol negotiation; the reply (ack) tells the client which one it got."""
+    data = data or {}
+    muted = dashboard_events.mute(request.sid, data.get("mute") or ())
+    if data.get("protocol") == compact_events.PROTOCOL and dashboard_events.set_batched(request.sid):
+        return {"protocol": compact_events.PROTOCOL, "muted": muted}
+    return {"protocol": "json", "muted": muted}
 
 # --- Default error logger for any namespace/event ---
 @socketio.on_error_default
@@ -1656,11 +2138,23 @@ def on_join(data):
     if room:
         join_room(room)
 
+def _staff_socket_limited(event: str) -> bool:
+    """Per-socket limit on staff actions; tells the dashboard when it is hit."""
+    limited = rate_limiter.check(("staff_socket", request.sid))
+    if not limited:
+        return False
+    print(f"[{event}] rate limited sid={request.sid}")
+    socketio.emit("rate_limited", {"event": event, "retry_after": round(limited[1], 1)}, to=request.sid)
+    return True
+
 @socketio.on("acknowledge_request")
 def handle_acknowledge(data):
     """
     Accepts both new and legacy payloads.
     """
+    if _staff_socket_limited("acknowledge_request"):
+        return
+    started = perf_counter()
     try:
         print("\n[acknowledge_request] IN:", data)
 
@@ -1709,6 +2203,7 @@ def handle_acknowledge(data):
             }
             print(f"[acknowledge_request] EMIT to patient:{room_number} -> request:status {payload}")
             emit_patient_event("request:status", room_number, payload)
+            latency.observe("ack_to_patient_emit", perf_counter() - started)
         else:
             print(f"[acknowledge_request] SKIP emit — invalid or missing room: {room_number}")
     except Exception as e:
@@ -1724,15 +2219,32 @@ def handle_defer_request(data):
     try:
         with engine.connect() as connection:
             with connection.begin():
-                connection.execute(
+                deferred = connection.execute(
                     text("""
-                        UPDATE requests
+                        UPDATE requests r
                         SET category = 'nurse', deferral_timestamp = :now
-                        WHERE request_id = :request_id;
+                        FROM (
+                            SELECT id, category FROM requests
+                            WHERE request_id = :request_id
+                            FOR UPDATE
+                        ) old
+                        WHERE r.id = old.id
+                        RETURNING r.id, r.timestamp, old.category, r.completion_timestamp, r.label_id, r.is_first_baby;
                     """),
                     {"now": now_utc, "request_id": request_id},
-                )
-        socketio.emit(
+                ).fetchall()
+        for pk, created_at, old_category, completed_at, label_id, is_first_baby in deferred:
+            _update_analytics(
+                request_id,
+                lambda c: analytics_rollup.record_category_change(
+                    c, created_at, old_category, "nurse", label_id, is_first_baby, completed_at
+                ),
+                lambda c: staff_workload.record_category_change(c, pk, "nurse"),
+            )
+        for row in deferred:
+            invalidate_analytics_for(row[1])
+            unit_census.rerouted(request_id, "nurse")
+        dashboard_events.publish(
             "request_updated",
             {"id": request_id, "new_role": "nurse", "new_timestamp": now_utc.isoformat()},
         )
@@ -1752,23 +2264,40 @@ def handle_complete_request(data):
     request_id = data.get("request_id")
     if not request_id:
         return  # nothing to do
+    if _staff_socket_limited("complete_request"):
+        return
 
+    started = perf_counter()
     now_utc = datetime.now(timezone.utc)
     try:
         # 1) Mark complete in DB
         with engine.connect() as connection:
             trans = connection.begin()
             try:
-                connection.execute(
+                # Only the first completion counts; repeats keep the original time
+                completed = connection.execute(
                     text("""
                         UPDATE requests
                         SET completion_timestamp = :now
-                        WHERE request_id = :request_id
-                           OR CAST(id AS VARCHAR) = :request_id;
+                        WHERE (request_id = :request_id
+                               OR CAST(id AS VARCHAR) = :request_id)
+                          AND completion_timestamp IS NULL
+                        RETURNING id, timestamp, category, tier, COALESCE(request_id, CAST(id AS VARCHAR));
                     """),
                     {"now": now_utc, "request_id": request_id},
-                )
+                ).fetchall()
                 trans.commit()
+                for pk, created_at, category, tier, _ in completed:
+                    _update_analytics(
+                        request_id,
+                        lambda c: analytics_rollup.record_completion(c, created_at, category, now_utc),
+                        lambda c: response_sketch.record_completion(c, created_at, now_utc, category, tier),
+                        lambda c: staff_workload.record_completion(c, pk, now_utc),
+                    )
+                for row in completed:
+                    invalidate_analytics_for(row[1])
+                    unit_census.closed(row[4])
+                    open_requests.close(row[4])
                 log_to_audit_trail(
                     "Request Completed",
                     f"Request ID: {request_id} marked as complete."
@@ -1778,10 +2307,11 @@ def handle_complete_request(data):
                 raise
 
         # 2) Remove from dashboards
-        socketio.emit("remove_request", {"id": request_id})
+        dashboard_events.publish("remove_request", {"id": request_id})
 
         # 3) Notify patient only when we have a valid room
         room_number = data.get("room_number") or _get_room_for_request(request_id)
+        request_rooms.pop(request_id)
         role = (data.get("role") or "nurse").lower().strip()
         if role not in ("nurse", "cna"):
             role = "nurse"
@@ -1798,6 +2328,7 @@ def handle_complete_request(data):
                     "ts": now_utc.isoformat(),
                 },
             )
+            latency.observe("complete_to_patient_emit", perf_counter() - started)
         # If room is missing/invalid, we just skip the patient emit.
     except Exception as e:
         print(f"ERROR updating completion timestamp: {e}")
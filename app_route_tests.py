@@ -0,0 +1,163 @@
+"""
+Access checks for app routes (no Postgres needed).
+
+Usage:
+    python app_route_tests.py
+
+Imports app.py against a throwaway in-memory SQLite database (unless
+DATABASE_URL is set) and drives it with Flask's test client. Checks that:
+    - /api/analytics/staff refuses anonymous callers and a wrong token, and
+      lets a logged-in manager or the export token through
+    - a button config reload rebuilds the label maps derived from it
+    - a chat step taken over the patient socket survives a page reload
+      (chat.html keeps the node in the URL; the socket can't save a cookie
+      session)
+    - once a room's rate limit is used up on routine taps, the emergency
+      button and a note triaged emergent still go through, and a retry of a
+      tap already sent (same idempotency key) gets its request id back
+    - a repeat press joins the open request but an emergency press never
+      does, and a request whose row wasn't stored is dropped from the open
+      requests and the room cache
+"""
+
+import contextlib
+import io
+import os
+
+from rate_limit import MemoryBuckets, RateLimiter
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("EXPORT_API_TOKEN", "route-tests-token")
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide the app's logging (SQLite can't run the Postgres-only DDL and queries)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+with quiet():
+    import app as app_module
+
+
+KEY = "0b7c6d1e-4f0a-4c1e-9a57-2f1d3e4b5a69"
+
+
+def rate_limit_checks():
+    """Routine taps until the room is limited, then emergent steps (requests go to the throwaway DB)."""
+    checks = []
+    limits = {"chat_session": (3, 0.001), "chat_room": (3, 0.001), "ping_patient": (1, 0.001), "staff_socket": (1, 0.001)}
+    saved, app_module.rate_limiter = app_module.rate_limiter, RateLimiter(MemoryBuckets(), limits)
+    try:
+        flow = app_module.button_configs.get("standard", "en").flow
+        routine = flow.by_label["I need supplies"].id
+        action = flow.by_label["Diapers"].id
+        emergency = next(node for node in flow.nodes.values() if node.tier == "emergent")
+        client = app_module.app.test_client()
+        with quiet():
+            first = client.post("/api/chat/step", json={"node": action, "room": "241", "idempotency_key": KEY})
+            taps = [first.status_code] + [client.post("/api/chat/step", json={"node": routine, "room": "241"}).status_code
+                                          for _ in range(3)]
+            replay = client.post("/api/chat/step", json={"node": action, "room": "241", "idempotency_key": KEY})
+            button = client.post("/api/chat/step", json={"node": emergency.id, "room": "241"})
+            note = client.post("/api/chat/step", json={"note": "I can't breathe", "room": "241"})
+            form = client.post("/chat", data={"node": emergency.id, "room": "241"})
+            after = client.post("/api/chat/step", json={"node": routine, "room": "241"}).status_code
+        checks.append(("routine taps past the burst are limited", taps == [200, 200, 200, 429]))
+        checks.append(("a replayed tap isn't charged: it gets its request back once limited",
+                       first.get_json()["request_id"] and replay.status_code == 200
+                       and replay.get_json()["request_id"] == first.get_json()["request_id"]))
+        checks.append(("emergency button goes through once limited",
+                       button.status_code == 200 and button.get_json()["request_id"]))
+        checks.append(("emergent note goes through once limited",
+                       note.status_code == 200 and note.get_json()["request_id"]))
+        checks.append(("emergency button form post goes through once limited", form.status_code == 302))
+        checks.append(("routine taps are still limited after them", after == 429))
+    finally:
+        app_module.rate_limiter = saved
+    return checks
+
+
+def coalescing_checks():
+    """Open-request bookkeeping around process_request and log_request_to_db."""
+    checks = []
+    flow = app_module.button_configs.get("standard", "en").flow
+    diapers = flow.by_label["Diapers"]
+    emergency = next(node for node in flow.nodes.values() if node.tier == "emergent")
+    open_requests, request_rooms = app_module.open_requests, app_module.request_rooms
+    client = app_module.app.test_client()
+
+    open_requests.open("req_open_diapers", "243", diapers.request_text)
+    open_requests.open("req_open_emergency", "243", emergency.request_text)
+    with quiet():
+        repeat = client.post("/api/chat/step", json={"node": diapers.id, "room": "243"}).get_json()
+        alert = client.post("/api/chat/step", json={"node": emergency.id, "room": "243"}).get_json()
+    checks.append(("a routine repeat press is coalesced", repeat["request_id"] == "req_open_diapers"))
+    checks.append(("an emergency press is never coalesced",
+                   alert["request_id"] not in (None, "req_open_emergency")))
+
+    # The requests INSERT fails on SQLite, as it would with the database down
+    open_requests.open("req_unsaved", "244", diapers.request_text)
+    request_rooms.set("req_unsaved", "244")
+    with quiet():
+        app_module.log_request_to_db("req_unsaved", "cna", diapers.request_text, diapers.reply, "244", None,
+                                     "routine", None)
+    checks.append(("a request that wasn't stored is no longer open",
+                   open_requests.repeat_of("244", diapers.request_text) is None))
+    checks.append(("...nor cached with its room", request_rooms.get("req_unsaved") is None))
+    return checks
+
+
+def run_app_route_tests() -> None:
+    checks = []
+    client = app_module.app.test_client()
+    token = os.environ["EXPORT_API_TOKEN"]
+
+    with quiet():
+        anonymous = client.get("/api/analytics/staff")
+        wrong_token = client.get("/api/analytics/staff", headers={"Authorization": "Bearer nope"})
+        with_token = client.get("/api/analytics/staff", headers={"Authorization": f"Bearer {token}"})
+        with client.session_transaction() as session:
+            session["manager_logged_in"] = True
+        manager = client.get("/api/analytics/staff")
+    checks.append(("staff analytics refuses anonymous callers", anonymous.status_code == 401))
+    checks.append(("...and a wrong token", wrong_token.status_code == 401))
+    checks.append(("...but not the export token", with_token.status_code != 401))
+    checks.append(("...or a logged-in manager", manager.status_code != 401))
+
+    checks.append(("button config reloads rebuild the label maps",
+                   app_module._rebuild_label_maps in app_module.button_configs.on_reload))
+
+    patient = app_module.app.test_client()
+    socket = app_module.socketio.test_client(app_module.app, namespace="/patient", flask_test_client=patient)
+    supplies = app_module.button_configs.get("standard", "en").flow.by_label["I need supplies"]
+    with quiet():
+        step = socket.emit("chat:step", {"node": supplies.id}, namespace="/patient", callback=True)
+        reloaded = patient.get(f"/chat?node={step['node']}").get_data(as_text=True)
+        later = patient.get("/chat").get_data(as_text=True)
+    socket.disconnect(namespace="/patient")
+    checks.append(("socket step answers with the next node", step.get("ok") and step.get("node") == supplies.id))
+    checks.append(("reload with ?node= shows that step", supplies.reply in reloaded))
+    checks.append(("reload without it shows the main menu", supplies.reply not in later))
+
+    checks.extend(rate_limit_checks())
+    checks.extend(coalescing_checks())
+
+    failures = 0
+    print("\n=== App route checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"/api/analytics/staff: anonymous {anonymous.status_code}, wrong token {wrong_token.status_code}, "
+          f"export token {with_token.status_code}, manager {manager.status_code} (SQLite can't run the query)")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL APP ROUTE CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_app_route_tests()
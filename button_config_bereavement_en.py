@@ -22,7 +22,12 @@ button_data = {
     ],
 
     # --- Direct Actions & Simple Sub-menus ---
-    "I'm having an emergency": {"action": "Notify Nurse"},
+    "I'm having an emergency": {
+        "action": "Notify Nurse",
+        "escalation_tier": "emergent",
+        "request_text": "Patient pressed EMERGENCY button: 'I'm having an emergency'.",
+        "subject": "EMERGENCY – patient pressed emergency button",
+    },
     "My IV pump is beeping": {"action": "Notify Nurse"},
 
     "Ice Chips/Water": {
@@ -49,7 +54,17 @@ button_data = {
     },
     "I need help to the bathroom": {"action": "Notify CNA"},
     "I need my IV covered to shower": {"action": "Notify CNA"},
-    "Can I take a shower?": {"note": "Usually yes, but check with your nurse if you have an IV or other restrictions."},
+    "Can I take a shower?": {
+        "note": "Usually yes — but please check with your nurse if you have an IV, had a C-section, or have special instructions.",
+        "options": ["Ask my nurse about taking a shower", "Got it, I'll wait for now"]
+    },
+    "Ask my nurse about taking a shower": {
+        "action": "Notify Nurse",
+        "escalation_tier": "routine",
+        "request_text": "Patient would like to ask about taking a shower.",
+        "subject": "Shower permission request",
+    },
+    "Got it, I'll wait for now": {"note": "Okay — if you change your mind, just let me know anytime."},
 
     # --- Supplies Category ---
     "I need supplies": {
@@ -23,7 +23,12 @@ button_data = {
     ],
 
     # --- Acciones directas / Submenús simples ---
-    "Tengo una emergencia": {"action": "Notify Nurse"},
+    "Tengo una emergencia": {
+        "action": "Notify Nurse",
+        "escalation_tier": "emergent",
+        "request_text": "Patient pressed EMERGENCY button: 'I'm having an emergency'.",
+        "subject": "EMERGENCY – patient pressed emergency button",
+    },
     "Mi bomba de IV está sonando": {"action": "Notify Nurse"},
 
     "Hielo / Agua": {
@@ -23,7 +23,12 @@ button_data = {
     ],
 
     # --- 直接请求 / 简单子菜单 ---
-    "我有紧急情况": {"action": "Notify Nurse"},
+    "我有紧急情况": {
+        "action": "Notify Nurse",
+        "escalation_tier": "emergent",
+        "request_text": "Patient pressed EMERGENCY button: 'I'm having an emergency'.",
+        "subject": "EMERGENCY – patient pressed emergency button",
+    },
     "我的静脉输液泵在响": {"action": "Notify Nurse"},
 
     "冰块/水": {
@@ -31,6 +31,8 @@ button_data = {
     "I'm having an emergency": {
         "action": "Notify Nurse",
         "escalation_tier": "emergent",
+        "request_text": "Patient pressed EMERGENCY button: 'I'm having an emergency'.",
+        "subject": "EMERGENCY – patient pressed emergency button",
     },
 
     "My IV pump is beeping": {
@@ -100,9 +102,16 @@ button_data = {
         "escalation_tier": "routine",
     },
     "Can I take a shower?": {
-        "note": "Usually yes, but check with your nurse if you have an IV or other restrictions.",
-        "follow_up": True
+        "note": "Usually yes — but please check with your nurse if you have an IV, had a C-section, or have special instructions.",
+        "options": ["Ask my nurse about taking a shower", "Got it, I'll wait for now"]
     },
+    "Ask my nurse about taking a shower": {
+        "action": "Notify Nurse",
+        "escalation_tier": "routine",
+        "request_text": "Patient would like to ask about taking a shower.",
+        "subject": "Shower permission request",
+    },
+    "Got it, I'll wait for now": {"note": "Okay — if you change your mind, just let me know anytime."},
 
     # --- Supplies Category ---
     "I need supplies": {
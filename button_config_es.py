@@ -31,17 +31,19 @@ button_data = {
 
     # --- Direct Actions & Simple Sub-menus ---
     "Tengo una emergencia": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "emergent",
+        "request_text": "Patient pressed EMERGENCY button: 'I'm having an emergency'.",
+        "subject": "EMERGENCY – patient pressed emergency button",
     },
 
     "Mi bomba de IV está sonando": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
 
     "Necesito ayuda para amamantar": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
         "note": "✅ Se ha notificado a su enfermera. Mientras tanto, puede prepararse asegurándose de que su bebé tenga un pañal limpio y esté desvestido para el contacto piel con piel."
     },
@@ -51,11 +53,11 @@ button_data = {
         "options": ["Mamá (azúcar en la sangre)", "Bebé (azúcar en la sangre)"]
     },
     "Mamá (azúcar en la sangre)": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Bebé (azúcar en la sangre)": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
 
@@ -69,19 +71,19 @@ button_data = {
         ]
     },
     "Necesito agua con hielo": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Necesito hielo picado": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Necesito agua, sin hielo": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Necesito agua caliente": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
@@ -94,11 +96,11 @@ button_data = {
         ]
     },
     "Necesito ayuda para ir al baño": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Necesito cubrir mi vía IV para bañarme": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "¿Puedo tomar una ducha?": {
@@ -121,19 +123,19 @@ button_data = {
     },
 
     "Almohadas": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Pañales": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Manta para envolver": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Toallitas húmedas": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
@@ -148,28 +150,28 @@ button_data = {
         ]
     },
     "Similac Total Comfort (etiqueta morada)": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Similac 360 (etiqueta azul)": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Similac Neosure (etiqueta amarilla)": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Enfamil Newborn (etiqueta amarilla)": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Enfamil Gentlease (etiqueta morada)": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
     "Ropa interior de malla": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Toallas sanitarias": {
@@ -177,11 +179,11 @@ button_data = {
         "options": ["Toallas azules", "Toallas blancas"]
     },
     "Toallas azules": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Toallas blancas": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
@@ -194,15 +196,15 @@ button_data = {
         ]
     },
     "Compresa de hielo para el perineo": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Compresa de hielo para la incisión de la cesárea": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Compresa de hielo para los senos": {
-        "action": "Notificar al asistente de enfermería",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
@@ -212,23 +214,23 @@ button_data = {
         "options": ["Dolor", "Náuseas/Vómitos", "Picazón", "Dolor por gases", "Estreñimiento"]
     },
     "Dolor": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
     "Náuseas/Vómitos": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
     "Picazón": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
     "Dolor por gases": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
     "Estreñimiento": {
-        "action": "Notificar a la enfermera",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
 
@@ -30,17 +30,19 @@ button_data = {
 
     # --- 直接操作 / 简单子菜单 ---
     "我有紧急情况": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "emergent",
+        "request_text": "Patient pressed EMERGENCY button: 'I'm having an emergency'.",
+        "subject": "EMERGENCY – patient pressed emergency button",
     },
 
     "我的静脉输液泵在响": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
 
     "我需要母乳喂养方面的帮助": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
         "note": "✅ 您的护士已接到通知。在此期间，请确保宝宝尿布干净，并脱去衣物进行肌肤接触。"
     },
@@ -50,11 +52,11 @@ button_data = {
         "options": ["妈妈（血糖）", "宝宝（血糖）"]
     },
     "妈妈（血糖）": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "宝宝（血糖）": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
 
@@ -63,19 +65,19 @@ button_data = {
         "options": ["我需要冰水", "我需要冰块", "我需要不加冰的水", "我需要热水"]
     },
     "我需要冰水": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "我需要冰块": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "我需要不加冰的水": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "我需要热水": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
@@ -84,11 +86,11 @@ button_data = {
         "options": ["我需要帮助去卫生间", "我需要包裹静脉输液管以便洗澡", "我可以洗澡吗？"]
     },
     "我需要帮助去卫生间": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "我需要包裹静脉输液管以便洗澡": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "我可以洗澡吗？": {
@@ -111,19 +113,19 @@ button_data = {
     },
 
     "枕头": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "尿布": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "襁褓巾": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "湿巾": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
@@ -138,28 +140,28 @@ button_data = {
         ]
     },
     "Similac Total Comfort (紫色标签)": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Similac 360 (蓝色标签)": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Similac Neosure (黄色标签)": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Enfamil Newborn (黄色标签)": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "Enfamil Gentlease (紫色标签)": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
     "网眼内裤": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "卫生巾": {
@@ -167,11 +169,11 @@ button_data = {
         "options": ["蓝色卫生巾", "白色卫生巾"]
     },
     "蓝色卫生巾": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "白色卫生巾": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
@@ -180,15 +182,15 @@ button_data = {
         "options": ["用于会阴部的冰袋", "用于剖腹产切口的冰袋", "用于乳房的冰袋"]
     },
     "用于会阴部的冰袋": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "用于剖腹产切口的冰袋": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
     "用于乳房的冰袋": {
-        "action": "通知护理助理",
+        "action": "Notify CNA",
         "escalation_tier": "routine",
     },
 
@@ -198,23 +200,23 @@ button_data = {
         "options": ["疼痛", "恶心/呕吐", "瘙痒", "胀气痛", "便秘"]
     },
     "疼痛": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
     "恶心/呕吐": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
     "瘙痒": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
     "胀气痛": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
     "便秘": {
-        "action": "通知护士",
+        "action": "Notify Nurse",
         "escalation_tier": "routine",
     },
 
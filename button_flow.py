@@ -0,0 +1,122 @@
+"""
+A button config compiled into a state machine for handle_chat.
+
+Every button in a button_data dict becomes a Node with a stable id (a hash of
+its label, so the same label keeps its id across reloads and deploys) and
+everything handle_chat needs precomputed: the reply to show, whether it sends
+a request (role, tier, subject and request text, all from the config entry),
+and which menu comes next. Menus are lists of (id, label) pairs with the back
+button already appended, so the page posts ids and a tap is one dict lookup.
+
+Besides the buttons there are a few built-in nodes: MAIN (greeting and main
+menu), BACK, UNRECOGNIZED (fallback text), EMPTY_NOTE and one "sent_<role>"
+per role for the free-text note path. The session only has to hold the id of
+the node whose reply and menu the next GET renders.
+
+Flow.by_label still resolves display labels, for pages rendered before
+buttons posted ids and for clients that post user_input.
+"""
+
+import hashlib
+
+MAIN = "main"
+BACK = "back"
+UNRECOGNIZED = "unrecognized"
+EMPTY_NOTE = "empty_note"
+
+DEFAULT_NOTIFICATION = "Your request has been sent."
+
+
+def node_id(label):
+    return "b" + hashlib.sha1(label.encode("utf-8")).hexdigest()[:10]
+
+
+def sent_id(role):
+    return f"sent_{role}"
+
+
+class Node:
+    """One state: the reply shown after reaching it and the menu shown with it."""
+
+    __slots__ = ("id", "label", "reply", "menu", "role", "tier", "subject", "request_text")
+
+    def __init__(self, id, label, reply, menu=MAIN, role=None, tier="routine", subject=None, request_text=None):
+        self.id = id
+        self.label = label
+        self.reply = reply
+        self.menu = menu  # id of the node whose options are shown next
+        self.role = role  # set for buttons that send a request
+        self.tier = tier
+        self.subject = subject
+        self.request_text = request_text
+
+
+class Flow:
+    def __init__(self, data, roles):
+        """`roles` maps each action button's label to the role it notifies (ButtonConfig.roles)."""
+        self.errors = []
+        self.nodes = {}
+        self.by_label = {}
+        self.menus = {}
+
+        greeting = data.get("greeting", "")
+        back_text = data.get("back_text", "⬅ Back")
+        self._add(Node(MAIN, None, greeting))
+        self._add(Node(BACK, back_text, greeting))
+        self._add(Node(UNRECOGNIZED, None, data.get(
+            "fallback_unrecognized", "I'm sorry, I didn't understand that. Please use the buttons provided.")))
+        self._add(Node(EMPTY_NOTE, None, data.get("empty_custom_note", "Please type a message in the box.")))
+        for role in sorted(set(roles.values()) | {"cna", "nurse"}):
+            self._add(Node(sent_id(role), None, data.get(f"{role}_notification", DEFAULT_NOTIFICATION)))
+
+        submenus = {}
+        for label, entry in data.items():
+            if not isinstance(entry, dict):
+                continue
+            id = node_id(label)
+            if label in roles:
+                role = roles[label]
+                node = Node(id, label, entry.get("note", data.get(f"{role}_notification", DEFAULT_NOTIFICATION)),
+                            role=role, tier=entry.get("escalation_tier", "routine"),
+                            subject=entry.get("subject", f"{role.upper()} Request"),
+                            request_text=entry.get("request_text", label))
+            else:
+                node = Node(id, label, entry.get("question") or entry.get("note", ""),
+                            menu=id if entry.get("options") else MAIN)
+                if entry.get("options"):
+                    submenus[id] = entry["options"]
+            self._add(node)
+
+        self.menus[MAIN] = self._menu(data.get("main_buttons", []))
+        for id, options in submenus.items():
+            self.menus[id] = self._menu(options) + [(BACK, back_text)]
+
+    def _add(self, node):
+        if node.id in self.nodes:
+            self.errors.append(f"{node.label!r}: node id {node.id} is already used by {self.nodes[node.id].label!r}")
+            return
+        self.nodes[node.id] = node
+        if node.label is not None:
+            self.by_label.setdefault(node.label, node)
+
+    def _menu(self, labels):
+        return [(node_id(label), label) for label in labels if node_id(label) in self.nodes]
+
+    def resolve(self, posted_id, label=None):
+        """The node a POST leads to: by id, else by display label, else UNRECOGNIZED."""
+        node = self.nodes.get(posted_id or "")
+        if node is None and label:
+            node = self.by_label.get(label)
+        return node or self.nodes[UNRECOGNIZED]
+
+    def sent(self, role):
+        return self.nodes.get(sent_id(role)) or self.nodes[sent_id("nurse")]
+
+    def current(self, id):
+        """The node stored in the session, or MAIN if there is none (or it's gone after a reload)."""
+        return self.nodes.get(id or "") or self.nodes[MAIN]
+
+    def page(self, id):
+        """(reply, options) to render for the node stored in the session."""
+        node = self.current(id)
+        return node.reply, self.menus.get(node.menu, self.menus[MAIN])
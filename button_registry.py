@@ -0,0 +1,238 @@
+"""
+Button configs for /demographics and /chat, loaded once and validated.
+
+Each (pathway, language) is a button_config_* module next to this file
+(button_config_<lang>.py for the standard pathway,
+button_config_bereavement_<lang>.py for bereavement) with a `button_data`
+dict: reply texts, `main_buttons`, and one entry per button that is either a
+sub-menu (`options`, with a `question` or `note` as the reply), an answer
+(`note` only), or an `action` ("Notify CNA" or "Notify Nurse", the same in
+every language) with an optional `note`, `escalation_tier`, and the
+`request_text` and email `subject` staff see (default: the button label and
+"<ROLE> Request").
+
+ButtonRegistry.load() reads every config at startup and checks that
+greeting and main_buttons exist, that every main button and option has an
+entry, and that every entry is a sub-menu, an answer or a known action. Each
+ButtonConfig keeps its buttons (entries only, not the text keys) and the role
+each action notifies, and its buttons compiled into a button_flow.Flow, so
+handle_chat does no module imports or string matching per request.
+
+watch() polls the files' modification times and reloads a config that
+changed. A reload that fails to import or validate keeps the version already
+loaded and records why; stats() has the errors and load times. Callbacks in
+on_reload run after each poll that reloaded something, so maps derived from
+the configs (translations, request labels) follow the edit.
+"""
+
+import importlib.util
+import os
+import time
+
+import button_flow
+
+PATHWAYS = ("standard", "bereavement")
+LANGUAGES = ("en", "es", "zh")
+
+# Action -> role it notifies
+ACTIONS = {"Notify CNA": "cna", "Notify Nurse": "nurse"}
+TIERS = ("emergent", "routine")
+
+REQUIRED_TEXTS = ("greeting",)
+
+DEFAULT_RELOAD_SECONDS = 5
+
+
+def module_name(pathway, language):
+    if pathway == "bereavement":
+        return f"button_config_bereavement_{language}"
+    return f"button_config_{language}"
+
+
+def validate(data):
+    """Problems with a button_data dict, as readable strings (empty if none)."""
+    if not isinstance(data, dict):
+        return ["button_data is not a dict"]
+    errors = [f"missing {key!r}" for key in REQUIRED_TEXTS if not isinstance(data.get(key), str)]
+    main_buttons = data.get("main_buttons")
+    if not isinstance(main_buttons, list) or not main_buttons:
+        errors.append("'main_buttons' must be a non-empty list")
+        main_buttons = []
+    for label in main_buttons:
+        if not isinstance(data.get(label), dict):
+            errors.append(f"main button {label!r} has no entry")
+
+    for label, entry in data.items():
+        if not isinstance(entry, dict):
+            continue
+        if not any(key in entry for key in ("action", "question", "note", "options")):
+            errors.append(f"{label!r}: no action, question, note or options")
+        for key in ("question", "note", "request_text", "subject"):
+            if key in entry and not isinstance(entry[key], str):
+                errors.append(f"{label!r}: {key} is not text")
+        if "action" in entry:
+            if entry["action"] not in ACTIONS:
+                errors.append(f"{label!r}: unknown action {entry['action']!r} "
+                              f"(expected one of {', '.join(map(repr, ACTIONS))})")
+            if entry.get("escalation_tier", "routine") not in TIERS:
+                errors.append(f"{label!r}: unknown escalation_tier {entry['escalation_tier']!r}")
+        elif "request_text" in entry or "subject" in entry:
+            errors.append(f"{label!r}: request_text/subject without an action")
+        options = entry.get("options", [])
+        if not isinstance(options, list):
+            errors.append(f"{label!r}: options is not a list")
+            continue
+        if options and "action" in entry:
+            # handle_chat goes back to the main menu after an action
+            errors.append(f"{label!r}: options are never shown after an action")
+        for option in options:
+            if not isinstance(data.get(option), dict):
+                errors.append(f"{label!r}: option {option!r} has no entry")
+    return errors
+
+
+class ButtonConfig:
+    """One validated button_data with its lookup tables."""
+
+    def __init__(self, pathway, language, path, data, load_ms):
+        self.pathway = pathway
+        self.language = language
+        self.path = path
+        self.data = data
+        self.load_ms = load_ms
+        self.errors = validate(data)
+        self.main_buttons = list(data.get("main_buttons", []))
+        # Button entries only: a typed "greeting" is not a button
+        self.buttons = {label: entry for label, entry in data.items() if isinstance(entry, dict)}
+        # Unknown actions notify the nurse, as before validation existed
+        self.roles = {label: ACTIONS.get(entry["action"], "nurse")
+                      for label, entry in self.buttons.items() if "action" in entry}
+        self.flow = button_flow.Flow(data, self.roles)
+        self.errors += self.flow.errors
+        # Rendered chat pages per menu (filled by chat_page.ChatPages; a reload starts empty)
+        self.pages = {}
+
+    def text(self, key, default=None):
+        value = self.data.get(key)
+        return value if isinstance(value, str) else default
+
+
+class ButtonRegistry:
+    def __init__(self, directory, pathways=PATHWAYS, languages=LANGUAGES):
+        self.directory = directory
+        self.keys = [(pathway, language) for pathway in pathways for language in languages]
+        self._configs = {}
+        self.load_errors = {}  # (pathway, language) -> why the file could not be (re)loaded
+        self._seen = {}  # (pathway, language) -> mtime of the file last read
+        self.loaded_at = None
+        self.load_ms = None
+        self.reloads = 0
+        self.running = False
+        self.on_reload = []  # callback(registry) after configs were reloaded
+
+    def path(self, pathway, language):
+        return os.path.join(self.directory, f"{module_name(pathway, language)}.py")
+
+    def _read(self, pathway, language):
+        """A fresh ButtonConfig from disk (not via sys.modules, so edits are seen)."""
+        path = self.path(pathway, language)
+        started = time.perf_counter()
+        spec = importlib.util.spec_from_file_location(module_name(pathway, language), path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return ButtonConfig(pathway, language, path, module.button_data,
+                            round((time.perf_counter() - started) * 1000, 2))
+
+    def load(self):
+        """Load every config; invalid ones are still served (with their errors reported)."""
+        started = time.perf_counter()
+        for key in self.keys:
+            try:
+                self._seen[key] = os.stat(self.path(*key)).st_mtime
+                config = self._read(*key)
+            except Exception as e:
+                self.load_errors[key] = f"{type(e).__name__}: {e}"
+                print(f"ERROR loading button config {module_name(*key)}: {e}")
+                continue
+            self.load_errors.pop(key, None)
+            self._configs[key] = config
+            for error in config.errors:
+                print(f"WARN: {module_name(*key)}: {error}")
+        self.load_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.loaded_at = time.time()
+        return len(self._configs)
+
+    def get(self, pathway, language):
+        """The ButtonConfig for a pathway and language, or None if it never loaded."""
+        return self._configs.get((pathway, language))
+
+    def button_data(self):
+        """{(pathway, language): button_data} for every loaded config."""
+        return {key: config.data for key, config in self._configs.items()}
+
+    def reload_changed(self):
+        """Reload configs whose file changed; returns the (pathway, language) keys reloaded."""
+        reloaded = []
+        for key in self.keys:
+            try:
+                mtime = os.stat(self.path(*key)).st_mtime
+            except OSError:
+                continue
+            if mtime == self._seen.get(key):
+                continue
+            # Seen even if it fails, so a broken file is reported once rather than every poll
+            self._seen[key] = mtime
+            try:
+                config = self._read(*key)
+            except Exception as e:
+                self.load_errors[key] = f"{type(e).__name__}: {e}"
+                print(f"ERROR reloading button config {module_name(*key)}; keeping the loaded one: {e}")
+                continue
+            if config.errors and key in self._configs:
+                self.load_errors[key] = "invalid: " + "; ".join(config.errors)
+                print(f"ERROR: {module_name(*key)} is invalid; keeping the loaded one: {'; '.join(config.errors)}")
+                continue
+            self.load_errors.pop(key, None)
+            self._configs[key] = config
+            self.reloads += 1
+            reloaded.append(key)
+            print(f"Reloaded button config {module_name(*key)}.")
+        if reloaded:
+            for callback in self.on_reload:
+                try:
+                    callback(self)
+                except Exception as e:
+                    print(f"ERROR updating after button config reload ({callback.__name__}): {e}")
+        return reloaded
+
+    def watch(self, sleep, interval=DEFAULT_RELOAD_SECONDS):
+        """Poll for edited config files (run as a background task with the server's sleep)."""
+        self.running = True
+        while self.running:
+            sleep(interval)
+            try:
+                self.reload_changed()
+            except Exception as e:
+                print(f"ERROR checking button configs: {e}")
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        return {
+            "loaded_at": self.loaded_at,
+            "load_ms": self.load_ms,
+            "reloads": self.reloads,
+            "watching": self.running,
+            "configs": {
+                f"{pathway}/{language}": {
+                    "module": module_name(pathway, language),
+                    "buttons": len(config.buttons),
+                    "nodes": len(config.flow.nodes),
+                    "load_ms": config.load_ms,
+                    "errors": config.errors,
+                } if config else None
+                for (pathway, language), config in ((key, self._configs.get(key)) for key in self.keys)
+            },
+            "load_errors": {f"{pathway}/{language}": error for (pathway, language), error in self.load_errors.items()},
+        }
@@ -0,0 +1,150 @@
+"""
+Checks for the button-config registry.
+
+Usage:
+    python button_registry_tests.py
+
+Checks that:
+    - every shipped button_config_* module loads and validates cleanly
+    - every action button in every config notifies a CNA or a nurse
+    - validate() catches a missing main button, an option without an entry
+      and an unknown (e.g. translated) action
+    - the compiled flow: ids are stable and resolve to the same node as the
+      label, sub-menus end with Back, every language's emergency button sends
+      the same English request text, and the shower follow-up sends the
+      request its config entry declares
+    - editing a config on disk is picked up by reload_changed(), and a broken
+      or invalid edit keeps the version already loaded
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import button_flow
+import button_registry
+from button_registry import ButtonRegistry, validate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+GOOD = '''button_data = {
+    "greeting": "Hello!",
+    "main_buttons": ["Ice", "Supplies"],
+    "Ice": {"action": "Notify CNA"},
+    "Supplies": {"question": "Which?", "options": ["Pads"]},
+    "Pads": {"action": "Notify CNA", "escalation_tier": "routine"},
+}
+'''
+
+
+def _write(path, source):
+    with open(path, "w") as f:
+        f.write(source)
+    # Make sure the mtime moves even on coarse-grained file systems
+    stamp = time.time() + 1 + os.stat(path).st_mtime % 1
+    os.utime(path, (stamp, stamp))
+
+
+def run_button_registry_tests() -> None:
+    checks = []
+
+    registry = ButtonRegistry(HERE)
+    loaded = registry.load()
+    checks.append((f"all {len(registry.keys)} shipped configs load", loaded == len(registry.keys)))
+    for pathway, language in registry.keys:
+        config = registry.get(pathway, language)
+        checks.append((f"{pathway}/{language} validates", config is not None and not config.errors))
+        checks.append((f"{pathway}/{language} actions notify cna or nurse",
+                       config is not None and set(config.roles.values()) <= {"cna", "nurse"}
+                       and "cna" in config.roles.values()))
+    checks.append(("text keys are not buttons", "greeting" not in registry.get("standard", "en").buttons))
+
+    flow = registry.get("standard", "en").flow
+    supplies = flow.by_label["I need supplies"]
+    checks.append(("node ids are stable hashes of the label", supplies.id == button_flow.node_id("I need supplies")))
+    checks.append(("posted id and posted label resolve to the same node",
+                   flow.resolve(supplies.id) is flow.resolve(None, "I need supplies") is supplies))
+    checks.append(("unknown id and label resolve to the fallback",
+                   flow.resolve("nope", "nope").id == button_flow.UNRECOGNIZED))
+    reply, options = flow.page(supplies.id)
+    checks.append(("sub-menu shows its question and ends with Back",
+                   reply == "For baby or mom?" and [label for _, label in options] == ["Baby items", "Mom items", "⬅ Back"]))
+    checks.append(("unknown session node renders the main menu",
+                   flow.page("gone") == (flow.nodes[button_flow.MAIN].reply, flow.menus[button_flow.MAIN])))
+    for pathway, language in registry.keys:
+        emergencies = [node for node in registry.get(pathway, language).flow.nodes.values() if node.tier == "emergent"]
+        checks.append((f"{pathway}/{language} emergency button is emergent for the nurse",
+                       len(emergencies) == 1 and emergencies[0].role == "nurse"))
+        # Same text in every language: dashboards, emails and request labels key on it
+        checks.append((f"{pathway}/{language} emergency button sends the English request text",
+                       len(emergencies) == 1 and emergencies[0].request_text
+                       == "Patient pressed EMERGENCY button: 'I'm having an emergency'."))
+    shower = flow.by_label["Can I take a shower?"]
+    ask = flow.by_label["Ask my nurse about taking a shower"]
+    checks.append(("shower question offers the follow-up",
+                   [id for id, _ in flow.menus[shower.menu]] == [ask.id, button_flow.node_id("Got it, I'll wait for now"),
+                                                                 button_flow.BACK]))
+    checks.append(("shower follow-up sends the declared request",
+                   (ask.role, ask.tier, ask.subject, ask.request_text)
+                   == ("nurse", "routine", "Shower permission request", "Patient would like to ask about taking a shower.")))
+
+    bad = {
+        "greeting": "Hi",
+        "main_buttons": ["Ice", "Missing"],
+        "Ice": {"action": "Notificar al asistente de enfermería", "options": ["Nowhere"]},
+    }
+    errors = validate(bad)
+    checks.append(("missing main button is reported", any("'Missing' has no entry" in e for e in errors)))
+    checks.append(("option without an entry is reported", any("'Nowhere' has no entry" in e for e in errors)))
+    checks.append(("translated action is reported", any("unknown action" in e for e in errors)))
+    errors = validate({"greeting": "Hi", "main_buttons": ["Ice"], "Ice": {"note": "Soon", "request_text": "Ice"}})
+    checks.append(("request_text without an action is reported", any("without an action" in e for e in errors)))
+
+    directory = tempfile.mkdtemp(prefix="button_registry_tests_")
+    try:
+        path = os.path.join(directory, f"{button_registry.module_name('standard', 'en')}.py")
+        _write(path, GOOD)
+        registry = ButtonRegistry(directory, pathways=("standard",), languages=("en",))
+        registry.load()
+        checks.append(("temp config loads", registry.get("standard", "en").roles == {"Ice": "cna", "Pads": "cna"}))
+        checks.append(("unchanged file is not reloaded", registry.reload_changed() == []))
+
+        _write(path, GOOD.replace('"Ice": {"action": "Notify CNA"}', '"Ice": {"action": "Notify Nurse"}'))
+        checks.append(("edited file is reloaded", registry.reload_changed() == [("standard", "en")]
+                       and registry.get("standard", "en").roles["Ice"] == "nurse"))
+
+        _write(path, "button_data = {")
+        registry.reload_changed()
+        checks.append(("syntax error keeps the loaded config",
+                       registry.get("standard", "en").roles["Ice"] == "nurse"
+                       and "standard/en" in registry.stats()["load_errors"]))
+
+        _write(path, GOOD.replace('"Pads": {', '"Other": {'))
+        registry.reload_changed()
+        checks.append(("invalid edit keeps the loaded config",
+                       "Pads" in registry.get("standard", "en").buttons
+                       and "invalid" in registry.stats()["load_errors"]["standard/en"]))
+
+        _write(path, GOOD)
+        registry.reload_changed()
+        checks.append(("fixed file reloads and clears the error",
+                       registry.get("standard", "en").roles["Ice"] == "cna" and not registry.stats()["load_errors"]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    failures = 0
+    print("\n=== Button registry tests ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL BUTTON REGISTRY CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_button_registry_tests()
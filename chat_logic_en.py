@@ -1,7 +1,8 @@
 # This file should contain your logic for classifying messages and providing educational answers.
-# The 'education_data' is imported from your education library file.
+# Education answers come from the search index over your education library
+# and knowledge base (see education_index.py).
 
-from education_library_en import education_data
+from education_index import best_section, get_index
 
 def classify_message(user_input):
     """
@@ -15,20 +16,20 @@ def classify_message(user_input):
         return "cna"
     if any(keyword in user_input_lower for keyword in ["medication", "prescription", "doctor", "discharge"]):
         return "nurse"
-    # Check if the input matches any key in the education library
-    if any(key in user_input_lower for key in education_data.keys()):
+    # Check if the input is about a topic in the education index
+    if best_section(get_index(), user_input) is not None:
         return "education"
     return "unknown"
 
 def get_education_response(user_input):
     """
-    Searches the education library for a response matching the user's input.
-    This is the function that was missing.
+    Searches the education index (library + knowledge base) for the section
+    that best answers the user's input, and answers with the sentences of it
+    that match (the snippet), not the whole section.
     """
-    user_input_lower = user_input.lower()
-    for key, value in education_data.items():
-        if key in user_input_lower:
-            return value
+    best = best_section(get_index(), user_input)
+    if best is not None:
+        return best["snippet"]
     return "I'm sorry, I don't have information on that topic. A nurse will be notified."
 
     return "That's a great question. I'll have your nurse come by to talk with you about it."
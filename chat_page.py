@@ -0,0 +1,71 @@
+"""
+Cached rendering of the patient chat page (templates/chat.html).
+
+Everything on the page except the room number and the reply text depends
+only on the button config and the menu being shown, so each (config, menu)
+is rendered through Jinja once, with placeholder tokens where the room and
+reply go, and split into static parts. A GET /chat then joins those parts
+with the escaped room and reply; no template runs per request.
+
+The parts are kept on the ButtonConfig object (config.pages), so a
+hot-reloaded config starts with an empty cache and nothing needs
+invalidating. Pages without a room and pages for a room are cached
+separately, because url_for leaves out ?room= when there is none. A room
+that isn't plain digits (never the case for _valid_room rooms) falls back to
+a full render.
+"""
+
+import re
+
+from markupsafe import escape
+
+ROOM_TOKEN = "ROOM0TOKEN0"  # letters and digits, so url_for and escaping leave it as is
+REPLY_TOKEN = "REPLY0TOKEN0"
+_TOKENS = re.compile(f"({ROOM_TOKEN}|{REPLY_TOKEN})")
+
+
+def _split(html):
+    """[static, token, static, token, ...] for a page rendered with the tokens."""
+    return _TOKENS.split(html)
+
+
+class ChatPages:
+    """
+    `render` is a function (reply, options, room_number) -> html that runs
+    the template (render_template in the app), used to fill the cache and
+    for rooms the tokens can't stand in for.
+    """
+
+    def __init__(self, render):
+        self._render = render
+        self.hits = 0
+        self.misses = 0
+        self.full_renders = 0
+
+    def render(self, config, node, room_number):
+        """The chat page for `node` (its reply and its menu) in config's pathway/language."""
+        options = config.flow.menus.get(node.menu, config.flow.menus["main"])
+        if room_number is not None and not str(room_number).isdigit():
+            self.full_renders += 1
+            return self._render(node.reply, options, room_number)
+
+        key = (node.menu, room_number is not None)
+        parts = config.pages.get(key)
+        if parts is None:
+            self.misses += 1
+            parts = _split(self._render(REPLY_TOKEN, options, ROOM_TOKEN if room_number is not None else None))
+            config.pages[key] = parts
+        else:
+            self.hits += 1
+
+        values = {REPLY_TOKEN: str(escape(node.reply)), ROOM_TOKEN: str(escape(room_number or ""))}
+        return "".join(values.get(part, part) for part in parts)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "full_renders": self.full_renders,
+        }
@@ -0,0 +1,108 @@
+"""
+Checks for the cached chat page (no database needed).
+
+Usage:
+    python chat_page_tests.py
+
+Renders templates/chat.html both ways for every node of every shipped button
+config, with and without a room, and checks that:
+    - the cached page (first render and cache hit) is byte-for-byte the
+      template's output, including replies with quotes and markup
+    - Back and an unknown session node show the greeting and main menu
+    - one page per (menu, room or not) is cached, and a reloaded config
+      starts with an empty cache
+    - a room the tokens can't stand in for is rendered in full
+"""
+
+import os
+
+from flask import Flask, render_template
+
+import button_flow
+from button_registry import ButtonRegistry
+from chat_page import ChatPages
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_app():
+    app = Flask(__name__, template_folder=os.path.join(HERE, "templates"))
+
+    @app.route("/chat", methods=["GET", "POST"])
+    def handle_chat():
+        return ""
+
+    @app.route("/reset-language")
+    def reset_language():
+        return ""
+
+    return app
+
+
+def run_chat_page_tests() -> None:
+    checks = []
+    app = make_app()
+
+    def render(reply, options, room_number):
+        return render_template("chat.html", reply=reply, options=options, room_number=room_number)
+
+    pages = ChatPages(render)
+    registry = ButtonRegistry(HERE)
+    registry.load()
+
+    with app.test_request_context("/chat"):
+        for pathway, language in registry.keys:
+            config = registry.get(pathway, language)
+            flow = config.flow
+            mismatches = 0
+            for node in flow.nodes.values():
+                for room in (None, "245"):
+                    want = render(node.reply, flow.menus.get(node.menu, flow.menus[button_flow.MAIN]), room)
+                    for _ in range(2):  # miss, then hit
+                        mismatches += pages.render(config, node, room) != want
+            checks.append((f"{pathway}/{language}: cached pages match the template for all "
+                           f"{len(flow.nodes)} nodes", mismatches == 0))
+            checks.append((f"{pathway}/{language}: one page per menu and room/no room",
+                           len(config.pages) == 2 * len(flow.menus)))
+
+        config = registry.get("standard", "en")
+        flow = config.flow
+        greeting = config.data["greeting"]
+        for name, node in (("Back", flow.nodes[button_flow.BACK]), ("unknown node", flow.current("gone"))):
+            html = pages.render(config, node, "245")
+            checks.append((f"{name} shows the greeting and main menu",
+                           f'data-default="{greeting}"' in html
+                           and all(f'value="{id}"' in html for id, _ in flow.menus[button_flow.MAIN])
+                           and f'value="{button_flow.BACK}"' not in html))
+
+        node = button_flow.Node("x", None, """It's "fine" <b>&</b>""")
+        html = pages.render(config, node, "245")
+        checks.append(("markup in the reply is escaped like the template does",
+                       html == render(node.reply, flow.menus[button_flow.MAIN], "245") and "<b>" not in html))
+        checks.append(("room fills the URLs and the socket room",
+                       '/chat?room=245"' in html and 'const ROOM_NUMBER = "245"' in html))
+
+        full_renders = pages.full_renders
+        node = flow.nodes[button_flow.MAIN]
+        checks.append(("odd room falls back to a full render",
+                       pages.render(config, node, "12&3") == render(node.reply, flow.menus[button_flow.MAIN], "12&3")
+                       and pages.full_renders == full_renders + 1))
+
+        reloaded = registry._read("standard", "en")
+        checks.append(("reloaded config starts with an empty cache", reloaded.pages == {}))
+
+    failures = 0
+    print("\n=== Chat page cache tests ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL CHAT PAGE CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_chat_page_tests()
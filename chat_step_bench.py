@@ -0,0 +1,164 @@
+"""
+Tap-to-response latency of the patient chat on a throttled network.
+
+Usage:
+    python chat_step_bench.py --database-url postgresql://localhost/call_light_bench \\
+        --profile fast-3g --taps 30
+
+Starts app.py (as load_harness does) behind a local TCP proxy that delays
+every chunk by the profile's one-way latency plus its size over the
+profile's bandwidth, then taps through the same button sequence three ways:
+
+    form     POST /chat, 302, GET /chat (the full page), as before user-046
+    api      POST /api/chat/step, JSON reply
+    socket   'chat:step' on the /patient Socket.IO namespace, reply in the ack
+
+and reports p50/p90/max milliseconds per tap and bytes received per tap.
+The taps only move between menus (no requests are sent), so the numbers are
+the transport's, not the database's.
+
+Profiles approximate the browser devtools presets (RTT, down/up kbit/s):
+    fast-3g   563 ms, 1600/750      slow-3g   2000 ms, 400/400
+    wifi-poor 150 ms, 2000/1000     none      no throttling
+"""
+
+import argparse
+import re
+import socket
+import statistics
+import threading
+import time
+
+import requests
+import socketio
+
+import button_flow
+from load_harness import _free_port, start_app
+
+PROFILES = {
+    "none": (0.0, None, None),
+    "wifi-poor": (0.150, 2000, 1000),
+    "fast-3g": (0.5625, 1600, 750),
+    "slow-3g": (2.0, 400, 400),
+}
+
+# Menu, sub-menu, back: the same labels in every run
+TAPS = ("I need supplies", "Baby items", "⬅ Back", "Bathroom/Shower", "Can I take a shower?", "⬅ Back")
+
+
+class ThrottledProxy:
+    """TCP proxy adding latency and bandwidth limits in each direction."""
+
+    def __init__(self, target_port, rtt_s, down_kbps, up_kbps):
+        self.target_port = target_port
+        self.one_way_s = rtt_s / 2
+        self.down_bps = down_kbps * 1000 / 8 if down_kbps else None
+        self.up_bps = up_kbps * 1000 / 8 if up_kbps else None
+        self.port = _free_port()
+        self.received = 0  # bytes sent back to clients
+        self._lock = threading.Lock()
+        self._server = socket.create_server(("127.0.0.1", self.port))
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self._server.accept()
+            upstream = socket.create_connection(("127.0.0.1", self.target_port))
+            for src, dst, bps, down in ((client, upstream, self.up_bps, False), (upstream, client, self.down_bps, True)):
+                threading.Thread(target=self._pipe, args=(src, dst, bps, down), daemon=True).start()
+
+    def _pipe(self, src, dst, bps, down):
+        try:
+            while True:
+                chunk = src.recv(65536)
+                if not chunk:
+                    break
+                time.sleep(self.one_way_s + (len(chunk) / bps if bps else 0))
+                if down:
+                    with self._lock:
+                        self.received += len(chunk)
+                dst.sendall(chunk)
+        except OSError:
+            pass
+        finally:
+            for s in (src, dst):
+                try:
+                    s.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def _onboard(http, base, room):
+    http.get(f"{base}/room/{room}")
+    http.post(f"{base}/", data={"language": "en"})
+    http.post(f"{base}/demographics", data={"is_first_baby": "yes"})
+
+
+def _node(label):
+    return button_flow.BACK if label == "⬅ Back" else button_flow.node_id(label)
+
+
+def run_mode(mode, base, proxy, room, taps):
+    http = requests.Session()
+    _onboard(http, base, room)
+    sio = None
+    if mode == "socket":
+        sio = socketio.Client()
+        cookie = "; ".join(f"{k}={v}" for k, v in http.cookies.items())
+        sio.connect(base, namespaces=["/patient"], transports=["websocket"], headers={"Cookie": cookie})
+
+    times, sizes = [], []
+    for i in range(taps):
+        node = _node(TAPS[i % len(TAPS)])
+        before = proxy.received
+        started = time.monotonic()
+        if mode == "form":
+            r = http.post(f"{base}/chat?room={room}", data={"node": node})
+            ok = r.status_code == 200 and re.search(r'name="node" value="', r.text)
+        elif mode == "api":
+            r = http.post(f"{base}/api/chat/step", json={"node": node, "room": room})
+            ok = r.status_code == 200 and r.json().get("ok")
+        else:
+            step = sio.call("chat:step", {"node": node, "room": room}, namespace="/patient", timeout=60)
+            ok = step and step.get("ok")
+        times.append((time.monotonic() - started) * 1000)
+        sizes.append(proxy.received - before)
+        if not ok:
+            raise RuntimeError(f"{mode}: tap {i} failed")
+    if sio:
+        sio.disconnect()
+    times.sort()
+    return {
+        "p50_ms": round(statistics.median(times), 1),
+        "p90_ms": round(times[int(len(times) * 0.9)], 1),
+        "max_ms": round(times[-1], 1),
+        "bytes_per_tap": round(statistics.mean(sizes)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast-3g")
+    parser.add_argument("--taps", type=int, default=30)
+    parser.add_argument("--room", default="245")
+    args = parser.parse_args()
+
+    app_port = _free_port()
+    proc, _ = start_app(args.database_url, app_port, {"SHIFT_REPORTS_ENABLED": "0"})
+    try:
+        proxy = ThrottledProxy(app_port, *PROFILES[args.profile])
+        base = f"http://127.0.0.1:{proxy.port}"
+        print(f"Profile {args.profile}: RTT {PROFILES[args.profile][0] * 1000:.0f} ms, "
+              f"{PROFILES[args.profile][1] or '-'}/{PROFILES[args.profile][2] or '-'} kbit/s down/up")
+        for mode in ("form", "api", "socket"):
+            result = run_mode(mode, base, proxy, args.room, args.taps)
+            print(f"  {mode:7s} p50={result['p50_ms']:8.1f}  p90={result['p90_ms']:8.1f}  "
+                  f"max={result['max_ms']:8.1f} ms   {result['bytes_per_tap']} bytes/tap")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
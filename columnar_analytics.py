@@ -0,0 +1,475 @@
+"""
+Columnar snapshot of requests for /analytics (ANALYTICS_ENGINE=columnar).
+
+Every request (plus the imported legacy call lights, as analytics_rollup
+counts them) is one row across a set of column files, each a raw NumPy array
+that is memory-mapped for reads:
+
+    id                  requests.id (legacy_requests.id for the legacy rows, which come first)
+    shift_date          days since 1970-01-01, cut as SHIFT_DATE_SQL
+    hour                hour of creation (0-23)
+    category, tier      codes into meta.json's dictionaries
+    label_id            request_labels id
+    first_baby          1 first baby, 0 not, -1 unknown
+    response_seconds    0 while open
+    response_bin        response_sketch bin of response_seconds, NO_BIN while open
+
+Days, hours and sketch bins are computed by Postgres while exporting, with
+the same SQL as the rollups and sketches, so summary() and sketches() give
+what analytics_rollup.summary() and response_sketch.load() give for the same
+filters. Each read is one np.bincount over a key that combines the grouped
+columns, so the whole snapshot is counted in a single vectorized pass. The
+role and shift filters then become slices of the counts. Only a date range
+selects rows first.
+
+refresh() builds the snapshot once, then keeps it current by appending
+requests with a higher id and rewriting the rows created, completed or
+deferred since the last refresh (less `overlap_seconds`, which also covers
+app/database clock skew). The completion and deferral timestamps are indexed
+for this. A legacy import, or a request that committed after a higher id was
+already exported, means a full rebuild. A full rebuild is written next to the
+snapshot and swapped in. Readers keep the maps they opened.
+
+Differences from the SQL path: the snapshot lags by up to `refresh_seconds`,
+and a request deferred after it was completed counts under its new role in
+the percentiles (the sketches keep the role it was completed under).
+"""
+
+import json
+import os
+import shutil
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+
+import response_sketch
+from analytics_rollup import SHIFT_DATE_SQL, UNKNOWN_CATEGORY
+from request_labels import UNKNOWN_LABEL_ID_SQL
+
+FORMAT_VERSION = 1
+
+COLUMNS = (
+    ("id", np.int32),
+    ("shift_date", np.int32),
+    ("hour", np.int8),
+    ("category", np.int16),
+    ("tier", np.int8),
+    ("label_id", np.int32),
+    ("first_baby", np.int8),
+    ("response_seconds", np.float64),
+    ("response_bin", np.int16),
+)
+DICTIONARY_COLUMNS = ("category", "tier")
+
+# Just below the lowest bin (MIN_SECONDS), so bins offset by NO_BIN are small non-negative ints
+NO_BIN = response_sketch.bin_index(response_sketch.MIN_SECONDS) - 1
+DAY_HOURS = (7, 18)  # 'day' shift, inclusive (analytics_rollup.SHIFT_SQL)
+
+DEFAULT_REFRESH_SECONDS = 60
+DEFAULT_OVERLAP_SECONDS = 300
+DEFAULT_CHUNK_SIZE = 50_000
+
+_EPOCH = date(1970, 1, 1)
+
+_SELECT_SQL = f"""
+    SELECT id,
+           {SHIFT_DATE_SQL.format(col='timestamp')} - DATE '1970-01-01',
+           CAST(EXTRACT(HOUR FROM timestamp) AS INTEGER),
+           COALESCE({{category}}, '{UNKNOWN_CATEGORY}'),
+           COALESCE({{tier}}, 'unknown'),
+           COALESCE(label_id, {UNKNOWN_LABEL_ID_SQL}),
+           CASE WHEN is_first_baby IS TRUE THEN 1 WHEN is_first_baby IS FALSE THEN 0 ELSE -1 END,
+           COALESCE(CAST(EXTRACT(EPOCH FROM (completion_timestamp - timestamp)) AS DOUBLE PRECISION), 0),
+           COALESCE(CASE WHEN completion_timestamp IS NOT NULL THEN {response_sketch.BIN_SQL.format(
+               seconds='EXTRACT(EPOCH FROM (completion_timestamp - timestamp))')} END, {NO_BIN})
+    FROM {{table}}
+    WHERE {{where}}
+    ORDER BY id
+"""
+
+LEGACY_SQL = _SELECT_SQL.format(
+    category="role", tier="NULL", table="""(
+        SELECT id, timestamp, role, label_id, CAST(NULL AS BOOLEAN) AS is_first_baby,
+               CAST(NULL AS TIMESTAMPTZ) AS completion_timestamp
+        FROM legacy_requests
+    ) AS legacy""", where="role IS NOT NULL AND timestamp IS NOT NULL")
+
+REQUESTS_SQL = _SELECT_SQL.format(category="category", tier="tier", table="requests",
+                                  where="timestamp IS NOT NULL {changed}")
+
+CHANGED_SQL = """AND (id > :max_id OR timestamp >= :since
+                      OR completion_timestamp >= :since OR deferral_timestamp >= :since)"""
+
+
+def ensure_tables(connection):
+    """Indexes for the incremental refresh's "changed since" scan."""
+    for column in ("completion_timestamp", "deferral_timestamp"):
+        connection.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS requests_{column}_idx ON requests ({column});
+        """))
+
+
+class _NeedsRebuild(Exception):
+    pass
+
+
+def _days(value):
+    return (value - _EPOCH).days
+
+
+def _to_columns(rows, dictionaries):
+    """Row tuples (in COLUMNS order, strings for the dictionary columns) as arrays."""
+    values = list(zip(*rows))
+    columns = {}
+    for (name, dtype), column in zip(COLUMNS, values):
+        if name in DICTIONARY_COLUMNS:
+            codes = dictionaries[name]
+            column = [codes.setdefault(v, len(codes)) for v in column]
+        columns[name] = np.array(column, dtype=dtype)
+    return columns
+
+
+def _cell_key(first, *rest):
+    """Row-major cell index: first, then each (column, size, offset) as a faster-varying axis."""
+    key = first.astype(np.int64)
+    for column, size, offset in rest:
+        # In place: these are column-length arrays
+        key *= size
+        key += column
+        if offset:
+            key += offset
+    return key
+
+
+class _View:
+    """One consistent read of the snapshot: meta plus a map of each column."""
+
+    def __init__(self, path, meta):
+        self.meta = meta
+        self.rows = meta["rows"]
+        self.columns = {}
+        for name, dtype in COLUMNS:
+            if self.rows:
+                self.columns[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r",
+                                               shape=(self.rows,))
+            else:
+                self.columns[name] = np.empty(0, dtype=dtype)
+        self.dictionaries = {name: list(values) for name, values in meta["dictionaries"].items()}
+        self.labels = {int(label_id): label for label_id, label in meta["labels"].items()}
+
+
+class ColumnarAnalytics:
+    """
+    The snapshot under `path` and the loop that refreshes it. `sleep` is the
+    server's cooperative sleep (socketio.sleep); refreshes call it between
+    chunks so a full build does not hold up requests.
+    """
+
+    def __init__(self, engine, path, refresh_seconds=DEFAULT_REFRESH_SECONDS, sleep=time.sleep,
+                 overlap_seconds=DEFAULT_OVERLAP_SECONDS, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.engine = engine
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.overlap_seconds = overlap_seconds
+        self.chunk_size = chunk_size
+        self._sleep = sleep
+        self._view = None
+        self.running = False
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.last_refresh = None
+        self.last_error = None
+
+    @property
+    def ready(self):
+        return self._view is not None
+
+    # --- files ---
+    def _read_meta(self, path):
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("format") == FORMAT_VERSION else None
+
+    def _write_meta(self, path, meta):
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def load(self):
+        """Open a snapshot left by an earlier run; False if there is none."""
+        meta = self._read_meta(self.path)
+        if meta is not None:
+            self._view = _View(self.path, meta)
+        return meta is not None
+
+    def _append(self, path, rows_before, columns):
+        for name, dtype in COLUMNS:
+            with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                # Drop anything written after the last meta.json (an interrupted refresh)
+                f.truncate(rows_before * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(columns[name]).tobytes())
+
+    def _export(self, connection, sql, params, path, meta):
+        """Append the rows `sql` returns; returns how many."""
+        result = connection.execute(text(sql).execution_options(stream_results=True,
+                                                                max_row_buffer=self.chunk_size), params)
+        added = 0
+        for partition in result.partitions(self.chunk_size):
+            columns = _to_columns(partition, meta["dictionaries"])
+            self._append(path, meta["rows"] + added, columns)
+            added += len(partition)
+            self._sleep(0)
+        return added
+
+    # --- refresh ---
+    def _state(self, connection):
+        db_now, legacy = connection.execute(text("""
+            SELECT now(), (SELECT json_build_array(COUNT(*), COUNT(label_id), COALESCE(MAX(id), 0))
+                           FROM legacy_requests WHERE role IS NOT NULL);
+        """)).one()
+        labels = {str(label_id): label for label_id, label in connection.execute(text(
+            "SELECT id, label FROM request_labels;"))}
+        return db_now, legacy, labels
+
+    def _rebuild(self, connection, db_now, legacy, labels):
+        building = self.path + ".building"
+        shutil.rmtree(building, ignore_errors=True)
+        os.makedirs(building)
+        meta = {"format": FORMAT_VERSION, "rows": 0, "legacy_rows": 0, "max_request_id": 0,
+                "dictionaries": {name: {} for name in DICTIONARY_COLUMNS}}
+        meta["legacy_rows"] = self._export(connection, LEGACY_SQL, {}, building, meta)
+        meta["rows"] = meta["legacy_rows"]
+        meta["rows"] += self._export(connection, REQUESTS_SQL.format(changed=""), {}, building, meta)
+        if meta["rows"] > meta["legacy_rows"]:
+            meta["max_request_id"] = int(np.memmap(os.path.join(building, "id.bin"), dtype=np.int32,
+                                                   mode="r", shape=(meta["rows"],))[-1])
+        meta.update(legacy=legacy, labels=labels, db_now=db_now.isoformat(), built_at=db_now.isoformat())
+        self._write_meta(building, meta)
+
+        old = self.path + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, old)
+        os.replace(building, self.path)
+        shutil.rmtree(old, ignore_errors=True)
+        self._view = _View(self.path, meta)
+        self.rebuilds += 1
+        return meta["rows"]
+
+    def _update(self, connection, db_now, labels):
+        """Append new requests and rewrite changed ones; returns (appended, updated)."""
+        view = self._view
+        meta = json.loads(json.dumps(view.meta))
+        request_ids = view.columns["id"][meta["legacy_rows"]:]
+        params = {"max_id": meta["max_request_id"],
+                  "since": datetime.fromisoformat(meta["db_now"]) - timedelta(seconds=self.overlap_seconds)}
+        result = connection.execute(text(REQUESTS_SQL.format(changed=CHANGED_SQL)).execution_options(
+            stream_results=True, max_row_buffer=self.chunk_size), params)
+
+        appended = updated = 0
+        writable = None
+        for partition in result.partitions(self.chunk_size):
+            columns = _to_columns(partition, meta["dictionaries"])
+            new = columns["id"] > meta["max_request_id"]
+            if not new.all():
+                ids = columns["id"][~new]
+                positions = np.searchsorted(request_ids, ids)
+                found = positions < len(request_ids)
+                found[found] = request_ids[positions[found]] == ids[found]
+                if not found.all():
+                    raise _NeedsRebuild(f"request {int(ids[~found][0])} committed after a later id was exported")
+                positions += meta["legacy_rows"]
+                changed = np.zeros(len(ids), dtype=bool)
+                for name, _ in COLUMNS:
+                    changed |= view.columns[name][positions] != columns[name][~new]
+                if changed.any():
+                    if writable is None:
+                        writable = {name: np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype,
+                                                    mode="r+", shape=(view.rows,)) for name, dtype in COLUMNS}
+                    for name, _ in COLUMNS:
+                        writable[name][positions[changed]] = columns[name][~new][changed]
+                    updated += int(changed.sum())
+            if new.any():
+                self._append(self.path, meta["rows"] + appended, {name: c[new] for name, c in columns.items()})
+                appended += int(new.sum())
+            self._sleep(0)
+        if writable is not None:
+            for column in writable.values():
+                column.flush()
+
+        meta["rows"] += appended
+        if appended:
+            meta["max_request_id"] = int(np.memmap(os.path.join(self.path, "id.bin"), dtype=np.int32,
+                                                   mode="r", shape=(meta["rows"],))[-1])
+        meta.update(labels=labels, db_now=db_now.isoformat())
+        self._write_meta(self.path, meta)
+        self._view = _View(self.path, meta)
+        return appended, updated
+
+    def refresh(self):
+        """Bring the snapshot up to date; returns {"mode", "rows", "appended", "updated", "ms"}."""
+        started = time.perf_counter()
+        if self._view is None:
+            self.load()
+        with self.engine.connect() as connection:
+            db_now, legacy, labels = self._state(connection)
+            appended = updated = 0
+            mode = "rebuild"
+            if self._view is None or self._view.meta["legacy"] != legacy:
+                self._rebuild(connection, db_now, legacy, labels)
+            else:
+                try:
+                    appended, updated = self._update(connection, db_now, labels)
+                    mode = "append"
+                except _NeedsRebuild as e:
+                    print(f"Analytics snapshot: {e}; rebuilding.")
+                    self._rebuild(connection, db_now, legacy, labels)
+        self.refreshes += 1
+        self.last_refresh = {"mode": mode, "rows": self._view.rows, "appended": appended, "updated": updated,
+                             "ms": round((time.perf_counter() - started) * 1000, 1), "at": db_now.isoformat()}
+        return self.last_refresh
+
+    def run_forever(self, on_change=None):
+        """Refresh every refresh_seconds; on_change() runs after a refresh that changed any rows."""
+        self.running = True
+        while self.running:
+            try:
+                result = self.refresh()
+                if on_change is not None and (result["mode"] == "rebuild" or result["appended"]
+                                              or result["updated"]):
+                    on_change()
+                self.last_error = None
+            except Exception as e:
+                print(f"ERROR refreshing analytics snapshot: {e}")
+                self.last_error = str(e)
+            self._sleep(self.refresh_seconds)
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        view = self._view
+        return {
+            "ready": view is not None,
+            "running": self.running,
+            "rows": view.rows if view else 0,
+            "bytes": sum(c.nbytes for c in view.columns.values()) if view else 0,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "last_refresh": self.last_refresh,
+            "last_error": self.last_error,
+        }
+
+    # --- reads (same results as the SQL path; see the module docstring) ---
+    def _rows(self, view, start_date, end_date, names):
+        """The named columns, cut to the shift-date range (role and shift are cut from the counts)."""
+        mask = None
+        if start_date is not None:
+            mask = view.columns["shift_date"] >= _days(start_date)
+        if end_date is not None:
+            before_end = view.columns["shift_date"] <= _days(end_date)
+            mask = before_end if mask is None else mask & before_end
+        return {name: view.columns[name] if mask is None else view.columns[name][mask] for name in names}
+
+    @staticmethod
+    def _cuts(view, role, shift):
+        """Category codes and hours the role/shift filters keep."""
+        categories = view.dictionaries["category"]
+        if role is None:
+            codes = list(range(len(categories)))
+        else:
+            codes = [categories.index(role)] if role in categories else []
+        day = list(range(DAY_HOURS[0], DAY_HOURS[1] + 1))
+        hours = {None: list(range(24)), "day": day}.get(shift, [h for h in range(24) if h not in day])
+        return codes, hours
+
+    def summary(self, start_date=None, end_date=None, role=None, shift=None, top_n=5):
+        """analytics_rollup.summary() over the snapshot."""
+        view = self._view
+        categories = view.dictionaries["category"]
+        codes, hours = self._cuts(view, role, shift)
+        rows = self._rows(view, start_date, end_date,
+                          ("label_id", "first_baby", "hour", "category", "response_seconds", "response_bin"))
+
+        # Count every (label, first baby, hour, category, completed) cell in one bincount,
+        # then the filters are slices and each chart is a sum over some axes
+        n_labels = int(rows["label_id"].max()) + 1 if len(rows["label_id"]) else 1
+        shape = (n_labels, 3, 24, len(categories), 2)
+        cell = _cell_key(rows["label_id"], (rows["first_baby"], 3, 1), (rows["hour"], 24, 0),
+                         (rows["category"], len(categories), 0), (rows["response_bin"] != NO_BIN, 2, 0))
+        cube = np.bincount(cell, minlength=int(np.prod(shape))).reshape(shape)[:, :, hours][:, :, :, codes]
+
+        hour_category = _cell_key(rows["hour"], (rows["category"], len(categories), 0))
+        seconds = np.bincount(hour_category, weights=rows["response_seconds"], minlength=24 * len(categories))
+        total_seconds = float(seconds.reshape(24, len(categories))[hours][:, codes].sum())
+        completed = int(cube[..., 1].sum())
+
+        by_category = cube.sum(axis=(0, 1, 2, 4))
+        by_hour = cube.sum(axis=(0, 1, 3, 4))
+        by_label = cube.sum(axis=(2, 3, 4))  # label x (unknown, multi, first baby)
+        top = {}
+        for name, counts in (("top_labels", by_label.sum(axis=1)), ("top_first_baby", by_label[:, 2]),
+                             ("top_multi_baby", by_label[:, 1])):
+            ids = np.flatnonzero(counts)
+            # Highest count first, ties by label id, as the SQL picks them
+            ids = ids[np.lexsort((ids, -counts[ids]))][:top_n]
+            top[name] = sorted(((view.labels[i], int(counts[i])) for i in ids.tolist() if i in view.labels),
+                               key=lambda item: (-item[1], item[0]))
+
+        return {
+            "avg_response_seconds": total_seconds / completed if completed else None,
+            "by_category": sorted(((categories[code], int(n)) for code, n in zip(codes, by_category) if n > 0),
+                                  key=lambda item: (-item[1], item[0])),
+            "by_hour": {hour: int(n) for hour, n in zip(hours, by_hour) if n},
+            **top,
+        }
+
+    def sketches(self, start_date=None, end_date=None, role=None, shift=None, group_by=()):
+        """response_sketch.load() over the snapshot: {group key tuple: DDSketch}."""
+        view = self._view
+        categories, tiers = view.dictionaries["category"], view.dictionaries["tier"]
+        codes, hours = self._cuts(view, role, shift)
+        rows = self._rows(view, start_date, end_date, ("response_bin", "hour", "category", "tier"))
+
+        # Bin counts per (hour, category, tier) in one bincount; open rows all land in the NO_BIN slot
+        span = int(rows["response_bin"].max()) - NO_BIN + 1 if len(rows["response_bin"]) else 1
+        shape = (24, len(categories), len(tiers), span)
+        cell = _cell_key(rows["hour"], (rows["category"], len(categories), 0), (rows["tier"], len(tiers), 0),
+                         (rows["response_bin"], span, -NO_BIN))
+        cube = np.bincount(cell, minlength=int(np.prod(shape))).reshape(shape)[hours][:, codes]
+        cube[..., 0] = 0
+
+        day = [h for h in hours if DAY_HOURS[0] <= h <= DAY_HOURS[1]]
+        shifts = (("day", [i for i, h in enumerate(hours) if h in day]),
+                  ("night", [i for i, h in enumerate(hours) if h not in day]))
+        group_cols = [c for c in group_by if c in ("role", "tier", "shift")]
+        groups = [((), cube)]
+        for name in group_cols:
+            split = []
+            for key, counts in groups:
+                if name == "role":
+                    split += [(key + (categories[code],), counts[:, [i]]) for i, code in enumerate(codes)]
+                elif name == "tier":
+                    split += [(key + (tier,), counts[:, :, [i]]) for i, tier in enumerate(tiers)]
+                else:
+                    split += [(key + (label,), counts[picked]) for label, picked in shifts if picked]
+            groups = split
+
+        sketches = {}
+        for key, counts in groups:
+            bins = counts.reshape(-1, span).sum(axis=0)
+            for index in np.flatnonzero(bins).tolist():
+                sketches.setdefault(key, response_sketch.DDSketch()).add_bin(index + NO_BIN, int(bins[index]))
+        return sketches
+
+    def categories(self):
+        """Roles that have any requests, for the filter drop-down."""
+        view = self._view
+        counts = np.bincount(view.columns["category"], minlength=len(view.dictionaries["category"]))
+        return sorted(name for name, n in zip(view.dictionaries["category"], counts) if n)
@@ -0,0 +1,159 @@
+"""
+Checks for the columnar analytics snapshot's vectorized reads.
+
+Usage:
+    python columnar_analytics_tests.py
+
+Writes a random snapshot (no database needed) in several appends, the way
+refresh() grows it, and checks that:
+    - summary() matches a plain-Python recount of the same rows, for
+      date/role/shift filters alone and combined
+    - sketches() grouped by role/tier hold the same bins as DDSketches fed
+      the rows one at a time
+    - an append interrupted before meta.json was written is dropped by the next one
+"""
+
+import os
+import random
+import shutil
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+
+import response_sketch
+from columnar_analytics import COLUMNS, DICTIONARY_COLUMNS, FORMAT_VERSION, NO_BIN, ColumnarAnalytics, _to_columns
+
+ROLES = ("nurse", "cna", "unknown")
+TIERS = ("emergent", "routine", "unknown")
+LABELS = {1: "Unknown", 2: "Diapers", 3: "Wipes", 4: "I need ice chips", 5: "Pain", 6: "Note: Other"}
+FIRST_DAY = date(2026, 9, 1)
+
+
+def random_rows(rng, n, first_id):
+    rows = []
+    for i in range(n):
+        seconds = rng.lognormvariate(5, 1) if rng.random() < 0.85 else None
+        rows.append((
+            first_id + i,
+            (FIRST_DAY - date(1970, 1, 1)).days + rng.randrange(30),
+            rng.randrange(24),
+            rng.choice(ROLES),
+            rng.choice(TIERS),
+            rng.choice(list(LABELS)),
+            rng.choice((1, 0, -1)),
+            0.0 if seconds is None else seconds,
+            NO_BIN if seconds is None else response_sketch.bin_index(seconds),
+        ))
+    return rows
+
+
+def brute_summary(rows, start_date, end_date, role, shift, top_n=5):
+    def keep(row):
+        day = date(1970, 1, 1) + timedelta(days=row[1])
+        row_shift = "day" if 7 <= row[2] <= 18 else "night"
+        return ((start_date is None or day >= start_date) and (end_date is None or day <= end_date)
+                and (role is None or row[3] == role) and (shift is None or row_shift == shift))
+
+    selected = [row for row in rows if keep(row)]
+    by_category, by_hour = {}, {}
+    tops = {"top_labels": {}, "top_first_baby": {}, "top_multi_baby": {}}
+    completed, seconds = 0, 0.0
+    for row in selected:
+        by_category[row[3]] = by_category.get(row[3], 0) + 1
+        by_hour[row[2]] = by_hour.get(row[2], 0) + 1
+        if row[8] != NO_BIN:
+            completed += 1
+            seconds += row[7]
+        for name, wanted in (("top_labels", None), ("top_first_baby", 1), ("top_multi_baby", 0)):
+            if wanted is None or row[6] == wanted:
+                tops[name][row[5]] = tops[name].get(row[5], 0) + 1
+
+    result = {
+        "avg_response_seconds": seconds / completed if completed else None,
+        "by_category": sorted(by_category.items(), key=lambda item: (-item[1], item[0])),
+        "by_hour": by_hour,
+    }
+    for name, counts in tops.items():
+        picked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top_n]
+        result[name] = sorted(((LABELS[i], n) for i, n in picked), key=lambda item: (-item[1], item[0]))
+    return result
+
+
+def run_columnar_analytics_tests() -> None:
+    rng = random.Random(7)
+    path = tempfile.mkdtemp(prefix="columnar_tests_")
+    checks = []
+    try:
+        snapshot = ColumnarAnalytics(engine=None, path=path)
+        meta = {"format": FORMAT_VERSION, "rows": 0, "legacy_rows": 0, "max_request_id": 0,
+                "dictionaries": {name: {} for name in DICTIONARY_COLUMNS},
+                "labels": {str(i): label for i, label in LABELS.items()}, "legacy": [0, 0, 0]}
+        rows = []
+        for size in (5000, 1, 2500):
+            chunk = random_rows(rng, size, len(rows) + 1)
+            snapshot._append(path, meta["rows"], _to_columns(chunk, meta["dictionaries"]))
+            rows += chunk
+            meta["rows"] = len(rows)
+        # An append that never reached meta.json, then a real one
+        snapshot._append(path, meta["rows"], _to_columns(random_rows(rng, 300, 10**6), meta["dictionaries"]))
+        chunk = random_rows(rng, 700, len(rows) + 1)
+        snapshot._append(path, meta["rows"], _to_columns(chunk, meta["dictionaries"]))
+        rows += chunk
+        meta["rows"] = len(rows)
+        snapshot._write_meta(path, meta)
+        snapshot.load()
+
+        sizes = {os.path.getsize(os.path.join(path, f"{name}.bin")) // np.dtype(dtype).itemsize
+                 for name, dtype in COLUMNS}
+        checks.append(("interrupted append is overwritten", sizes == {len(rows)}))
+        checks.append(("ids read back in order",
+                       snapshot._view.columns["id"].tolist() == [row[0] for row in rows]))
+
+        week = (FIRST_DAY + timedelta(days=10), FIRST_DAY + timedelta(days=16))
+        for name, filters in (
+            ("all rows", (None, None, None, None)),
+            ("date range", (*week, None, None)),
+            ("role", (None, None, "cna", None)),
+            ("night shift", (None, None, None, "night")),
+            ("range + role + day shift", (*week, "nurse", "day")),
+            ("role with no rows", (None, None, "charge nurse", None)),
+        ):
+            got = snapshot.summary(*filters)
+            want = brute_summary(rows, *filters)
+            same_avg = (got["avg_response_seconds"] is None) == (want["avg_response_seconds"] is None) and (
+                got["avg_response_seconds"] is None
+                or abs(got["avg_response_seconds"] - want["avg_response_seconds"]) < 1e-6)
+            got.pop("avg_response_seconds"), want.pop("avg_response_seconds")
+            checks.append((f"summary: {name}", same_avg and got == want))
+
+        expected = {}
+        for row in rows:
+            if row[8] != NO_BIN:
+                expected.setdefault((row[3], row[4]), response_sketch.DDSketch()).add(row[7])
+        got = snapshot.sketches(group_by=("role", "tier"))
+        checks.append(("sketches by role/tier match DDSketch.add",
+                       got.keys() == expected.keys() and all(got[k].bins == expected[k].bins for k in got)))
+        overall = snapshot.sketches().get(())
+        checks.append(("ungrouped sketch counts every completed row",
+                       overall is not None and overall.count == sum(1 for row in rows if row[8] != NO_BIN)))
+        checks.append(("role filter with no rows gives no sketches", snapshot.sketches(role="charge nurse") == {}))
+        checks.append(("categories are the roles with rows", snapshot.categories() == sorted(ROLES)))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    failures = 0
+    print("\n=== Columnar analytics tests ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL COLUMNAR ANALYTICS CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_columnar_analytics_tests()
@@ -0,0 +1,96 @@
+"""
+Compact wire format for dashboard events ("compact-v1").
+
+Opt-in per socket: dashboard.html sends dashboard:hello with the protocol it
+speaks and, if the server has DASHBOARD_COMPACT_PROTOCOL enabled, its queued
+events are delivered as one "batch" frame per send window:
+
+    ["n", {"i": "req_1", "m": "241", "q": "Pain", "o": "nurse", "t": "r", "ts": 1760000000000}]
+
+  - event names and payload keys are shortened (EVENT_CODES / KEY_CODES)
+  - ISO timestamps become epoch milliseconds
+  - tier/role values are single letters
+Events without a code (e.g. new_audit_log) ride along in the batch with their
+full name and payload unchanged. decode() is the inverse, used by tests and
+the load harness; dashboard.html has the same tables in JS.
+"""
+
+from datetime import datetime
+
+PROTOCOL = "compact-v1"
+BATCH_EVENT = "batch"
+
+EVENT_CODES = {
+    "new_request": "n",
+    "request_updated": "u",
+    "remove_request": "r",
+}
+
+KEY_CODES = {
+    "id": "i",
+    "room": "m",
+    "request": "q",
+    "role": "o",
+    "tier": "t",
+    "timestamp": "ts",
+    "new_role": "nr",
+    "new_timestamp": "nt",
+    "repeat_count": "rc",
+    "last_repeat_at": "lr",
+}
+
+VALUE_CODES = {
+    "tier": {"routine": "r", "emergent": "e"},
+    "role": {"nurse": "n", "cna": "c"},
+    "new_role": {"nurse": "n", "cna": "c"},
+}
+
+TIMESTAMP_KEYS = ("timestamp", "new_timestamp", "last_repeat_at")
+
+_EVENT_NAMES = {v: k for k, v in EVENT_CODES.items()}
+_KEY_NAMES = {v: k for k, v in KEY_CODES.items()}
+_VALUE_NAMES = {key: {v: k for k, v in codes.items()} for key, codes in VALUE_CODES.items()}
+
+
+def _to_epoch_ms(value):
+    if not isinstance(value, str):
+        return value
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except ValueError:
+        return value
+
+
+def encode(event, payload):
+    """One queued event -> [code, compact payload] (unknown events pass through)."""
+    code = EVENT_CODES.get(event)
+    if code is None or not isinstance(payload, dict):
+        return [event, payload]
+    out = {}
+    for key, value in payload.items():
+        if key in TIMESTAMP_KEYS:
+            value = _to_epoch_ms(value)
+        elif key in VALUE_CODES:
+            value = VALUE_CODES[key].get(value, value)
+        out[KEY_CODES.get(key, key)] = value
+    return [code, out]
+
+
+def encode_batch(events):
+    """[(event, payload), ...] -> payload of a single batch frame."""
+    return [encode(event, payload) for event, payload in events]
+
+
+def decode(item):
+    """Inverse of encode(); timestamps come back as epoch milliseconds."""
+    code, payload = item
+    event = _EVENT_NAMES.get(code)
+    if event is None:
+        return code, payload
+    out = {}
+    for key, value in payload.items():
+        name = _KEY_NAMES.get(key, key)
+        if name in _VALUE_NAMES:
+            value = _VALUE_NAMES[name].get(value, value)
+        out[name] = value
+    return event, out
@@ -0,0 +1,217 @@
+"""
+Streaming export of requests and audit_log for offline analysis.
+
+Usage:
+    python data_export.py --database-url postgresql://localhost/call_light \\
+        --table requests --format csv --start 2025-01-01 --end 2025-03-31 --out requests.csv
+    python data_export.py --table audit_log --format parquet --out audit_log.parquet
+
+The same generators back GET /export/<table> in app.py. Rows come off a
+server-side cursor `chunk_size` at a time and each chunk is written out
+(CSV text, or one Parquet row group) before the next is fetched, so memory
+stays flat however many rows there are. --start/--end are inclusive calendar
+dates in the database session time zone.
+
+requests rows carry user_input as stored (already the English label for
+button taps; [ES]/[ZH]-tagged for free text), the request_labels label
+/analytics groups by, the triage fields (category, tier) and derived
+response_seconds / shift / shift_date.
+
+Parquet needs pyarrow, which is not in requirements.txt; install it where
+exports are run.
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, text
+
+from analytics_rollup import SHIFT_DATE_SQL, SHIFT_SQL
+
+DEFAULT_CHUNK_SIZE = 5000
+FORMATS = ("csv", "parquet")
+
+# (column name, SQL expression, Parquet type name)
+TABLES = {
+    "requests": [
+        ("id", "id", "int64"),
+        ("request_id", "request_id", "string"),
+        ("timestamp", "timestamp", "timestamp"),
+        ("completion_timestamp", "completion_timestamp", "timestamp"),
+        ("deferral_timestamp", "deferral_timestamp", "timestamp"),
+        ("room", "room", "string"),
+        ("user_input", "user_input", "string"),
+        ("label", "(SELECT l.label FROM request_labels l WHERE l.id = label_id)", "string"),
+        ("category", "category", "string"),
+        ("tier", "tier", "string"),
+        ("is_first_baby", "is_first_baby", "bool"),
+        ("reply", "reply", "string"),
+        ("response_seconds", "CAST(EXTRACT(EPOCH FROM (completion_timestamp - timestamp)) AS DOUBLE PRECISION)",
+         "float64"),
+        ("shift", f"CASE WHEN timestamp IS NOT NULL THEN {SHIFT_SQL.format(col='timestamp')} END", "string"),
+        ("shift_date", SHIFT_DATE_SQL.format(col="timestamp"), "date"),
+    ],
+    "audit_log": [
+        ("id", "id", "int64"),
+        ("timestamp", "timestamp", "timestamp"),
+        ("event_type", "event_type", "string"),
+        ("details", "details", "string"),
+    ],
+}
+
+
+def columns(table):
+    return [name for name, _, _ in TABLES[table]]
+
+
+def iter_chunks(connection, table, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lists of row tuples, in id order, read through a server-side cursor."""
+    if table not in TABLES:
+        raise ValueError(f"unknown table {table!r}; expected one of {', '.join(TABLES)}")
+    select = ", ".join(f"{sql} AS {name}" for name, sql, _ in TABLES[table])
+    query = text(f"""
+        SELECT {select}
+        FROM {table}
+        WHERE (CAST(:start AS DATE) IS NULL OR timestamp >= CAST(:start AS DATE))
+          AND (CAST(:end AS DATE) IS NULL OR timestamp < CAST(:end AS DATE) + 1)
+        ORDER BY id;
+    """).execution_options(stream_results=True, max_row_buffer=chunk_size)
+    result = connection.execute(query, {"start": start, "end": end})
+    # Explicit size: partitions() without one fetches everything on Core text() queries
+    for partition in result.partitions(chunk_size):
+        yield [tuple(row) for row in partition]
+
+
+def csv_stream(table, chunks):
+    """CSV text, one string per chunk (header first)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns(table))
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _Drain:
+    """Write-only file object whose contents are taken after every row group."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def parquet_stream(table, chunks):
+    """Parquet bytes, one row group per chunk; the footer comes last."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    types = {
+        "int64": pa.int64(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "bool": pa.bool_(),
+        "float64": pa.float64(),
+        "date": pa.date32(),
+    }
+    schema = pa.schema([(name, types[kind]) for name, _, kind in TABLES[table]])
+    sink = _Drain()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="snappy") as writer:
+        for rows in chunks:
+            columns_data = list(zip(*rows)) if rows else [[] for _ in schema]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns_data, schema)],
+                schema=schema,
+            ))
+            yield sink.take()
+    yield sink.take()
+
+
+def stream(table, fmt, chunks):
+    if fmt == "csv":
+        return csv_stream(table, chunks)
+    if fmt == "parquet":
+        return parquet_stream(table, chunks)
+    raise ValueError(f"unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process in MB (Linux ru_maxrss is KB); None where `resource` is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--table", choices=list(TABLES), default="requests")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--start", type=date.fromisoformat, help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day to include (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--out", default="-", help="output file ('-' for stdout)")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url (or DATABASE_URL) is required")
+
+    engine = create_engine(args.database_url)
+    out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+    rows = 0
+    written = 0
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            def counted():
+                nonlocal rows
+                for chunk in iter_chunks(connection, args.table, args.start, args.end, args.chunk_size):
+                    rows += len(chunk)
+                    yield chunk
+
+            for part in stream(args.table, args.format, counted()):
+                data = part.encode("utf-8") if isinstance(part, str) else part
+                out.write(data)
+                written += len(data)
+    except RuntimeError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        raise SystemExit(1)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    peak_mb = _peak_rss_mb()
+    peak = f"peak RSS {peak_mb:.0f} MB" if peak_mb is not None else "peak RSS n/a"
+    print(f"Exported {rows} {args.table} rows ({written / 1e6:.1f} MB {args.format}) in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed else 0:,.0f} rows/s, {peak})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Search index over the patient education content.
+
+Sources, split into one section per topic:
+
+    en  education_library_en.education_data (one section per key) and
+        knowledge.KNOWLEDGE_BASE (one "Topic: text" line per section; a line
+        without a topic of its own continues the section above it).
+        education_keywords are extra terms for their topic's library
+        section and for the knowledge section with the same title.
+    es  chat_logic_es.EDUCATION_RESPONSES
+    zh  chat_logic_zh.EDUCATION_RESPONSES
+
+Each language gets an inverted index (term -> [(section, term frequency)])
+scored with BM25; title terms count TITLE_WEIGHT times and keywords
+KEYWORD_WEIGHT times. Terms are lowercased, accent-folded words with stop
+words dropped; English words are reduced with a few suffix rules ("pains" ->
+"pain", "feeding" -> "feed", "babies" -> "baby") and Spanish ones are cut to
+their first SPANISH_STEM_CHARS letters ("ducharme", "ducharse" -> "ducha"),
+the same for content and questions, which keeps a query well under a
+millisecond (spaCy's lemmatizer would cost more than the search). Chinese has
+no spaces, so CJK runs are indexed as single characters and character pairs.
+
+search() returns the best sections with a snippet: the sentences that match
+the most query terms, in their original order. best_section() only answers
+when the top hit shares a term with the question in its title or keywords
+(or, failing that, matches its text very strongly). The built index is written as
+JSON with a fingerprint of the sources (EDUCATION_INDEX_PATH), and
+load_or_build() reuses it until the content changes. Adding es/zh content to
+default_sources() is all it takes to make it searchable.
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+import unicodedata
+
+FORMAT = 2
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 3
+KEYWORD_WEIGHT = 5  # education_keywords are hand-picked for their topic
+SPANISH_STEM_CHARS = 5
+SNIPPET_CHARS = 320
+MIN_SCORE = 3.0  # below this a hit is only common words ("baby", "water")
+# A hit with no question term in its title or keywords is usually a passing
+# mention ("when can I go home" -> Cats); only a strong text match counts then
+MIN_TEXT_SCORE = 8.0
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "education_index.json")
+
+STOP_WORDS = frozenset("""
+a an and are as at be been but by can could do does for from had has have how i if in into is it its
+me my of on or our should so that the their them then there these they this to too up was we what
+when where which while who why will with would you your yours am any about after again all also
+just very really more much many lot some not no yes ok okay hi hello hey please thank thanks
+need want like know get got feel fine
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9]+|[㐀-鿿]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s*")
+_TOPIC_RE = re.compile(r"^([^:?.]{2,60}):\s*(.*)$")
+_QUESTION_RE = re.compile(r"^([^?]{8,120}\?)\s*(.*)$")
+
+
+def _fold(text):
+    text = unicodedata.normalize("NFKD", text.lower().replace("’", "'"))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _stem(word):
+    """Light English lemmatizer: plural, -ing and -ed endings."""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in (("ies", "y"), ("sses", "ss"), ("ing", ""), ("ed", ""), ("es", "e"), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == "s" and word.endswith(("ss", "us", "is")):
+                return word
+            word = word[: len(word) - len(suffix)] + replacement
+            # "feeding" -> "feed", "stopped" -> "stop"
+            if suffix in ("ing", "ed") and len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            return word
+    return word
+
+
+def tokenize(text, language="en"):
+    terms = []
+    for word in _WORD_RE.findall(_fold(text)):
+        if "㐀" <= word[0] <= "鿿":
+            terms.extend(word)
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+        elif word not in STOP_WORDS:
+            if language == "en":
+                word = _stem(word)
+            elif language == "es":
+                word = word[:SPANISH_STEM_CHARS]
+            terms.append(word)
+    return terms
+
+
+def _clean(text):
+    return " ".join(text.split())
+
+
+def knowledge_sections(blob):
+    """KNOWLEDGE_BASE -> [(title, text)]; untitled lines continue the previous section."""
+    sections = []
+    for line in blob.splitlines():
+        line = _clean(line)
+        if not line:
+            continue
+        match = _TOPIC_RE.match(line) or _QUESTION_RE.match(line)
+        if match and match.group(2):
+            sections.append([match.group(1).strip(), line])
+        elif match:
+            # A heading with no text of its own ("Newborn Appearance:")
+            sections.append([match.group(1).strip(), ""])
+        elif sections:
+            sections[-1][1] = f"{sections[-1][1]} {line}".strip()
+        else:
+            sections.append([line[:60], line])
+    return [(title, text) for title, text in sections if text]
+
+
+def default_sources():
+    """language -> [{"id", "title", "text", "keywords"}] from the shipped content modules."""
+    import chat_logic_es
+    import chat_logic_zh
+    from education_library_en import education_data, education_keywords
+    from knowledge import KNOWLEDGE_BASE
+
+    keywords = {}
+    for word, topic in education_keywords.items():
+        keywords.setdefault(topic, []).append(word)
+
+    en = []
+    for key, value in education_data.items():
+        text = _clean(value)
+        title = text.split(":", 1)[0] if ":" in text[:80] else key
+        en.append({"id": f"library:{key}", "title": title, "text": text, "keywords": [key] + keywords.get(key, [])})
+    for n, (title, text) in enumerate(knowledge_sections(KNOWLEDGE_BASE)):
+        topic = title.lower()
+        extra = ([topic] + keywords[topic]) if topic in keywords else []
+        en.append({"id": f"knowledge:{n}", "title": title, "text": text, "keywords": extra})
+
+    localized = {}
+    for language, module in (("es", chat_logic_es), ("zh", chat_logic_zh)):
+        localized[language] = [
+            {"id": f"responses:{key}", "title": key, "text": text, "keywords": []}
+            for key, text in module.EDUCATION_RESPONSES.items()
+        ]
+    return {"en": en, **localized}
+
+
+def fingerprint(sources):
+    return hashlib.sha256(json.dumps([FORMAT, sources], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class EducationIndex:
+    def __init__(self, data):
+        self._data = data  # the JSON-serializable form; see build()
+        self.fingerprint = data["fingerprint"]
+        self.languages = {}
+        self._sentences = {}  # language -> per section [(sentence, its terms)], for snippets
+        self._headings = {}   # language -> per section, the terms of its title and keywords
+        for language, part in data["languages"].items():
+            self.languages[language] = (
+                part["sections"],
+                {term: [tuple(p) for p in postings] for term, postings in part["postings"].items()},
+                part["lengths"],
+                part["avg_length"],
+            )
+            self._headings[language] = [frozenset(s["heading"]) for s in part["sections"]]
+            self._sentences[language] = [
+                [(sentence, frozenset(tokenize(sentence, language))) for sentence in _SENTENCE_RE.split(s["text"]) if sentence]
+                for s in part["sections"]
+            ]
+
+    @classmethod
+    def build(cls, sources):
+        languages = {}
+        for language, sections in sources.items():
+            postings, lengths = {}, []
+            for doc, section in enumerate(sections):
+                counts = {}
+                for term in tokenize(section["text"], language):
+                    counts[term] = counts.get(term, 0) + 1
+                for field, weight in [(section["title"], TITLE_WEIGHT)] + [(k, KEYWORD_WEIGHT) for k in section["keywords"]]:
+                    for term in tokenize(field, language):
+                        counts[term] = counts.get(term, 0) + weight
+                for term, tf in counts.items():
+                    postings.setdefault(term, []).append([doc, tf])
+                lengths.append(sum(counts.values()))
+            languages[language] = {
+                "sections": [
+                    {"id": s["id"], "title": s["title"], "text": s["text"],
+                     "heading": sorted({t for field in [s["title"]] + s["keywords"] for t in tokenize(field, language)})}
+                    for s in sections
+                ],
+                "postings": postings,
+                "lengths": lengths,
+                "avg_length": sum(lengths) / len(lengths) if lengths else 0.0,
+            }
+        return cls({"format": FORMAT, "fingerprint": fingerprint(sources), "languages": languages})
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != FORMAT:
+            raise ValueError(f"education index format {data.get('format')} != {FORMAT}")
+        return cls(data)
+
+    @classmethod
+    def load_or_build(cls, path=DEFAULT_PATH, sources=None):
+        """The saved index if it was built from these sources, else a fresh one (saved for next time)."""
+        sources = default_sources() if sources is None else sources
+        try:
+            index = cls.load(path)
+            if index.fingerprint == fingerprint(sources):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        index = cls.build(sources)
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"WARN: could not save education index to {path}: {e}")
+        return index
+
+    def search(self, question, language="en", limit=3):
+        """
+        Best sections for question: [{"id", "title", "score", "heading_match",
+        "snippet", "text"}], best first. heading_match: a question term is in
+        the section's title or keywords.
+        """
+        if language not in self.languages:
+            language = "en"
+        sections, postings, lengths, avg_length = self.languages[language]
+        terms = set(tokenize(question, language))
+        scores = {}
+        n = len(sections)
+        for term in terms:
+            hits = postings.get(term)
+            if not hits:
+                continue
+            idf = math.log(1 + (n - len(hits) + 0.5) / (len(hits) + 0.5))
+            for doc, tf in hits:
+                norm = K1 * (1 - B + B * lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [
+            {
+                "id": sections[doc]["id"],
+                "title": sections[doc]["title"],
+                "score": round(score, 4),
+                "heading_match": bool(terms & self._headings[language][doc]),
+                "snippet": snippet(self._sentences[language][doc], terms),
+                "text": sections[doc]["text"],
+            }
+            for doc, score in best
+        ]
+
+    def stats(self):
+        return {
+            language: {"sections": len(sections), "terms": len(postings)}
+            for language, (sections, postings, _, _) in self.languages.items()
+        }
+
+
+def _shorten(text, max_chars):
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+def snippet(sentences, terms, max_chars=SNIPPET_CHARS):
+    """
+    From [(sentence, its terms)], the sentences sharing the most terms with
+    the query that fit in max_chars, in text order.
+    """
+    text = " ".join(sentence for sentence, _ in sentences)
+    if len(text) <= max_chars or not terms:
+        return _shorten(text, max_chars)
+    ranked = sorted(range(len(sentences)), key=lambda i: (-len(terms & sentences[i][1]), i))
+    chosen, used = [], 0
+    for i in ranked:
+        if used and used + len(sentences[i][0]) > max_chars:
+            continue
+        chosen.append(i)
+        used += len(sentences[i][0]) + 1
+        if used >= max_chars:
+            break
+    return _shorten(" ".join(sentences[i][0] for i in sorted(chosen)), max_chars)
+
+
+def best_section(index, question, language="en"):
+    """
+    The top hit if it clears MIN_SCORE with a question term in its title or
+    keywords, or MIN_TEXT_SCORE without one; else None.
+    """
+    hits = index.search(question, language, limit=1)
+    if not hits:
+        return None
+    best = hits[0]
+    return best if best["score"] >= (MIN_SCORE if best["heading_match"] else MIN_TEXT_SCORE) else None
+
+
+_index = None
+
+
+def get_index():
+    """The process-wide index, loaded (or built) on first use."""
+    global _index
+    if _index is None:
+        _index = EducationIndex.load_or_build(os.getenv("EDUCATION_INDEX_PATH", DEFAULT_PATH))
+    return _index
@@ -0,0 +1,147 @@
+"""
+Relevance, persistence and latency checks for the education search index.
+
+Usage:
+    python education_index_tests.py
+
+Builds the index from the shipped content and checks that:
+    - patient-style questions rank the right section first (library and
+      knowledge base), in English, Spanish and Chinese
+    - the knowledge base splits into one section per topic
+    - snippets are the matching sentences and stay short
+    - chat_logic_en still answers (with the snippet) and classifies education
+      questions, but not small talk or questions whose only match is a
+      common word in some section's text
+    - the saved index loads back identical, and a content change rebuilds it
+    - a search takes well under a millisecond
+"""
+
+import os
+import tempfile
+import time
+
+import chat_logic_en
+from education_index import (
+    SNIPPET_CHARS,
+    EducationIndex,
+    default_sources,
+    knowledge_sections,
+    tokenize,
+)
+from knowledge import KNOWLEDGE_BASE
+
+# question -> title of the section that should rank first
+EXPECTED = {
+    "gas pains after my c-section": "Gas Pains",
+    "can my dog meet the baby": "Dogs",
+    "how do I burp my baby": "Burping",
+    "my incision is red and draining": "Call your healthcare provider immediately if your incision",
+    "my baby's skin is yellow": "Jaundice",
+    "when will the cord fall off": "Umbilical Cord",
+    "hemorrhoids hurt": "Hemorrhoids",
+    "bleeding with clots after birth": "Vaginal discharge",
+    "long intense crying and fussiness": "Colic",
+    "how should my baby sleep": "Safe Sleep",
+    "rear facing car seat": "Car Seats",
+    "my staples": "Incision Care",
+}
+LOCALIZED = {
+    ("es", "¿puedo ducharme?"): "showering",
+    ("es", "sacaleches"): "pumping",
+    ("zh", "我可以洗澡吗"): "showering",
+    ("zh", "吸奶器"): "pumping",
+}
+SEARCHES = 5000
+BUDGET_US = 1000
+
+
+def run_education_index_tests() -> None:
+    checks = []
+    sources = default_sources()
+    started = time.perf_counter()
+    index = EducationIndex.build(sources)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    misses = []
+    for question, title in EXPECTED.items():
+        hits = index.search(question)
+        if not hits or not hits[0]["title"].startswith(title):
+            misses.append(f"{question!r} -> {hits[0]['title'] if hits else None}")
+    checks.append((f"{len(EXPECTED) - len(misses)}/{len(EXPECTED)} English questions rank the right section first"
+                   + (f" (missed: {'; '.join(misses)})" if misses else ""), not misses))
+    localized_ok = all(
+        (hits := index.search(question, language)) and hits[0]["title"] == title
+        for (language, question), title in LOCALIZED.items()
+    )
+    checks.append(("Spanish and Chinese questions find their section", localized_ok))
+    checks.append(("unknown language falls back to English", index.search("colic", "fr")[0]["title"] == "Colic"))
+    checks.append(("nothing matched -> no hits", index.search("zzzz qqqq") == []))
+
+    sections = knowledge_sections(KNOWLEDGE_BASE)
+    titles = [title for title, _ in sections]
+    checks.append((f"knowledge base split into {len(sections)} topics", len(sections) >= 25 and "Dogs" in titles))
+    behavior = dict(sections)["Baby’s Behavior"]
+    checks.append(("untitled lines continue the section above", "Crying helps your baby" in behavior))
+    checks.append(("empty headings are dropped", "Newborn Appearance" not in titles))
+
+    hit = index.search("how do I introduce my dog to the baby")[0]
+    checks.append(("snippet is short and on topic", len(hit["snippet"]) <= SNIPPET_CHARS + 1 and "dog" in hit["snippet"].lower()))
+    checks.append(("light lemmatizer", tokenize("Feeding babies stopped pains") == ["feed", "baby", "stop", "pain"]))
+
+    checks.append(("chat_logic_en answers from the index",
+                   chat_logic_en.get_education_response("what about incision care").startswith("Incision Care")))
+    checks.append(("chat_logic_en answers knowledge-base topics",
+                   chat_logic_en.get_education_response("my cat and the new baby").startswith("Cats")))
+    checks.append(("chat_logic_en classifies education questions",
+                   chat_logic_en.classify_message("how do I take care of the umbilical cord") == "education"))
+    checks.append(("...but not small talk", all(chat_logic_en.classify_message(q) == "unknown"
+                                                for q in ("thank you so much", "I feel fine", "hello"))))
+    # These only share a common word with some section's text ("home" in Cats)
+    checks.append(("...or questions the content doesn't cover", all(
+        chat_logic_en.classify_message(q) == "unknown"
+        for q in ("when can I go home", "what is postpartum", "how long will I stay", "can I go for a walk"))))
+    checks.append(("...while a strong text-only match still answers",
+                   chat_logic_en.classify_message("long intense crying and fussiness") == "education"))
+    answer = chat_logic_en.get_education_response("how do I introduce my dog to the baby")
+    checks.append(("chat_logic_en answers with the snippet, not the whole section",
+                   answer == index.search("how do I introduce my dog to the baby")[0]["snippet"]
+                   and len(answer) <= SNIPPET_CHARS + 1))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "education_index.json")
+        saved = EducationIndex.load_or_build(path, sources)
+        started = time.perf_counter()
+        loaded = EducationIndex.load_or_build(path, sources)
+        load_ms = (time.perf_counter() - started) * 1000
+        checks.append(("saved index loads with the same fingerprint", os.path.exists(path)
+                       and loaded.fingerprint == saved.fingerprint == index.fingerprint))
+        checks.append(("loaded index gives the same results",
+                       all(loaded.search(q) == index.search(q) for q in EXPECTED)))
+        changed = dict(sources, en=sources["en"] + [{"id": "new", "title": "Tummy Time", "text": "Tummy time builds neck strength.", "keywords": []}])
+        rebuilt = EducationIndex.load_or_build(path, changed)
+        checks.append(("changed content rebuilds the index", rebuilt.search("tummy time")[0]["id"] == "new"))
+
+    questions = list(EXPECTED)
+    started = time.perf_counter()
+    for n in range(SEARCHES):
+        index.search(questions[n % len(questions)])
+    us = (time.perf_counter() - started) / SEARCHES * 1e6
+    checks.append((f"search {us:.0f} us (budget {BUDGET_US} us)", us < BUDGET_US))
+
+    failures = 0
+    print("\n=== Education index checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"Sections: {index.stats()}; build {build_ms:.1f} ms, load from disk {load_ms:.1f} ms, "
+          f"search {us:.0f} us (top 3 with snippets)")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL EDUCATION INDEX CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_education_index_tests()
@@ -0,0 +1,290 @@
+"""
+Outbound event pipeline for dashboard sockets.
+
+HTTP and socket handlers call publish(), which only appends to small
+per-client queues and returns. One sender task per connected client drains
+its queue, keeping at most `max_in_flight` unacknowledged frames on the wire,
+so a dashboard on bad Wi-Fi only ever backs up its own queue.
+
+Queue policies:
+  - coalesce: events listed in COALESCE_BY_ID (e.g. several request_updated
+    for one id) collapse into one pending event carrying the merged payload.
+  - supersede: a remove_request drops any pending request_updated for that id.
+  - bounded: past `max_pending`, droppable events (audit feed) go first, then
+    the oldest event; the client is told to resync from /api/active_requests.
+
+Clients switched to batched mode (set_batched) get everything that queued up
+within `batch_window` seconds as one frame built by `batch_encoder`. A client
+may also mute droppable events it never displays (mute), e.g. the audit feed
+on the nurse dashboard.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Events whose pending copies for the same "id" collapse into the latest one
+COALESCE_BY_ID = ("request_updated",)
+
+# Pending events that a later event for the same "id" makes pointless
+SUPERSEDED_BY = {"remove_request": ("request_updated",)}
+
+# Low-value events we shed first when a client falls behind
+DROPPABLE = ("new_audit_log",)
+
+RESYNC_EVENT = "dashboard:resync"
+
+
+class _ClientQueue:
+    def __init__(self, sid):
+        self.sid = sid
+        self.pending = OrderedDict()  # key -> [event, payload]
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.last_progress = time.monotonic()
+        self.needs_resync = False
+        self.batched = False
+        self.muted = frozenset()
+        self.closed = False
+        self.seq = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+
+class EmitQueue:
+    """
+    send(sid, event, payload, ack) must hand the event to the transport and
+    arrange for ack() to be called once the client has processed it.
+    spawn(fn, *args) starts a background task (socketio.start_background_task).
+    """
+
+    def __init__(self, send, spawn, max_pending=200, max_in_flight=8, ack_timeout=10.0,
+                 batch_encoder=None, batch_event="batch", batch_window=0.05, max_batch=50):
+        self._send = send
+        self._spawn = spawn
+        self.max_pending = max_pending
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self._batch_encoder = batch_encoder
+        self.batch_event = batch_event
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._totals = {
+            "published": 0,
+            "delivered": 0,
+            "frames_sent": 0,
+            "events_sent": 0,
+            "coalesced": 0,
+            "superseded": 0,
+            "dropped": 0,
+            "resyncs": 0,
+            "ack_timeouts": 0,
+            "send_errors": 0,
+        }
+        self._publish_max_ms = 0.0
+
+    # --- client lifecycle ---
+    def register(self, sid):
+        with self._lock:
+            if sid in self._clients:
+                return
+            client = _ClientQueue(sid)
+            self._clients[sid] = client
+        self._spawn(self._drain, client)
+
+    def unregister(self, sid):
+        with self._lock:
+            client = self._clients.pop(sid, None)
+        if client:
+            with client.cond:
+                client.closed = True
+                client.pending.clear()
+                client.cond.notify()
+
+    def set_batched(self, sid, enabled=True):
+        """Switch a client to batch frames; returns False if batching is unavailable."""
+        if self._batch_encoder is None:
+            return False
+        with self._lock:
+            client = self._clients.get(sid)
+        if not client:
+            return False
+        with client.cond:
+            client.batched = enabled
+        return True
+
+    def mute(self, sid, events):
+        """Stop queueing the given droppable events for one client; returns what was muted."""
+        muted = frozenset(e for e in events if e in DROPPABLE)
+        with self._lock:
+            client = self._clients.get(sid)
+        if not client:
+            return []
+        with client.cond:
+            client.muted = muted
+        return sorted(muted)
+
+    # --- producers (never block on the network) ---
+    def publish(self, event, payload):
+        """Queue an event for every registered client."""
+        started = time.perf_counter()
+        with self._lock:
+            clients = list(self._clients.values())
+            self._totals["published"] += 1
+        for client in clients:
+            self._enqueue(client, event, payload)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > self._publish_max_ms:
+            self._publish_max_ms = elapsed_ms
+
+    def publish_to(self, sid, event, payload):
+        """Queue an event for a single client (no-op if it is gone)."""
+        with self._lock:
+            client = self._clients.get(sid)
+        if client:
+            self._enqueue(client, event, payload)
+
+    def _enqueue(self, client, event, payload):
+        rid = payload.get("id") if isinstance(payload, dict) else None
+        with client.cond:
+            if client.closed or event in client.muted:
+                return
+
+            if rid is not None:
+                for stale_event in SUPERSEDED_BY.get(event, ()):
+                    if client.pending.pop((stale_event, rid), None) is not None:
+                        self._count("superseded")
+
+            if event in COALESCE_BY_ID and rid is not None:
+                key = (event, rid)
+                existing = client.pending.pop(key, None)
+                if existing is not None:
+                    payload = {**existing[1], **payload}
+                    client.coalesced += 1
+                    self._count("coalesced")
+            else:
+                client.seq += 1
+                key = client.seq
+
+            client.pending[key] = [event, payload]
+
+            if len(client.pending) > self.max_pending:
+                self._shed(client)
+
+            depth = len(client.pending)
+            if depth > client.max_depth:
+                client.max_depth = depth
+            client.cond.notify()
+
+    def _shed(self, client):
+        """Drop one event from an over-full queue (caller holds client.cond)."""
+        victim = next(
+            (k for k, (ev, _) in client.pending.items() if ev in DROPPABLE),
+            None,
+        )
+        if victim is None:
+            victim = next(iter(client.pending))
+            # A real state change was lost: have the dashboard re-poll.
+            client.needs_resync = True
+        del client.pending[victim]
+        client.dropped += 1
+        self._count("dropped")
+
+    # --- per-client sender ---
+    def _drain(self, client):
+        while True:
+            with client.cond:
+                while not client.closed:
+                    window_full = client.in_flight >= self.max_in_flight
+                    if window_full and time.monotonic() - client.last_progress > self.ack_timeout:
+                        # Client stopped acking; reopen the window rather than stall forever.
+                        client.in_flight = 0
+                        client.last_progress = time.monotonic()
+                        self._count("ack_timeouts")
+                        window_full = False
+                    if not window_full and (client.pending or client.needs_resync):
+                        break
+                    client.cond.wait(self.ack_timeout if window_full else 1.0)
+                if client.closed:
+                    return
+
+                if client.needs_resync:
+                    # Events still queued are delivered after this; dashboards upsert by id
+                    client.needs_resync = False
+                    event, payload, n_events = RESYNC_EVENT, {}, 1
+                    self._count("resyncs")
+                elif client.batched:
+                    # Give the burst a moment to land, then ship it as one frame
+                    deadline = time.monotonic() + self.batch_window
+                    while not client.closed and len(client.pending) < self.max_batch:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        client.cond.wait(remaining)
+                    if client.closed:
+                        return
+                    items = []
+                    while client.pending and len(items) < self.max_batch:
+                        items.append(tuple(client.pending.popitem(last=False)[1]))
+                    if not items:
+                        continue
+                    event, payload, n_events = self.batch_event, self._batch_encoder(items), len(items)
+                else:
+                    _, (event, payload) = client.pending.popitem(last=False)
+                    n_events = 1
+                client.in_flight += 1
+
+            self._count("frames_sent")
+            self._count("events_sent", n_events)
+
+            try:
+                self._send(client.sid, event, payload, lambda *_: self._ack(client))
+            except Exception as e:
+                print(f"[emit_queue] send to {client.sid} failed: {e}")
+                self._count("send_errors")
+                self._ack(client)
+
+    def _ack(self, client):
+        with client.cond:
+            client.in_flight = max(0, client.in_flight - 1)
+            client.last_progress = time.monotonic()
+            client.delivered += 1
+            client.cond.notify()
+        self._count("delivered")
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._totals[name] += n
+
+    # --- metrics ---
+    def stats(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            totals = dict(self._totals)
+        per_client = []
+        for c in clients:
+            with c.cond:
+                per_client.append({
+                    "sid": c.sid,
+                    "depth": len(c.pending),
+                    "max_depth": c.max_depth,
+                    "in_flight": c.in_flight,
+                    "batched": c.batched,
+                    "delivered": c.delivered,
+                    "coalesced": c.coalesced,
+                    "dropped": c.dropped,
+                    "stalled_s": round(time.monotonic() - c.last_progress, 1) if c.in_flight else 0.0,
+                })
+        return {
+            **totals,
+            "clients": len(per_client),
+            "slow_clients": sum(1 for c in per_client if c["depth"] > self.max_pending // 2),
+            "publish_max_ms": round(self._publish_max_ms, 3),
+            "max_pending": self.max_pending,
+            "max_in_flight": self.max_in_flight,
+            "per_client": per_client,
+        }
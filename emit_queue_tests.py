@@ -0,0 +1,152 @@
+"""
+Synthetic slow-consumer tests for the dashboard emit queue.
+
+Usage:
+    python emit_queue_tests.py
+
+One fast dashboard acks immediately; one slow dashboard takes 50ms per event
+and one never acks at all. A burst of events is published the way
+process_request / defer / complete would, and we check that:
+    - publishing never waits on the slow clients
+    - every client's backlog stays bounded
+    - request_updated events for the same id coalesce
+    - the fast client still catches up promptly
+    - a resync still delivers the events queued behind it
+    - compact clients get a burst as a few batch frames, in order
+"""
+
+import threading
+import time
+
+from compact_events import BATCH_EVENT, decode, encode_batch
+from emit_queue import EmitQueue, RESYNC_EVENT
+
+MAX_PENDING = 50
+BURST = 2000
+
+
+def spawn(fn, *args):
+    t = threading.Thread(target=fn, args=args, daemon=True)
+    t.start()
+    return t
+
+
+class FakeTransport:
+    def __init__(self):
+        self.received = {}
+        self.lock = threading.Lock()
+
+    def send(self, sid, event, payload, ack):
+        with self.lock:
+            self.received.setdefault(sid, []).append((event, payload))
+        if sid == "fast":
+            ack()
+        elif sid == "slow":
+            threading.Timer(0.05, ack).start()
+        # "stuck" never acks
+
+    def events(self, sid):
+        with self.lock:
+            return list(self.received.get(sid, []))
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def run_emit_queue_tests() -> None:
+    transport = FakeTransport()
+    q = EmitQueue(transport.send, spawn, max_pending=MAX_PENDING, max_in_flight=4, ack_timeout=30.0)
+    for sid in ("fast", "slow", "stuck"):
+        q.register(sid)
+
+    checks = []
+
+    # 1) Burst: new requests, repeated updates for a handful of ids, audit rows
+    started = time.perf_counter()
+    for i in range(BURST):
+        q.publish("new_request", {"id": f"req_{i}", "room": "241"})
+        q.publish("request_updated", {"id": f"req_{i % 5}", "repeat_count": i})
+        q.publish("new_audit_log", {"event_type": "Request Created", "details": str(i)})
+    publish_s = time.perf_counter() - started
+    per_event_us = publish_s / (BURST * 3) * 1e6
+    checks.append((f"publish never blocks ({per_event_us:.1f}us/event)", per_event_us < 500))
+
+    stats = q.stats()
+    depths = {c["sid"]: c for c in stats["per_client"]}
+    checks.append(("slow client backlog bounded",
+                   depths["slow"]["max_depth"] <= MAX_PENDING))
+    checks.append(("stuck client backlog bounded",
+                   depths["stuck"]["max_depth"] <= MAX_PENDING))
+    checks.append(("request_updated coalesced", stats["coalesced"] > 0))
+    checks.append(("overflow dropped events", stats["dropped"] > 0))
+
+    # 2) Fast client drains the burst without stalling and sees the next event
+    q.publish("new_request", {"id": "after-burst", "room": "242"})
+    fast_ok = wait_for(lambda: any(p.get("id") == "after-burst" for _, p in transport.events("fast")))
+    checks.append(("fast client caught up after the burst", fast_ok))
+    per_client = {c["sid"]: c for c in q.stats()["per_client"]}
+    checks.append(("fast client shed fewer events than slow client",
+                   per_client["fast"]["dropped"] < per_client["slow"]["dropped"]))
+
+    # 3) Slow client gets told to resync instead of an unbounded replay
+    slow_ok = wait_for(lambda: any(ev == RESYNC_EVENT for ev, _ in transport.events("slow")))
+    checks.append(("slow client asked to resync", slow_ok))
+    checks.append(("events queued before the resync are still delivered",
+                   wait_for(lambda: any(p.get("id") == "after-burst" for _, p in transport.events("slow")))))
+
+    # 4) Stuck client never has more than max_in_flight events on the wire
+    checks.append(("stuck client limited to in-flight window",
+                   len(transport.events("stuck")) <= q.max_in_flight))
+
+    # 5) remove_request supersedes a pending request_updated for the same id
+    #    (no-op spawn: nothing drains, so we can inspect the queue)
+    q2 = EmitQueue(transport.send, lambda *a: None, max_pending=10)
+    q2.register("idle")
+    q2.publish("request_updated", {"id": "req_1", "new_role": "nurse"})
+    q2.publish("remove_request", {"id": "req_1"})
+    s2 = q2.stats()
+    checks.append(("remove_request supersedes request_updated",
+                   s2["superseded"] == 1 and s2["per_client"][0]["depth"] == 1))
+    muted = q2.mute("idle", ["new_audit_log", "new_request"])
+    q2.publish("new_audit_log", {"details": "muted"})
+    checks.append(("client can mute droppable events only",
+                   muted == ["new_audit_log"] and q2.stats()["per_client"][0]["depth"] == 1))
+
+    # 6) Batched (compact-v1) client: a burst arrives as a few ordered frames
+    q3 = EmitQueue(transport.send, spawn, max_pending=MAX_PENDING, batch_encoder=encode_batch,
+                   batch_event=BATCH_EVENT, batch_window=0.05)
+    q3.register("fast")
+    q3.set_batched("fast")
+    transport.received.pop("fast", None)
+    for i in range(30):
+        q3.publish("new_request", {"id": f"b_{i}", "room": "243", "tier": "routine",
+                                   "timestamp": "2025-07-07T10:46:33+00:00"})
+    batch_ok = wait_for(lambda: q3.stats()["events_sent"] >= 30)
+    frames = [p for ev, p in transport.events("fast") if ev == BATCH_EVENT]
+    ids = [decode(item)[1]["id"] for frame in frames for item in frame]
+    checks.append((f"burst of 30 sent as {len(frames)} batch frame(s), in order",
+                   batch_ok and len(frames) < 5 and ids == [f"b_{i}" for i in range(30)]))
+
+    failures = 0
+    print("\n=== Emit queue slow-consumer tests ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"Published {BURST * 3} events in {publish_s * 1000:.1f}ms")
+    print(f"Stats: { {k: v for k, v in q.stats().items() if k != 'per_client'} }")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL EMIT QUEUE CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_emit_queue_tests()
@@ -0,0 +1,124 @@
+"""
+Idempotency keys for patient submissions, so a retried tap or note is not a
+second request.
+
+chat.html gives every step it sends a fresh key (crypto.randomUUID) and keeps
+the step in a local outbox until the server answers. A step whose answer was
+lost (Wi-Fi blip after the server got it) is replayed with the same key, and
+process_request hands back the request_id of the first submission instead of
+creating a row, an audit entry and a dashboard card.
+
+Two layers:
+
+    IdempotencyIndex   key -> request_id in a TTLCache (the dedupe window);
+                       claim() is atomic, so two copies racing in one worker
+                       produce one request
+    requests.idempotency_key
+                       UNIQUE column; a key the window no longer holds (restart,
+                       another worker) is looked up there, and the INSERT skips
+                       a key that is already stored
+
+Keys are opaque client strings; anything that doesn't look like one is
+ignored (the submission goes through without dedupe).
+"""
+
+import re
+import threading
+import time
+
+from sqlalchemy import text
+
+from ttl_cache import TTLCache
+
+DEFAULT_WINDOW_SECONDS = 24 * 3600  # covers a tablet that stays offline over a shift
+DEFAULT_MAXSIZE = 20_000
+
+_KEY_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def clean_key(key):
+    """The key if it looks like a client idempotency key (UUID and the like), else None."""
+    key = str(key or "").strip()
+    return key if _KEY_RE.match(key) else None
+
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        ALTER TABLE requests
+        ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+    """))
+    # NULLs are distinct, so rows without a key are unaffected
+    connection.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS requests_idempotency_key_uniq ON requests (idempotency_key);
+    """))
+
+
+def stored_request_id(connection, key):
+    """request_id of the row written for key, or None."""
+    row = connection.execute(
+        text("SELECT request_id FROM requests WHERE idempotency_key = :key LIMIT 1"),
+        {"key": key},
+    ).fetchone()
+    return row[0] if row else None
+
+
+class IdempotencyIndex:
+    """
+    key -> request_id for the dedupe window. lookup(key) is the DB fallback
+    for keys the window doesn't hold; it may raise, which counts as a miss.
+    """
+
+    def __init__(self, lookup=None, window=DEFAULT_WINDOW_SECONDS, maxsize=DEFAULT_MAXSIZE, clock=time.monotonic):
+        self._lookup = lookup
+        self._keys = TTLCache(maxsize=maxsize, ttl=window, clock=clock)
+        self._lock = threading.Lock()
+        self.claimed = 0
+        self.duplicates_memory = 0
+        self.duplicates_db = 0
+        self.lookup_errors = 0
+
+    def seen(self, key):
+        """request_id already submitted under key (window first, then the DB), else None."""
+        request_id = self._keys.get(key)
+        if request_id is not None:
+            self.duplicates_memory += 1
+            return request_id
+        if self._lookup is None:
+            return None
+        try:
+            request_id = self._lookup(key)
+        except Exception as e:
+            self.lookup_errors += 1
+            print(f"WARN: idempotency lookup failed for {key}: {e}")
+            return None
+        if request_id is not None:
+            self.duplicates_db += 1
+            self._keys.set(key, request_id)
+        return request_id
+
+    def claim(self, key, request_id):
+        """
+        Record request_id under key unless the window already holds one.
+        Returns the request_id that owns the key: request_id if this call won.
+        """
+        with self._lock:
+            owner = self._keys.get(key)
+            if owner is None:
+                self._keys.set(key, request_id)
+                self.claimed += 1
+                return request_id
+        self.duplicates_memory += 1
+        return owner
+
+    def stats(self):
+        duplicates = self.duplicates_memory + self.duplicates_db
+        submissions = self.claimed + duplicates
+        return {
+            "window_s": self._keys.ttl,
+            "keys": len(self._keys),
+            "claimed": self.claimed,
+            "duplicates_memory": self.duplicates_memory,
+            "duplicates_db": self.duplicates_db,
+            "suppression_rate": round(duplicates / submissions, 4) if submissions else None,
+            "lookup_errors": self.lookup_errors,
+        }
@@ -0,0 +1,178 @@
+"""
+Fault-injection test for idempotency keys on patient submissions.
+
+Usage:
+    python idempotency_tests.py
+
+Simulates 30 bedside tablets sending notes and button requests through an
+outbox like chat.html's, over a network that drops requests before they
+arrive, loses answers after the server acted, delivers some requests twice,
+and a server that restarts (losing the in-memory window) now and then.
+The server side is the same seen()/claim() sequence _chat_step and
+process_request use, over a fake requests table with a UNIQUE key. Checks
+that:
+    - every submission is stored exactly once, and the same fault schedule
+      without keys would have stored duplicates
+    - replays are absorbed from memory and, after a restart, from the table
+    - the window expires, a failing lookup is a miss, junk keys are ignored
+"""
+
+import random
+
+from idempotency import IdempotencyIndex, clean_key
+
+ROOMS = [str(r) for r in range(231, 261)]
+SUBMISSIONS_PER_ROOM = 40
+P_DROP_REQUEST = 0.15    # never reaches the server
+P_LOSE_ANSWER = 0.20     # server acted, tablet never hears back
+P_DUPLICATE = 0.05       # proxy/browser sends it twice
+P_RESTART = 0.01         # worker restarts before the next delivery
+
+
+class FakeRequestsTable:
+    def __init__(self):
+        self.rows = []        # (request_id, key)
+        self.by_key = {}
+
+    def insert(self, request_id, key):
+        if key is not None and key in self.by_key:
+            return False      # ON CONFLICT (idempotency_key) DO NOTHING
+        self.rows.append((request_id, key))
+        if key is not None:
+            self.by_key[key] = request_id
+        return True
+
+    def lookup(self, key):
+        return self.by_key.get(key)
+
+
+class FakeServer:
+    def __init__(self):
+        self.table = FakeRequestsTable()
+        self.index = IdempotencyIndex(lookup=self.table.lookup)
+        self.next_id = 0
+        self.restarts = 0
+        self.db_hits = 0  # over every window, including ones lost to restarts
+
+    def restart(self):
+        self.restarts += 1
+        self.db_hits += self.index.duplicates_db
+        self.index = IdempotencyIndex(lookup=self.table.lookup)
+
+    def submit(self, key):
+        """What _chat_step + process_request + log_request_to_db do for an action step."""
+        if key:
+            replayed = self.index.seen(key)
+            if replayed:
+                return replayed
+        self.next_id += 1
+        request_id = f"req_{self.next_id}"
+        if key:
+            owner = self.index.claim(key, request_id)
+            if owner != request_id:
+                return owner
+        self.table.insert(request_id, key)
+        return request_id
+
+
+def simulate(use_keys, seed):
+    rng = random.Random(seed)
+    server = FakeServer()
+    outboxes = {room: [] for room in ROOMS}
+    answered = {}     # key -> request_id the tablet heard
+    deliveries = 0
+    sent = 0
+
+    def deliver(key):
+        nonlocal deliveries
+        if rng.random() < P_RESTART:
+            server.restart()
+        deliveries += 1
+        return server.submit(key if use_keys else None)
+
+    pending = SUBMISSIONS_PER_ROOM * len(ROOMS)
+    queued = {room: SUBMISSIONS_PER_ROOM for room in ROOMS}
+    while pending:
+        room = rng.choice(ROOMS)
+        if queued[room] and rng.random() < 0.5:
+            queued[room] -= 1
+            sent += 1
+            outboxes[room].append(f"{room}-{sent:06d}-key")
+        # Flush oldest first, stopping at the first step with no answer
+        while outboxes[room]:
+            key = outboxes[room][0]
+            if rng.random() < P_DROP_REQUEST:
+                break
+            request_id = deliver(key)
+            if rng.random() < P_DUPLICATE:
+                deliver(key)
+            if rng.random() < P_LOSE_ANSWER:
+                break
+            answered[key] = request_id
+            outboxes[room].pop(0)
+            pending -= 1
+    return server, answered, deliveries
+
+
+def run_idempotency_tests() -> None:
+    checks = []
+
+    server, answered, deliveries = simulate(use_keys=True, seed=11)
+    submissions = SUBMISSIONS_PER_ROOM * len(ROOMS)
+    stored_keys = [key for _, key in server.table.rows]
+    replays = deliveries - submissions
+    suppressed = deliveries - len(server.table.rows)
+    checks.append((f"{submissions} submissions stored exactly once", len(stored_keys) == len(set(stored_keys)) == submissions))
+    checks.append(("every tablet heard its own request id", all(server.table.lookup(k) == rid for k, rid in answered.items())))
+    checks.append((f"all {replays} replays suppressed", suppressed == replays))
+    db_hits = server.db_hits + server.index.duplicates_db
+    checks.append((f"replays after {server.restarts} restarts absorbed by the table ({db_hits})", db_hits > 0))
+
+    unkeyed, _, unkeyed_deliveries = simulate(use_keys=False, seed=11)
+    duplicates_without_keys = len(unkeyed.table.rows) - submissions
+    checks.append((f"same faults without keys store {duplicates_without_keys} duplicates", duplicates_without_keys > 0))
+
+    # DB fallback on its own: a fresh window still finds the stored key
+    table = FakeRequestsTable()
+    table.insert("req_a", "tablet-key-0001")
+    index = IdempotencyIndex(lookup=table.lookup)
+    checks.append(("fresh window falls back to the table", index.seen("tablet-key-0001") == "req_a"))
+    checks.append(("table hit is cached in the window", index.seen("tablet-key-0001") == "req_a"
+                   and index.stats()["duplicates_memory"] == 1))
+
+    now = [0.0]
+    index = IdempotencyIndex(window=60, clock=lambda: now[0])
+    index.claim("tablet-key-0002", "req_b")
+    checks.append(("claim is first-wins", index.claim("tablet-key-0002", "req_c") == "req_b"))
+    now[0] = 61.0
+    checks.append(("window expires", index.seen("tablet-key-0002") is None))
+
+    def broken(_):
+        raise RuntimeError("db down")
+    index = IdempotencyIndex(lookup=broken)
+    checks.append(("failing lookup is a miss", index.seen("tablet-key-0003") is None
+                   and index.stats()["lookup_errors"] == 1))
+
+    checks.append(("UUID keys accepted", clean_key("3f2b8a9e-6c1d-4e0f-9a7b-2c5d8e1f4a6b") is not None))
+    checks.append(("junk keys ignored", all(clean_key(k) is None for k in (None, "", "short", "x" * 65, "a b c d e f g h", "key';--"))))
+
+    failures = 0
+    print("\n=== Idempotency fault-injection test ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    stats = server.index.stats()
+    print(f"Deliveries: {deliveries} for {submissions} submissions "
+          f"(keyed: {len(server.table.rows)} rows, unkeyed: {len(unkeyed.table.rows)} rows over {unkeyed_deliveries} deliveries)")
+    print(f"Suppression rate: {suppressed / deliveries:.1%} of deliveries, {suppressed / replays:.1%} of replays; "
+          f"last window after restart: {stats['duplicates_memory']} memory / {stats['duplicates_db']} DB hits")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL IDEMPOTENCY CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_idempotency_tests()
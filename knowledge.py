@@ -2,8 +2,6 @@
 # This file contains the educational text for the AI chatbot.
 
 KNOWLEDGE_BASE = """
-PASTE YOUR KNOWLEDGE BASE TEXT HERE
-"""
 Hemorrhoids: Hemorrhoids are swollen veins at the opening of the rectum, inside the rectum, or outside of the anus. They can be painful, itchy, and even bleed. Although they’re usually not serious, they can be really uncomfortable. What can help: eat health (especially high-fiber) foods, drink plenty of water to avoid constipation, avoid straining during bowel movement, avoid sitting or standing for long periods of time, use pre-moistened wipes instead of toilet paper, apply ice packs or witch hazel pads to the hemorrhoids, soak in a warm tub several times a day, use topical creams, suppositories, and pain medication with your health care provider’s approval. 
 Perineum: The perineum is the area between your vagina and rectum. During a vaginal birth, it stretches and may tear. So, you may have tears and lacerations in your perineum. These tears, along with any vaginal tears, can cause pain and tenderness for several weeks. During the first 24-48 hours, icing can help discomfort. Keeping the area clean and dry can help relieve pain, prevent infection, and promote healing.
 Vaginal discharge: After giving birth, you can expect to have a bloody vaginal discharge, called lochia, for a few days. This is part of the natural healing process for your uterus. For the first few days, lochia is bright red, heavy in flow, and may have small blood clots. It has a distinct smell that women often describe as fleshy, musty, or earthy. Because blood collects in your vagina when you’re sitting or lying down, this may make lochia heavier when you stand up. You may notice a heavier blood flow after too much physical activity. If you do, you should slow down and rest. You may have less lochia if you had a cesarean birth. Over time, the flow gets less and lighter in color. But expect to have this lighter discharge for up to 4-6 weeks. You’ll want to use pads (not tampons or menstrual cups) until your lochia stops. Tampons or menstrual cups can increase the chance for infection in your uterus. First 1-3 days: bright to dark red, heavy to medium flow, may have small clots About days 3-10: pink or brown-tinged, medium to light flow, very few or no small clots About days 10-14 (maybe longer): yellowish-white color, very light flow, no clots or bright red color. Warning: Tell a nurse or call your health care provider immediately if you: soak through more than 1 pad in an hour, have a steady flow that continues over time, pass clots the size of an egg or larger after the first hour, have bright red vaginal bleeding day 4 or after, notice your lochia has a bad odor, have a fever of 100.4 degrees F or higher or 96.8 degrees F or lower, have severe pain in your lower abdomen.
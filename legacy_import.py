@@ -0,0 +1,263 @@
+"""
+Import the legacy CSV logs (chat_log.csv, nurse_log.csv, cna_log.csv, ...)
+into Postgres.
+
+Usage:
+    python legacy_import.py --database-url postgresql://localhost/call_light
+    python legacy_import.py --database-url ... nurse_log.csv cna_log.csv
+
+With no files given, every *_log.csv next to this script is read. The logs
+were written by several versions of the app, so the layout is sniffed per
+row:
+    4 columns   timestamp, text, category, reply
+    5 columns   timestamp, room, text, category, reply
+    6 columns   timestamp, "Room 12B", "Nurse Johnson", text, category, reply
+    6 columns   timestamp, room, staff, follow-up key, answer, reply
+                (follow_up_log.csv; the 5th column is not a category)
+Lines are decoded as UTF-8, falling back to Windows-1252 (some were saved
+from Excel), and UTF-8 text that was once mis-decoded as Windows-1252
+("itâ€™s") is repaired. Timestamps are local wall-clock times and are read
+in the database session time zone.
+
+Every row lands in legacy_requests, keyed by (source_file, line_no), so a
+re-run only adds lines appended since, and new rows are labeled
+(request_labels) the same way live requests are. Rows that notified someone
+(cna, nurse, urgent) get a role and count toward /analytics volumes via
+analytics_rollup.rebuild(), which runs when any were added. They never go
+into requests: the logs have no completion times, so they would show up as
+open call lights. Rows are COPYed into a temp table --batch-size at a time
+and moved with INSERT ... ON CONFLICT DO NOTHING, so memory stays flat.
+"""
+
+import argparse
+import csv
+import glob
+import io
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, text
+
+import analytics_rollup
+import request_labels
+
+DEFAULT_BATCH_SIZE = 5000
+
+CATEGORIES = ("cna", "nurse", "urgent", "education", "follow-up", "uncategorized", "")
+
+# Category in the log -> who was notified (the requests.category it would have today)
+ROLE_BY_CATEGORY = {"cna": "cna", "nurse": "nurse", "urgent": "nurse"}
+
+COLUMNS = ("source_file", "line_no", "timestamp", "room", "staff_name", "user_input",
+           "category", "follow_up_key", "reply", "role")
+
+# Signs of UTF-8 that was decoded as Windows-1252 at some point
+_MOJIBAKE_MARKERS = ("â€", "Ã", "Â", "ðŸ")
+
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS legacy_requests (
+            id SERIAL PRIMARY KEY,
+            source_file VARCHAR(255) NOT NULL,
+            line_no INTEGER NOT NULL,
+            timestamp TIMESTAMPTZ NOT NULL,
+            room VARCHAR(255),
+            staff_name VARCHAR(255),
+            user_input TEXT,
+            category VARCHAR(255),
+            follow_up_key VARCHAR(255),
+            reply TEXT,
+            role VARCHAR(255),
+            imported_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            UNIQUE (source_file, line_no)
+        );
+    """))
+
+
+# --- parsing ---
+
+def decode_line(raw):
+    try:
+        line = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        line = raw.decode("cp1252", errors="replace")
+    return repair_text(line)
+
+
+def repair_text(value):
+    if any(marker in value for marker in _MOJIBAKE_MARKERS):
+        try:
+            return value.encode("cp1252").decode("utf-8")
+        except UnicodeError:
+            pass
+    return value
+
+
+def _clean(value, prefix=""):
+    value = (value or "").strip()
+    if prefix and value.lower().startswith(prefix.lower()):
+        value = value[len(prefix):].strip()
+    return value or None
+
+
+def parse_row(fields):
+    """Sniff one CSV record; returns a dict of COLUMNS (minus source/line) or None if unusable."""
+    if len(fields) < 4:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(fields[0].strip())
+    except ValueError:
+        return None
+
+    room = staff = key = None
+    if len(fields) == 4:
+        user_input, category, reply = fields[1:4]
+    elif len(fields) == 5:
+        room, user_input, category, reply = fields[1:5]
+    elif fields[4].strip() in CATEGORIES:
+        room, staff, user_input, category, reply = fields[1:6]
+    else:
+        room, staff, key, user_input, reply = fields[1:6]
+        category = "follow-up"
+
+    category = _clean(category)
+    return {
+        "timestamp": timestamp,
+        "room": _clean(room, "Room "),
+        "staff_name": _clean(staff),
+        "user_input": _clean(user_input),
+        "category": category,
+        "follow_up_key": _clean(key),
+        "reply": _clean(reply),
+        "role": ROLE_BY_CATEGORY.get(category),
+    }
+
+
+def read_rows(path):
+    """(line_no, row or None) for every record; line_no is the record's last physical line."""
+    with open(path, "rb") as f:
+        reader = csv.reader(decode_line(raw) for raw in f)
+        for fields in reader:
+            if fields:
+                yield reader.line_num, parse_row(fields)
+
+
+# --- loading ---
+
+def _copy_batch(connection, source_file, batch):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for line_no, row in batch:
+        writer.writerow([source_file, line_no] + [row[c] for c in COLUMNS[2:]])
+    buffer.seek(0)
+
+    connection.execute(text("TRUNCATE legacy_staging;"))
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY legacy_staging ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    inserted = connection.execute(text(f"""
+        INSERT INTO legacy_requests ({', '.join(COLUMNS)})
+        SELECT {', '.join(COLUMNS)} FROM legacy_staging
+        ON CONFLICT (source_file, line_no) DO NOTHING
+        RETURNING role;
+    """)).fetchall()
+    return len(inserted), sum(1 for (role,) in inserted if role)
+
+
+def import_file(connection, path, batch_size=DEFAULT_BATCH_SIZE):
+    """Load one log; returns (rows read, rows added, call lights added, rows skipped)."""
+    source_file = os.path.basename(path)
+    read = added = call_lights = skipped = 0
+    batch = []
+
+    def flush():
+        nonlocal added, call_lights
+        with connection.begin():
+            n, lights = _copy_batch(connection, source_file, batch)
+        added += n
+        call_lights += lights
+        batch.clear()
+
+    for line_no, row in read_rows(path):
+        read += 1
+        if row is None:
+            skipped += 1
+            print(f"  skipped {source_file}:{line_no} (no timestamp or too few columns)")
+            continue
+        batch.append((line_no, row))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return read, added, call_lights, skipped
+
+
+def run(engine, paths, batch_size=DEFAULT_BATCH_SIZE, rebuild=True, labeler=None):
+    totals = {"read": 0, "added": 0, "call_lights": 0, "skipped": 0}
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        with connection.begin():
+            ensure_tables(connection)
+            request_labels.ensure_tables(connection)
+            connection.execute(text("""
+                CREATE TEMP TABLE IF NOT EXISTS legacy_staging
+                (LIKE legacy_requests INCLUDING DEFAULTS);
+            """))
+
+        for path in paths:
+            file_started = time.perf_counter()
+            read, added, call_lights, skipped = import_file(connection, path, batch_size)
+            elapsed = time.perf_counter() - file_started
+            print(f"{os.path.basename(path):28s} {read:8d} read {added:8d} new {call_lights:8d} call lights "
+                  f"{skipped:4d} skipped  ({read / elapsed if elapsed else 0:,.0f} rows/s)")
+            for name, n in zip(("read", "added", "call_lights", "skipped"), (read, added, call_lights, skipped)):
+                totals[name] += n
+
+        with connection.begin():
+            if totals["added"]:
+                if labeler is None:
+                    from triage_engine import TriageEngine  # loads spaCy; only needed to label notes
+                    labeler = request_labels.RequestLabeler(TriageEngine().classify)
+                labeled = labeler.backfill(connection, "legacy_requests")
+                print(f"Labeled {labeled} rows.")
+            if totals["call_lights"] and rebuild:
+                print("Rebuilding analytics rollups...")
+                analytics_rollup.rebuild(connection)
+            if totals["added"]:
+                connection.execute(text("""
+                    INSERT INTO audit_log (timestamp, event_type, details)
+                    VALUES (:timestamp, 'Legacy Import', :details);
+                """), {
+                    "timestamp": datetime.now(timezone.utc),
+                    "details": f"{totals['added']} rows ({totals['call_lights']} call lights) "
+                               f"from {len(paths)} legacy log file(s)",
+                })
+
+    totals["seconds"] = round(time.perf_counter() - started, 2)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("files", nargs="*", help="log files (default: *_log.csv next to this script)")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--no-rebuild", action="store_true",
+                        help="skip the analytics rollup rebuild (run it later, e.g. after several imports)")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url (or DATABASE_URL) is required")
+
+    paths = args.files or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*_log.csv")))
+    totals = run(create_engine(args.database_url), paths, args.batch_size, rebuild=not args.no_rebuild)
+    rate = totals["read"] / totals["seconds"] if totals["seconds"] else 0
+    print(f"\n{totals['read']} rows read, {totals['added']} new ({totals['call_lights']} call lights), "
+          f"{totals['skipped']} skipped in {totals['seconds']}s ({rate:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Checks for the legacy CSV log import (no Postgres needed).
+
+Usage:
+    python legacy_import_tests.py
+
+Parses fixture lines taken from the *_log.csv files next to this script and
+checks that:
+    - the 4, 5 and 6 column layouts are told apart, including _log.csv rows
+      with an empty category, 5-column cna_log.csv rows and follow_up_log.csv
+      rows (whose 5th column is an answer, not a category)
+    - Windows-1252 lines decode, and UTF-8 text once mis-decoded as
+      Windows-1252 ("itâ€™s") is repaired
+    - re-importing a file adds nothing (ON CONFLICT (source_file, line_no)),
+      and lines appended since are added, over a fake connection that keeps
+      legacy_requests unique on that key
+    - every row of the real logs parses
+"""
+
+import csv
+import glob
+import os
+import tempfile
+from datetime import datetime
+
+import legacy_import
+
+FIXTURE = [
+    # chat_log.csv: 4 columns
+    "2025-06-30 11:19:17.099925,i need my binder,cna,✅ CNA has been notified.",
+    # cna_log.csv: 5 columns
+    "2025-07-14 12:18:39.730406,205A,Diapers,cna,✅ CNA has been notified.",
+    # _log.csv: 6 columns, empty category
+    "2025-07-07 11:38:29.975595,Room 12B,Nurse Johnson,I want to know about going home,,Who is the question about?",
+    # nurse_log.csv: 6 columns
+    "2025-07-07 10:46:33.737883,Room 12B,Nurse Johnson,Pain,nurse,✅ Nurse has been notified.",
+    # follow_up_log.csv: 6 columns, follow-up key and answer
+    "2025-07-04 17:03:33.539721,Room 12B,Nurse Johnson,formula_type,Formula,What formula are you using?",
+    # not a record
+    "timestamp,text,category,reply",
+]
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def copy_expert(self, sql, buffer):
+        self.connection.staging = [dict(zip(legacy_import.COLUMNS, row)) for row in csv.reader(buffer)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """legacy_staging + legacy_requests, unique on (source_file, line_no)."""
+
+    def __init__(self):
+        self.staging = []
+        self.rows = {}  # (source_file, line_no) -> row
+        self.connection = self
+        self.dbapi_connection = self
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def begin(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        if sql.startswith("TRUNCATE legacy_staging"):
+            self.staging = []
+            return None
+        if sql.startswith("INSERT INTO legacy_requests"):
+            returned = []
+            for row in self.staging:
+                key = (row["source_file"], int(row["line_no"]))
+                if key not in self.rows:  # ON CONFLICT (source_file, line_no) DO NOTHING
+                    self.rows[key] = row
+                    returned.append((row["role"] or None,))
+            return _Result(returned)
+        raise AssertionError(f"unexpected SQL: {sql[:60]}")
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+def import_checks(directory):
+    checks = []
+    path = os.path.join(directory, "cna_log.csv")
+    with open(path, "wb") as f:
+        f.write(("\n".join(FIXTURE[:2]) + "\n").encode("utf-8"))
+    connection = FakeConnection()
+
+    first = legacy_import.import_file(connection, path, batch_size=1)
+    again = legacy_import.import_file(connection, path)
+    checks.append(("first import adds every row", first == (2, 2, 2, 0)))
+    checks.append(("re-import adds nothing", again == (2, 0, 0, 0) and len(connection.rows) == 2))
+
+    with open(path, "ab") as f:
+        f.write((FIXTURE[3] + "\n").encode("utf-8"))
+    appended = legacy_import.import_file(connection, path)
+    checks.append(("appended lines are added on the next run", appended == (3, 1, 1, 0)
+                   and ("cna_log.csv", 3) in connection.rows))
+    return checks
+
+
+def run_legacy_import_tests() -> None:
+    checks = []
+    chat, cna, empty, nurse, follow_up, header = (next(csv.reader([line])) for line in FIXTURE)
+
+    row = legacy_import.parse_row(chat)
+    checks.append(("4 columns: text, category, reply", row["user_input"] == "i need my binder"
+                   and row["category"] == "cna" and row["room"] is None and row["role"] == "cna"))
+    row = legacy_import.parse_row(cna)
+    checks.append(("5 columns (cna_log.csv): room first", row["room"] == "205A"
+                   and row["user_input"] == "Diapers" and row["role"] == "cna"))
+    row = legacy_import.parse_row(empty)
+    checks.append(("6 columns with an empty category (_log.csv)", row["room"] == "12B"
+                   and row["staff_name"] == "Nurse Johnson" and row["category"] is None and row["role"] is None
+                   and row["timestamp"] == datetime(2025, 7, 7, 11, 38, 29, 975595)))
+    row = legacy_import.parse_row(nurse)
+    checks.append(("6 columns with a category", row["user_input"] == "Pain" and row["role"] == "nurse"))
+    row = legacy_import.parse_row(follow_up)
+    checks.append(("6 columns, follow-up key and answer", row["follow_up_key"] == "formula_type"
+                   and row["user_input"] == "Formula" and row["category"] == "follow-up" and row["role"] is None))
+    checks.append(("header and short rows are skipped", legacy_import.parse_row(header) is None
+                   and legacy_import.parse_row(chat[:3]) is None))
+
+    checks.append(("UTF-8 decodes as is", legacy_import.decode_line("it’s".encode("utf-8")) == "it’s"))
+    checks.append(("Windows-1252 falls back", legacy_import.decode_line(b"it\x92s \x96 ok") == "it’s – ok"))
+    checks.append(("mojibake is repaired", legacy_import.repair_text("itâ€™s") == "it’s"
+                   and legacy_import.decode_line("itâ€™s".encode("utf-8")) == "it’s"))
+    checks.append(("text that can't be repaired is kept", legacy_import.repair_text("Â£5 Ã") == "Â£5 Ã"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        checks.extend(import_checks(directory))
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    read = skipped = 0
+    for path in sorted(glob.glob(os.path.join(here, "*_log.csv"))):
+        for _, row in legacy_import.read_rows(path):
+            read += 1
+            skipped += row is None
+    checks.append(("every row of the real logs parses", read and not skipped))
+
+    failures = 0
+    print("\n=== Legacy import checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"Real logs: {read} rows read, {skipped} skipped")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL LEGACY IMPORT CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_legacy_import_tests()
@@ -0,0 +1,438 @@
+"""
+Socket.IO load generator and end-to-end latency benchmark.
+
+Usage:
+    python load_harness.py --database-url postgresql://localhost/call_light_bench \\
+        --rooms 20 --dashboards 3 --requests-per-room 10 --out results.json
+    python load_harness.py --compact ...       # dashboards speak compact-v1
+    python load_harness.py --session-backend db ...   # server-side sessions
+    python load_harness.py --compare old.json new.json
+
+Starts app.py in a subprocess (its own port, the given DB), then:
+    - N patient rooms walk /room -> language -> demographics and send button
+      taps and free-text notes to /api/chat/step (as chat.html does), each
+      with a /patient socket joined
+    - M dashboards listen for new_request; one of them (by request id)
+      acknowledges and later completes each request
+
+Reported (milliseconds, p50/p90/p99/max):
+    post_to_dashboard       step POST sent       -> new_request at a dashboard
+    ack_to_patient          acknowledge_request  -> request:status on the tablet
+    complete_to_patient     complete_request     -> request:done on the tablet
+    chat_post               /api/chat/step round trip
+plus throughput, the app worker's CPU use and the frames/bytes the dashboards
+received (JSON-encoded payload size, per event and per frame) and the size
+of the session cookie the tablets send back. Results go to JSON so runs can
+be compared across commits with --compare. The drain waits for the request
+ids the app returned, so it counts every request that was really created.
+
+Every tap is meant to be its own request, so by default the app runs with
+RATE_LIMIT_BACKEND=off and REQUEST_COALESCE_SECONDS=0: with a handful of
+buttons, a room tapping the same one twice inside the 5-minute window would
+otherwise only bump the open request's repeat count, and a fast run hits
+the per-room chat limit. --rate-limits / --coalesce keep the app's defaults
+(then requests_created < requests_sent).
+
+Needs: requests, python-socketio[client] (both installed with Flask-SocketIO
+and requirements.txt) and a Postgres the app can create its tables in.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+import socketio
+
+import compact_events
+from metrics import LatencyStats
+
+BUTTONS = [
+    "I need ice chips",
+    "I need ice water",
+    "Diapers",
+    "Wipes",
+    "Pain",
+    "Gas pain",
+    "My IV pump is beeping",
+]
+NOTES = [
+    "Could someone bring me an extra blanket",
+    "My incision is a little sore",
+    "Can I get a warm pack for my back",
+]
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# --- helpers ---------------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_cpu_seconds(pid):
+    """utime+stime of a process from /proc (Linux only; None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+class Matcher:
+    """Pairs 'sent' timestamps with the matching 'received' event."""
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.pending = defaultdict(deque)
+        self.lock = threading.Lock()
+        self.matched = 0
+
+    def sent(self, key):
+        with self.lock:
+            self.pending[key].append(time.monotonic())
+
+    def received(self, key):
+        now = time.monotonic()
+        with self.lock:
+            queue = self.pending.get(key)
+            if not queue:
+                return False
+            started = queue.popleft()
+            self.matched += 1
+        self.stats.observe(self.name, now - started)
+        return True
+
+
+# --- app under test ----------------------------------------------------------
+
+def start_app(database_url, port, extra_env=None):
+    env = dict(os.environ, DATABASE_URL=database_url, PORT=str(port), PYTHONUNBUFFERED="1")
+    env.update(extra_env or {})
+    log = open(os.path.join(APP_DIR, "load_harness_app.log"), "w")
+    proc = subprocess.Popen([sys.executable, "app.py"], cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("app exited during startup; see load_harness_app.log")
+        try:
+            if requests.get(base + "/", timeout=1).status_code == 200:
+                return proc, base
+        except requests.RequestException:
+            time.sleep(0.3)
+    proc.terminate()
+    raise RuntimeError("app did not come up within 60s")
+
+
+# --- simulated clients -------------------------------------------------------
+
+class Dashboard:
+    def __init__(self, index, count, base, stats, matchers, complete_delay, compact=False):
+        self.index = index
+        self.count = count
+        self.complete_delay = complete_delay
+        self.matchers = matchers
+        self.handled = 0
+        self.frames = 0
+        self.events = 0
+        self.bytes = 0
+        self.protocol = "json"
+        self.sio = socketio.Client(reconnection=True)
+        self.sio.on("new_request", lambda data: self.on_frame("new_request", data))
+        for event in ("request_updated", "remove_request", "new_audit_log", "dashboard:resync"):
+            self.sio.on(event, lambda data=None, event=event: self.on_frame(event, data))
+        self.sio.on(compact_events.BATCH_EVENT, self.on_batch)
+        self.sio.connect(base, transports=["websocket", "polling"], wait_timeout=10)
+        if compact:
+            # Same handshake as dashboard.html (which never shows the audit feed)
+            reply = self.sio.call("dashboard:hello", {"protocol": compact_events.PROTOCOL,
+                                                      "mute": ["new_audit_log"]}, timeout=10)
+            self.protocol = (reply or {}).get("protocol", "json")
+
+    def _count(self, payload, events):
+        self.frames += 1
+        self.events += events
+        self.bytes += len(json.dumps(payload, separators=(",", ":")))
+
+    def on_frame(self, event, data):
+        self._count(data, 1)
+        if event == "new_request":
+            self.on_new_request(data)
+        return True  # ack for the server-side emit queue
+
+    def on_batch(self, items):
+        self._count(items, len(items))
+        for item in items:
+            event, data = compact_events.decode(item)
+            if event == "new_request":
+                self.on_new_request(data)
+        return True
+
+    def on_new_request(self, data):
+        key = (data.get("room"), data.get("request"))
+        self.matchers["post_to_dashboard"].received((self.index, key))
+        rid = data.get("id")
+        if rid and hash(rid) % self.count == self.index:
+            threading.Thread(target=self.work_request, args=(rid, data.get("room")), daemon=True).start()
+
+    def work_request(self, rid, room):
+        time.sleep(random.uniform(0.05, 0.2))
+        self.matchers["ack_to_patient"].sent((room, rid))
+        # room_number omitted on purpose: exercises the request -> room cache
+        self.sio.emit("acknowledge_request", {"request_id": rid, "status": "ack", "nurse_name": "Harness"})
+        time.sleep(self.complete_delay)
+        self.matchers["complete_to_patient"].sent((room, rid))
+        self.sio.emit("complete_request", {"request_id": rid, "nurse_name": "Harness"})
+        self.handled += 1
+
+
+class PatientRoom:
+    def __init__(self, room, base, stats, matchers, dashboards):
+        self.room = room
+        self.base = base
+        self.stats = stats
+        self.matchers = matchers
+        self.dashboards = dashboards
+        self.errors = 0
+        self.posts = 0
+        self.request_ids = set()  # ids the app returned (a coalesced repeat returns the open one)
+        self.cookie_bytes = []  # session cookie size after each post
+        self.http = requests.Session()
+        self.sio = socketio.Client(reconnection=True)
+        self.sio.on("request:status", lambda d: self.matchers["ack_to_patient"].received((self.room, d.get("request_id"))),
+                    namespace="/patient")
+        self.sio.on("request:done", lambda d: self.matchers["complete_to_patient"].received((self.room, d.get("request_id"))),
+                    namespace="/patient")
+        self.sio.connect(base, namespaces=["/patient"], transports=["websocket", "polling"], wait_timeout=10)
+        self.sio.emit("patient:join", {"room_id": room}, namespace="/patient")
+
+    def onboard(self):
+        self.http.get(f"{self.base}/room/{self.room}")
+        self.http.post(f"{self.base}/", data={"language": "en"})
+        self.http.post(f"{self.base}/demographics", data={"is_first_baby": random.choice(["yes", "no"])})
+
+    def post(self, note_ratio):
+        if random.random() < note_ratio:
+            text = f"{random.choice(NOTES)} ({self.room}-{self.posts})"
+            step = {"note": text}
+        else:
+            text = random.choice(BUTTONS)
+            step = {"label": text}  # legacy labels resolve to their button node
+        step["room"] = self.room
+        for d in range(self.dashboards):
+            self.matchers["post_to_dashboard"].sent((d, (self.room, text)))
+        started = time.monotonic()
+        try:
+            r = self.http.post(f"{self.base}/api/chat/step", json=step, timeout=30)
+            if r.status_code != 200:
+                self.errors += 1
+            elif r.json().get("request_id"):
+                self.request_ids.add(r.json()["request_id"])
+        except (requests.RequestException, ValueError):
+            self.errors += 1
+        self.stats.observe("chat_post", time.monotonic() - started)
+        self.posts += 1
+        self.cookie_bytes.append(len(self.http.cookies.get("session") or ""))
+
+    def close(self):
+        self.sio.disconnect()
+
+
+# --- run ---------------------------------------------------------------------
+
+def run(args):
+    port = args.port or _free_port()
+    extra_env = {"SESSION_BACKEND": args.session_backend}
+    if not args.rate_limits:
+        extra_env["RATE_LIMIT_BACKEND"] = "off"
+    if not args.coalesce:
+        extra_env["REQUEST_COALESCE_SECONDS"] = "0"
+    if args.compact:
+        extra_env["DASHBOARD_COMPACT_PROTOCOL"] = "1"
+    proc, base = start_app(args.database_url, port, extra_env)
+    stats = LatencyStats(window=1_000_000)
+    matchers = {name: Matcher(stats, name)
+                for name in ("post_to_dashboard", "ack_to_patient", "complete_to_patient")}
+    rooms = [str(231 + i) for i in range(args.rooms)]
+
+    try:
+        dashboards = [Dashboard(i, args.dashboards, base, stats, matchers, args.complete_delay, args.compact)
+                      for i in range(args.dashboards)]
+        patients = [PatientRoom(room, base, stats, matchers, args.dashboards) for room in rooms]
+        for p in patients:
+            p.onboard()
+
+        cpu_before = _proc_cpu_seconds(proc.pid)
+        started = time.monotonic()
+
+        def drive(patient):
+            for _ in range(args.requests_per_room):
+                patient.post(args.note_ratio)
+                time.sleep(random.uniform(0, 2 * args.think_time))
+
+        threads = [threading.Thread(target=drive, args=(p,)) for p in patients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        send_s = time.monotonic() - started
+
+        # Let acks/completions drain: one completion per request the app created
+        expected = len(set().union(*(p.request_ids for p in patients)))
+        deadline = time.monotonic() + args.drain_timeout
+        while time.monotonic() < deadline and matchers["complete_to_patient"].matched < expected:
+            time.sleep(0.2)
+        wall_s = time.monotonic() - started
+        cpu_after = _proc_cpu_seconds(proc.pid)
+
+        try:
+            server_metrics = requests.get(f"{base}/debug/metrics", timeout=5).json()
+        except Exception:
+            server_metrics = None
+
+        for p in patients:
+            p.close()
+        for d in dashboards:
+            d.sio.disconnect()
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    cpu_s = (cpu_after - cpu_before) if cpu_before is not None and cpu_after is not None else None
+    frames = sum(d.frames for d in dashboards)
+    events = sum(d.events for d in dashboards)
+    sent_bytes = sum(d.bytes for d in dashboards)
+    cookie_bytes = [n for p in patients for n in p.cookie_bytes]
+    return {
+        "commit": _git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("database_url", "compare", "out")},
+        "requests_sent": args.rooms * args.requests_per_room,
+        "requests_created": expected,
+        "http_errors": sum(p.errors for p in patients),
+        "matched": {name: m.matched for name, m in matchers.items()},
+        "latency_ms": stats.snapshot(),
+        "throughput_rps": round(args.rooms * args.requests_per_room / send_s, 2) if send_s else None,
+        "wall_s": round(wall_s, 2),
+        "worker_cpu_s": round(cpu_s, 2) if cpu_s is not None else None,
+        "worker_cpu_pct": round(100 * cpu_s / wall_s, 1) if cpu_s is not None and wall_s else None,
+        "dashboard_wire": {
+            "protocol": dashboards[0].protocol if dashboards else None,
+            "frames": frames,
+            "events": events,
+            "bytes": sent_bytes,
+            "bytes_per_event": round(sent_bytes / events, 1) if events else None,
+            "events_per_frame": round(events / frames, 2) if frames else None,
+        },
+        "session_cookie": {
+            "backend": args.session_backend,
+            "mean_bytes": round(sum(cookie_bytes) / len(cookie_bytes), 1) if cookie_bytes else None,
+            "max_bytes": max(cookie_bytes) if cookie_bytes else None,
+        },
+        "server_metrics": server_metrics,
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'metric':28s} {old.get('commit') or 'old':>12s} {new.get('commit') or 'new':>12s}   delta")
+    for name in sorted(set(old["latency_ms"]) | set(new["latency_ms"])):
+        for q in ("p50_ms", "p90_ms", "p99_ms"):
+            a = old["latency_ms"].get(name, {}).get(q)
+            b = new["latency_ms"].get(name, {}).get(q)
+            if a is None or b is None:
+                continue
+            print(f"{name + ' ' + q:28s} {a:12.2f} {b:12.2f}   {b - a:+.2f}")
+    for key in ("throughput_rps", "worker_cpu_pct"):
+        a, b = old.get(key), new.get(key)
+        if a is not None and b is not None:
+            print(f"{key:28s} {a:12.2f} {b:12.2f}   {b - a:+.2f}")
+    for key in ("frames", "bytes_per_event"):
+        a = (old.get("dashboard_wire") or {}).get(key)
+        b = (new.get("dashboard_wire") or {}).get(key)
+        if a is not None and b is not None:
+            print(f"{'dashboard ' + key:28s} {a:12.2f} {b:12.2f}   {b - a:+.2f}")
+    for key in ("mean_bytes", "max_bytes"):
+        a = (old.get("session_cookie") or {}).get(key)
+        b = (new.get("session_cookie") or {}).get(key)
+        if a is not None and b is not None:
+            print(f"{'session cookie ' + key:28s} {a:12.2f} {b:12.2f}   {b - a:+.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("HARNESS_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--dashboards", type=int, default=3)
+    parser.add_argument("--requests-per-room", type=int, default=10)
+    parser.add_argument("--note-ratio", type=float, default=0.3)
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between taps per room")
+    parser.add_argument("--complete-delay", type=float, default=0.5)
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--out", default=None, help="JSON output path (default load_harness_<commit>.json)")
+    parser.add_argument("--compact", action="store_true", help="dashboards negotiate the compact-v1 batched protocol")
+    parser.add_argument("--session-backend", choices=("cookie", "memory", "db"), default="cookie",
+                        help="SESSION_BACKEND for the app under test")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep the app's rate limits (default: RATE_LIMIT_BACKEND=off for the run)")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="keep repeat-press coalescing (default: REQUEST_COALESCE_SECONDS=0 for the run)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.database_url:
+        parser.error("--database-url (or HARNESS_DATABASE_URL) is required; use a scratch Postgres database")
+    if args.rooms > 29:
+        parser.error("--rooms is limited to the 29 seeded rooms (231-259)")
+
+    result = run(args)
+    out = args.out or f"load_harness_{result['commit'] or 'local'}.json"
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"\nSent {result['requests_sent']} requests ({result['requests_created']} created, "
+          f"{result['http_errors']} HTTP errors), "
+          f"{result['throughput_rps']} req/s, worker CPU {result['worker_cpu_pct']}%")
+    for name, s in sorted(result["latency_ms"].items()):
+        print(f"  {name:22s} n={s['count']:<5d} p50={s['p50_ms']:8.2f}  p90={s['p90_ms']:8.2f}  "
+              f"p99={s['p99_ms']:8.2f}  max={s['max_ms']:8.2f} ms")
+    wire = result["dashboard_wire"]
+    print(f"  dashboards ({wire['protocol']}): {wire['events']} events in {wire['frames']} frames, "
+          f"{wire['bytes_per_event']} bytes/event")
+    cookie = result["session_cookie"]
+    print(f"  session cookie ({cookie['backend']}): mean {cookie['mean_bytes']} bytes, max {cookie['max_bytes']} bytes")
+    print(f"Saved {out}")
+
+
+if __name__ == "__main__":
+    main()
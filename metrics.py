@@ -0,0 +1,57 @@
+"""
+Tiny in-process latency recorder for /debug/metrics.
+
+Keeps the last `window` samples per name and reports count/mean/p50/p90/p99.
+Cheap enough to call from every handler; resets on worker restart.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class LatencyStats:
+    def __init__(self, window=2048):
+        self._window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            ring = self._samples.get(name)
+            if ring is None:
+                ring = self._samples[name] = deque(maxlen=self._window)
+            ring.append(seconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            items = {name: sorted(ring) for name, ring in self._samples.items()}
+            counts = dict(self._counts)
+        out = {}
+        for name, samples in items.items():
+            if not samples:
+                continue
+            n = len(samples)
+            out[name] = {
+                "count": counts.get(name, n),
+                "mean_ms": round(sum(samples) / n * 1000, 3),
+                "p50_ms": round(samples[int(0.50 * (n - 1))] * 1000, 3),
+                "p90_ms": round(samples[int(0.90 * (n - 1))] * 1000, 3),
+                "p99_ms": round(samples[int(0.99 * (n - 1))] * 1000, 3),
+                "max_ms": round(samples[-1] * 1000, 3),
+            }
+        return out
+
+
+latency = LatencyStats()
@@ -0,0 +1,128 @@
+"""
+Presence and reconnect replay for the /patient Socket.IO namespace.
+
+For every room we keep:
+  - the sockets currently joined (sid -> joined at), and when the room was
+    last seen with any socket at all
+  - a small ring buffer of the patient events we emitted (request:received,
+    request:status, request:done), each tagged with a per-process sequence
+
+A tablet that drops Wi-Fi rejoins with the last sequence it saw and gets the
+events it missed, instead of reloading /chat. Memory is bounded by
+(number of rooms) x (buffer size); sockets leave the presence map on
+disconnect, which Socket.IO also fires when a client misses its pings.
+"""
+
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+
+
+class _RoomState:
+    __slots__ = ("sockets", "events", "last_seen")
+
+    def __init__(self, buffer_size):
+        self.sockets = {}  # sid -> joined at (epoch seconds)
+        self.events = deque(maxlen=buffer_size)  # (seq, ts, event, payload)
+        self.last_seen = None
+
+
+class PatientPresence:
+    def __init__(self, buffer_size=20, replay_window=1800.0, clock=time.time):
+        self.buffer_size = buffer_size
+        self.replay_window = replay_window
+        self._clock = clock
+        self._rooms = {}
+        self._sid_room = {}  # sid -> room
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        # Sequence numbers restart with the process; clients compare epochs
+        # so a worker restart doesn't make them skip new events.
+        self.epoch = uuid.uuid4().hex[:8]
+        self.replayed = 0
+
+    def _room(self, room):
+        state = self._rooms.get(room)
+        if state is None:
+            state = self._rooms[room] = _RoomState(self.buffer_size)
+        return state
+
+    # --- presence ---
+    def join(self, sid, room):
+        now = self._clock()
+        with self._lock:
+            previous = self._sid_room.get(sid)
+            if previous and previous != room:
+                self._rooms[previous].sockets.pop(sid, None)
+            self._sid_room[sid] = room
+            state = self._room(room)
+            state.sockets[sid] = now
+            state.last_seen = now
+
+    def leave(self, sid):
+        with self._lock:
+            room = self._sid_room.pop(sid, None)
+            if room:
+                state = self._rooms[room]
+                state.sockets.pop(sid, None)
+                state.last_seen = self._clock()
+
+    # --- replay buffer ---
+    def record(self, room, event, payload):
+        """Buffer an outgoing patient event; returns its sequence number."""
+        seq = next(self._seq)
+        with self._lock:
+            self._room(room).events.append((seq, self._clock(), event, payload))
+        return seq
+
+    def latest_seq(self, room):
+        """Sequence of the newest buffered event for `room` (0 if none)."""
+        with self._lock:
+            state = self._rooms.get(room)
+            return state.events[-1][0] if state and state.events else 0
+
+    def missed_since(self, room, last_seq, epoch=None):
+        """
+        Events for `room` the client hasn't seen. A different (or missing) epoch
+        means the client's sequence numbers came from an earlier process, so
+        everything still inside the replay window counts as missed.
+        """
+        try:
+            last_seq = int(last_seq)
+        except (TypeError, ValueError):
+            return []
+        if epoch != self.epoch:
+            last_seq = 0
+        cutoff = self._clock() - self.replay_window
+        with self._lock:
+            state = self._rooms.get(room)
+            if not state:
+                return []
+            missed = [(seq, event, payload)
+                      for seq, ts, event, payload in state.events
+                      if seq > last_seq and ts >= cutoff]
+            self.replayed += len(missed)
+        return missed
+
+    # --- metrics ---
+    def snapshot(self):
+        now = self._clock()
+        rooms = {}
+        with self._lock:
+            for room, state in self._rooms.items():
+                rooms[room] = {
+                    "connected": len(state.sockets),
+                    "last_seen_s": round(now - state.last_seen, 1) if state.last_seen else None,
+                    "buffered_events": len(state.events),
+                }
+            return {
+                "epoch": self.epoch,
+                "rooms_tracked": len(rooms),
+                "rooms_connected": sum(1 for r in rooms.values() if r["connected"]),
+                "sockets": len(self._sid_room),
+                "buffered_events": sum(r["buffered_events"] for r in rooms.values()),
+                "replayed": self.replayed,
+                "rooms": rooms,
+            }
@@ -0,0 +1,218 @@
+"""
+Token-bucket rate limits for the patient chat, /debug/ping_patient and the
+dashboard's acknowledge/complete socket events.
+
+Each limit is a bucket per key (room, session, socket id, client address):
+`burst` tokens, refilled at burst/per_seconds tokens a second, one token per
+call. A tablet tapping through menus never notices; a stuck tablet or a
+script flooding the single eventlet worker is refused before any DB work or
+broadcast happens. Patient steps are checked once resolved, and emergent
+ones (the emergency button, a note triaged emergent) are never limited.
+
+Two stores, picked with RATE_LIMIT_BACKEND:
+
+    memory  MemoryBuckets: dict of key -> [tokens, updated]; LRU-bounded
+            (a bucket idle long enough to be full is the same as no bucket,
+            so evicting the oldest costs nothing). One worker only.
+    db      DbBuckets: rate_limit_buckets table, one atomic UPSERT per check,
+            so every worker shares the same buckets. A DB error lets the call
+            through (fail open); call lights matter more than limits.
+    off     no limits
+
+Limits are written "burst/seconds" (e.g. "30/60": 30 calls at once, 30 more
+per minute) and can be overridden per limit with RATE_LIMIT_<NAME>.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+BACKENDS = ("memory", "db", "off")
+DEFAULT_MAXSIZE = 50_000
+
+# name -> "burst/seconds"
+DEFAULT_LIMITS = {
+    "chat_session": "30/60",   # one tablet/browser
+    "chat_room": "60/60",      # every device in the room together
+    "ping_patient": "10/60",   # /debug/ping_patient per client address
+    "staff_socket": "60/60",   # acknowledge_request + complete_request per dashboard socket
+}
+
+# Shown in the chat instead of the step's reply when a patient is limited
+PATIENT_MESSAGES = {
+    "en": "You've sent a lot of messages in a short time, and your care team has them. "
+          "Please wait a moment before sending more. For urgent needs, use the red call light.",
+    "es": "Ha enviado muchos mensajes en poco tiempo y su equipo de atención ya los tiene. "
+          "Espere un momento antes de enviar más. Para necesidades urgentes, use la luz roja de llamada.",
+    "zh": "您在短时间内发送了很多消息，您的护理团队已经收到。请稍等片刻再发送。如有紧急需要，请使用红色呼叫灯。",
+}
+
+
+def patient_message(language):
+    return PATIENT_MESSAGES.get(language, PATIENT_MESSAGES["en"])
+
+
+def parse_limit(spec):
+    """'30/60' -> (burst 30, 0.5 tokens/second)."""
+    burst, _, seconds = str(spec).partition("/")
+    burst, seconds = float(burst), float(seconds or 1)
+    if burst <= 0 or seconds <= 0:
+        raise ValueError(f"bad rate limit '{spec}'")
+    return burst, burst / seconds
+
+
+def limits_from_env(environ=os.environ):
+    """DEFAULT_LIMITS with RATE_LIMIT_<NAME> overrides, parsed."""
+    limits = {}
+    for name, spec in DEFAULT_LIMITS.items():
+        override = environ.get(f"RATE_LIMIT_{name.upper()}")
+        try:
+            limits[name] = parse_limit(override or spec)
+        except ValueError:
+            print(f"WARN: ignoring RATE_LIMIT_{name.upper()}='{override}'; using {spec}.")
+            limits[name] = parse_limit(spec)
+    return limits
+
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            bucket_key VARCHAR(255) PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            updated_at DOUBLE PRECISION NOT NULL,
+            allowed BOOLEAN NOT NULL DEFAULT TRUE
+        );
+    """))
+
+
+class MemoryBuckets:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, clock=time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, rate):
+        """Spend a token from key's bucket; 0.0 if allowed, else seconds until one is free."""
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Bucket level after refill, from the stored row (every SET expression sees the old row)
+_REFILLED = "LEAST(:burst, b.tokens + GREATEST(:now - b.updated_at, 0) * :rate)"
+
+
+class DbBuckets:
+    """Buckets in rate_limit_buckets; refill and spend in one statement."""
+
+    def __init__(self, engine, clock=time.time, purge_idle_seconds=3600):
+        self._engine = engine
+        self._clock = clock
+        self.purge_idle_seconds = purge_idle_seconds
+        self.errors = 0
+        self.purged = 0
+
+    def take(self, key, burst, rate):
+        now = self._clock()
+        try:
+            with self._engine.connect() as connection:
+                with connection.begin():
+                    tokens, allowed = connection.execute(text(f"""
+                        INSERT INTO rate_limit_buckets AS b (bucket_key, tokens, updated_at, allowed)
+                        VALUES (:key, :burst - 1, :now, TRUE)
+                        ON CONFLICT (bucket_key) DO UPDATE
+                        SET tokens = {_REFILLED} - CASE WHEN {_REFILLED} >= 1 THEN 1 ELSE 0 END,
+                            allowed = {_REFILLED} >= 1,
+                            updated_at = GREATEST(:now, b.updated_at)
+                        RETURNING b.tokens, b.allowed;
+                    """), {"key": key, "burst": burst, "rate": rate, "now": now}).fetchone()
+        except Exception as e:
+            self.errors += 1
+            print(f"WARN: rate limit check failed for {key}: {e}")
+            return 0.0
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def purge(self):
+        """Drop buckets idle long enough to be full again (they read the same as no row)."""
+        with self._engine.connect() as connection:
+            with connection.begin():
+                self.purged += connection.execute(
+                    text("DELETE FROM rate_limit_buckets WHERE updated_at < :cutoff"),
+                    {"cutoff": self._clock() - self.purge_idle_seconds},
+                ).rowcount
+
+    def purge_forever(self, sleep, interval=3600):
+        """Purge idle buckets every `interval` seconds (run as a background task with the server's sleep)."""
+        while True:
+            sleep(interval)
+            try:
+                self.purge()
+            except Exception as e:
+                print(f"ERROR purging rate limit buckets: {e}")
+
+
+class RateLimiter:
+    """Named limits over one bucket store; stats per limit."""
+
+    def __init__(self, store=None, limits=None):
+        self.store = store
+        self.limits = limits if limits is not None else limits_from_env()
+        self._counts = {name: [0, 0] for name in self.limits}  # name -> [allowed, limited]
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def check(self, *checks):
+        """
+        checks are (limit name, key) pairs; keys that are None are skipped.
+        Returns (name, retry_after seconds) for the first limit hit, else None.
+        """
+        if self.store is None:
+            return None
+        for name, key in checks:
+            if key is None:
+                continue
+            burst, rate = self.limits[name]
+            retry_after = self.store.take(f"{name}:{key}", burst, rate)
+            counts = self._counts[name]
+            if retry_after:
+                counts[1] += 1
+                return name, retry_after
+            counts[0] += 1
+        return None
+
+    def stats(self):
+        return {
+            "backend": {MemoryBuckets: "memory", DbBuckets: "db"}.get(type(self.store), "off"),
+            "buckets": len(self.store) if isinstance(self.store, MemoryBuckets) else None,
+            "db_errors": getattr(self.store, "errors", 0),
+            "limits": {
+                name: {
+                    "burst": burst,
+                    "per_second": round(rate, 4),
+                    "allowed": self._counts[name][0],
+                    "limited": self._counts[name][1],
+                }
+                for name, (burst, rate) in self.limits.items()
+            },
+        }
@@ -0,0 +1,110 @@
+"""
+Checks and overhead benchmark for the token-bucket rate limits (no database needed).
+
+Usage:
+    python rate_limit_tests.py
+
+Drives RateLimiter over MemoryBuckets with a fake clock and checks that:
+    - a bucket allows its burst, then refuses with the right retry_after,
+      and refills at burst/seconds
+    - rooms, sessions and sockets have their own buckets; the first limit hit
+      is the one reported; keys that are None are skipped; "off" allows all
+    - the bucket map stays bounded, limits parse and env overrides apply
+    - a chat step's check (session + room buckets) costs well under 50 us,
+      across 20,000 live sessions
+"""
+
+import time
+
+from rate_limit import (
+    DEFAULT_LIMITS,
+    MemoryBuckets,
+    RateLimiter,
+    limits_from_env,
+    parse_limit,
+    patient_message,
+)
+
+BENCH_CHECKS = 200_000
+BENCH_SESSIONS = 20_000
+BUDGET_US = 50
+
+
+def bench_us_per_check():
+    limiter = RateLimiter(MemoryBuckets(), limits_from_env({}))
+    sessions = [f"{n:016x}" for n in range(BENCH_SESSIONS)]
+    rooms = [str(r) for r in range(231, 261)]
+    started = time.perf_counter()
+    for n in range(BENCH_CHECKS):
+        limiter.check(("chat_session", sessions[n % BENCH_SESSIONS]), ("chat_room", rooms[n % 30]))
+    return (time.perf_counter() - started) / BENCH_CHECKS * 1e6
+
+
+def run_rate_limit_tests() -> None:
+    checks = []
+    now = [0.0]
+    limits = {"chat_session": (5, 1.0), "chat_room": (8, 2.0), "ping_patient": (2, 0.1), "staff_socket": (3, 1.0)}
+    limiter = RateLimiter(MemoryBuckets(clock=lambda: now[0]), limits)
+
+    allowed = [limiter.check(("chat_session", "a")) is None for _ in range(5)]
+    refused = limiter.check(("chat_session", "a"))
+    checks.append(("burst of 5 allowed", all(allowed)))
+    checks.append(("6th refused with retry_after 1 s", refused == ("chat_session", 1.0)))
+    now[0] += 0.5
+    checks.append(("half a token is not enough", limiter.check(("chat_session", "a")) == ("chat_session", 0.5)))
+    now[0] += 0.5
+    checks.append(("refilled after 1 s", limiter.check(("chat_session", "a")) is None))
+    now[0] += 100
+    checks.append(("refill is capped at the burst", all(limiter.check(("chat_session", "a")) is None for _ in range(5))
+                   and limiter.check(("chat_session", "a")) is not None))
+
+    checks.append(("other session has its own bucket", limiter.check(("chat_session", "b")) is None))
+    for n in range(8):
+        limiter.check(("chat_session", f"tablet-{n}"), ("chat_room", "241"))
+    checks.append(("room limit covers every device in the room",
+                   limiter.check(("chat_session", "tablet-new"), ("chat_room", "241"))[0] == "chat_room"))
+    checks.append(("other room unaffected", limiter.check(("chat_session", "c"), ("chat_room", "242")) is None))
+    checks.append(("None keys skipped", limiter.check(("chat_session", "d"), ("chat_room", None)) is None))
+    for _ in range(3):
+        limiter.check(("staff_socket", "sid-1"))
+    checks.append(("staff socket limited", limiter.check(("staff_socket", "sid-1"))[0] == "staff_socket"))
+
+    stats = limiter.stats()
+    checks.append(("stats count allowed and limited", stats["limits"]["chat_session"]["limited"] == 3
+                   and stats["limits"]["chat_room"]["limited"] == 1 and stats["backend"] == "memory"))
+
+    off = RateLimiter(None, limits)
+    checks.append(("off allows everything", all(off.check(("chat_session", "a")) is None for _ in range(100))))
+
+    small = MemoryBuckets(maxsize=100)
+    for n in range(1000):
+        small.take(f"k{n}", 5, 1.0)
+    checks.append(("bucket map bounded", len(small) == 100))
+
+    checks.append(("'30/60' parses to burst 30, 0.5/s", parse_limit("30/60") == (30.0, 0.5)))
+    env_limits = limits_from_env({"RATE_LIMIT_CHAT_ROOM": "10/5", "RATE_LIMIT_PING_PATIENT": "nonsense"})
+    checks.append(("env override applies", env_limits["chat_room"] == (10.0, 2.0)))
+    checks.append(("bad override falls back", env_limits["ping_patient"] == parse_limit(DEFAULT_LIMITS["ping_patient"])))
+    checks.append(("patient message falls back to English", patient_message("fr") == patient_message("en")
+                   and patient_message("es") != patient_message("en")))
+
+    us = bench_us_per_check()
+    checks.append((f"chat step check {us:.2f} us (budget {BUDGET_US} us)", us < BUDGET_US))
+
+    failures = 0
+    print("\n=== Rate limit checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"Overhead: {us:.2f} us per chat step check (session + room), "
+          f"{BENCH_CHECKS} checks over {BENCH_SESSIONS} sessions")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL RATE LIMIT CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_rate_limit_tests()
@@ -0,0 +1,136 @@
+"""
+Coalescing of repeat presses: the same request from the same room while the
+first one is still open is a repeat, not a new request.
+
+Patients press "Ice Chips/Water" three times in a minute. Without this each
+press is a requests row, an audit row and a dashboard card. With it, a press
+whose (room, English label) matches an open request created within the
+window bumps that request's repeat_count / last_repeat_at, and dashboards
+get one request_updated for the card they already show.
+
+OpenRequestIndex holds the open (room, label) pairs in a dict, so the check
+on every press is one lookup. process_request registers a request as soon as
+it mints the id (before the background INSERT), so presses a few ms apart
+coalesce too; complete_request removes it. App startup loads the open
+requests from the requests table. Past the window a press opens a new
+request: the care team sees a fresh card for a patient still waiting.
+Emergent requests are never coalesced (process_request skips the index for
+them): every emergency press alerts. A request whose INSERT fails is closed
+again, so the next press isn't folded into a card nobody sees.
+
+Per process, like the other in-memory state here (see unit_census.py).
+"""
+
+import threading
+import time
+
+from sqlalchemy import text
+
+DEFAULT_WINDOW_SECONDS = 5 * 60
+
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        ALTER TABLE requests
+        ADD COLUMN IF NOT EXISTS repeat_count INTEGER NOT NULL DEFAULT 0;
+    """))
+    connection.execute(text("""
+        ALTER TABLE requests
+        ADD COLUMN IF NOT EXISTS last_repeat_at TIMESTAMPTZ;
+    """))
+
+
+def record_repeat(connection, request_id, repeat_count, repeated_at):
+    """
+    Store the counter from memory. Absolute and monotonic, so it is right
+    whichever of this and the request's INSERT commits first (the INSERT
+    also takes the count; see OpenRequestIndex.repeats).
+    """
+    connection.execute(text("""
+        UPDATE requests
+        SET repeat_count = GREATEST(COALESCE(repeat_count, 0), :n),
+            last_repeat_at = GREATEST(COALESCE(last_repeat_at, :at), :at)
+        WHERE request_id = :request_id;
+    """), {"n": repeat_count, "at": repeated_at, "request_id": request_id})
+
+
+class OpenRequestIndex:
+    def __init__(self, window=DEFAULT_WINDOW_SECONDS, clock=time.time):
+        self.window = window
+        self._clock = clock
+        self._open = {}   # (room, label) -> [request_id, created_at, repeats, last_repeat_at] (epoch seconds)
+        self._keys = {}   # request_id -> (room, label)
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _key(room, label):
+        return (str(room), (label or "").strip().lower())
+
+    def load(self, rows):
+        """Rows of (request_id, room, label, created_at datetime, repeat_count), oldest first."""
+        with self._lock:
+            self._open.clear()
+            self._keys.clear()
+            for request_id, room, label, created_at, repeats in rows:
+                if not (request_id and room and label):
+                    continue
+                self._add(request_id, room, label, created_at.timestamp() if created_at else self._clock(), repeats or 0)
+
+    def _add(self, request_id, room, label, created_at, repeats=0):
+        key = self._key(room, label)
+        previous = self._open.get(key)
+        if previous:
+            self._keys.pop(previous[0], None)
+        self._open[key] = [request_id, created_at, repeats, None]
+        self._keys[request_id] = key
+
+    def repeat_of(self, room, label):
+        """request_id of an open identical request from room inside the window, else None."""
+        if not (self.window and room and label):
+            return None
+        entry = self._open.get(self._key(room, label))
+        if entry and self._clock() - entry[1] <= self.window:
+            return entry[0]
+        return None
+
+    def open(self, request_id, room, label):
+        """A new request from room (call before its INSERT, so quick repeats find it)."""
+        if not (room and label):
+            return
+        with self._lock:
+            self._add(request_id, room, label, self._clock())
+            self.opened += 1
+
+    def bump(self, request_id):
+        """Count a repeat press; returns (repeat_count, last_repeat_at epoch) or None if no longer open."""
+        with self._lock:
+            key = self._keys.get(request_id)
+            if key is None:
+                return None
+            entry = self._open[key]
+            entry[2] += 1
+            entry[3] = self._clock()
+            self.coalesced += 1
+            return entry[2], entry[3]
+
+    def repeats(self, request_id):
+        key = self._keys.get(request_id)
+        return self._open[key][2] if key else 0
+
+    def close(self, request_id):
+        with self._lock:
+            key = self._keys.pop(request_id, None)
+            if key is not None and self._open.get(key, [None])[0] == request_id:
+                del self._open[key]
+
+    def stats(self):
+        presses = self.opened + self.coalesced
+        return {
+            "window_s": self.window,
+            "open": len(self._open),
+            "opened": self.opened,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / presses, 4) if presses else None,
+        }
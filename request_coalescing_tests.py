@@ -0,0 +1,120 @@
+"""
+Checks for coalescing repeat presses into the open request (no database needed).
+
+Usage:
+    python request_coalescing_tests.py
+
+Drives OpenRequestIndex the way process_request and complete_request do
+(repeat_of -> bump, or open; close on completion) and checks that:
+    - three presses of one button in a minute are one request with two repeats
+    - other rooms, other labels and case/whitespace variants behave correctly
+    - a press past the window, or after completion, opens a new request
+    - open requests loaded at startup coalesce like live ones
+    - the check stays O(1): per-press cost is flat from 30 to 30,000 open pairs
+"""
+
+import time
+from datetime import datetime, timezone
+
+from request_coalescing import OpenRequestIndex
+
+WINDOW = 300
+
+
+def press(index, room, label, ids):
+    """What process_request does; returns (request_id, was_repeat)."""
+    repeat_of = index.repeat_of(room, label)
+    if repeat_of:
+        index.bump(repeat_of)
+        return repeat_of, True
+    ids[0] += 1
+    request_id = f"req_{ids[0]}"
+    index.open(request_id, room, label)
+    return request_id, False
+
+
+def per_press_us(open_pairs):
+    index = OpenRequestIndex(window=WINDOW)
+    ids = [0]
+    labels = [f"label {n}" for n in range(max(1, open_pairs // 30))]
+    rooms = [str(r) for r in range(231, 261)]
+    for room in rooms:
+        for label in labels:
+            press(index, room, label, ids)
+    presses = 20_000
+    started = time.perf_counter()
+    for n in range(presses):
+        index.repeat_of(rooms[n % len(rooms)], labels[n % len(labels)])
+    return (time.perf_counter() - started) / presses * 1e6
+
+
+def run_request_coalescing_tests() -> None:
+    checks = []
+    now = [1_000_000.0]
+    index = OpenRequestIndex(window=WINDOW, clock=lambda: now[0])
+    ids = [0]
+
+    first, _ = press(index, "241", "Ice Chips/Water", ids)
+    now[0] += 20
+    second = press(index, "241", "Ice Chips/Water", ids)
+    now[0] += 20
+    third = press(index, "241", " ice chips/water ", ids)
+    checks.append(("3 presses in a minute -> 1 request", second == (first, True) and third == (first, True)))
+    checks.append(("repeat count is 2", index.repeats(first) == 2))
+
+    other_room, repeat = press(index, "242", "Ice Chips/Water", ids)
+    checks.append(("another room is its own request", other_room != first and not repeat))
+    other_label, repeat = press(index, "241", "Pain", ids)
+    checks.append(("another label is its own request", other_label != first and not repeat))
+    checks.append(("no room never coalesces", index.repeat_of(None, "Ice Chips/Water") is None))
+
+    now[0] += WINDOW
+    later, repeat = press(index, "241", "Ice Chips/Water", ids)
+    checks.append(("press past the window opens a new request", later != first and not repeat))
+    now[0] += 10
+    checks.append(("...and later presses repeat the new one", press(index, "241", "Ice Chips/Water", ids) == (later, True)))
+    checks.append(("the older request no longer takes repeats", index.bump(first) is None))
+
+    index.close(later)
+    after_done, repeat = press(index, "241", "Ice Chips/Water", ids)
+    checks.append(("press after completion opens a new request", after_done != later and not repeat))
+    index.close(first)  # completing the superseded one leaves the newer entry alone
+    checks.append(("closing a superseded request keeps the newer one", index.repeat_of("241", "Ice Chips/Water") == after_done))
+
+    disabled = OpenRequestIndex(window=0)
+    disabled.open("req_x", "241", "Pain")
+    checks.append(("window 0 disables coalescing", disabled.repeat_of("241", "Pain") is None))
+
+    loaded = OpenRequestIndex(window=WINDOW, clock=lambda: now[0])
+    created = datetime.fromtimestamp(now[0] - 60, timezone.utc)
+    stale = datetime.fromtimestamp(now[0] - WINDOW - 60, timezone.utc)
+    loaded.load([
+        ("req_a", "250", "Pain", created, 1),
+        ("req_b", "251", "Pain", stale, 0),
+        (None, "252", "Pain", created, 0),
+    ])
+    checks.append(("loaded open request coalesces", loaded.repeat_of("250", "Pain") == "req_a" and loaded.repeats("req_a") == 1))
+    checks.append(("loaded request past the window does not", loaded.repeat_of("251", "Pain") is None))
+
+    stats = index.stats()
+    checks.append(("stats count opened and coalesced", stats["opened"] == 5 and stats["coalesced"] == 3))
+
+    small, large = per_press_us(30), per_press_us(30_000)
+    checks.append((f"O(1) check: {small:.2f} us/press at 30 open, {large:.2f} us at 30,000", large < small * 3 + 1))
+
+    failures = 0
+    print("\n=== Request coalescing checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"Coalesced rate in this run: {stats['coalesced_rate']:.0%}")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL COALESCING CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_request_coalescing_tests()
@@ -0,0 +1,231 @@
+"""
+Label dimension for analytics grouping.
+
+requests.user_input is whatever the patient sent: a button label (English,
+or [ES]/[ZH]-tagged when a localized label had no translation), the
+emergency button's "Patient pressed EMERGENCY button: ..." sentence, or a
+free-text note. Grouping on it directly makes every note its own group, so
+each request also gets a requests.label_id into request_labels:
+
+    button      a button label, in English where a translation exists
+                (matched case-insensitively against every button_config_* and the
+                translation maps, tagged or not)
+    note        a free-text note, bucketed by the triage pattern it matched
+                ("Note: Emergent bleed", "Note: Logistics item", ...)
+    unknown     no text at all
+
+The analytics rollups are keyed by label_id. New requests are labeled as
+they are written (RequestLabeler.label_id); backfill() labels rows written
+before the column existed and legacy CSV imports, classifying each distinct
+user_input once.
+"""
+
+import glob
+import importlib
+import os
+import re
+
+from sqlalchemy import text
+
+import translations
+
+UNKNOWN_LABEL = "Unknown"
+EMERGENCY_LABEL = "I'm having an emergency"
+EMERGENCY_PREFIX = "patient pressed emergency button"
+NOTE_PREFIX = "Note: "
+OTHER_NOTE = NOTE_PREFIX + "Other"
+
+# Requests the /chat flows file under fixed wording rather than a button label
+FIXED_LABELS = ("Patient would like to ask about taking a shower.",)
+
+# Which triage pattern names a note when it matched several
+_PATTERN_PRIORITY = ("SAFETY_OVERRIDE", "DANGEROUS_BP", "EMERGENT", "CLINICAL", "LOGISTICS")
+
+_LANG_TAG = re.compile(r"^\[(ES|ZH)\]\s*", re.IGNORECASE)
+
+# Sentinel in SQL for "label this as Unknown" (rows with no user_input)
+UNKNOWN_LABEL_ID_SQL = f"(SELECT id FROM request_labels WHERE label = '{UNKNOWN_LABEL}')"
+
+
+def ensure_tables(connection):
+    """Create request_labels and the label_id columns. Run after legacy_import.ensure_tables."""
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS request_labels (
+            id SERIAL PRIMARY KEY,
+            label VARCHAR(255) NOT NULL UNIQUE,
+            kind VARCHAR(20) NOT NULL
+        );
+    """))
+    connection.execute(text("""
+        INSERT INTO request_labels (label, kind) VALUES (:label, 'unknown')
+        ON CONFLICT (label) DO NOTHING;
+    """), {"label": UNKNOWN_LABEL})
+    for table in ("requests", "legacy_requests"):
+        connection.execute(text(f"""
+            ALTER TABLE {table}
+            ADD COLUMN IF NOT EXISTS label_id INTEGER REFERENCES request_labels (id);
+        """))
+
+
+def _config_modules():
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(here, "button_config_*.py"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            yield importlib.import_module(name).button_data
+        except (ImportError, AttributeError) as e:
+            print(f"WARN: request_labels could not read {name}: {e}")
+
+
+def button_labels(configs=None):
+    """
+    Every button label in `configs` (button_data dicts), by default the
+    button_config_* modules next to this file.
+    """
+    labels = set()
+    for data in _config_modules() if configs is None else configs:
+        labels.update(data.get("main_buttons", []))
+        for key, value in data.items():
+            if isinstance(value, dict):
+                labels.add(key)
+                labels.update(value.get("options", []))
+    return labels
+
+
+def _collapse(value):
+    return re.sub(r"\s+", " ", (value or "").strip())
+
+
+def _note_label(patterns):
+    for prefix in _PATTERN_PRIORITY:
+        matching = sorted(p for p in patterns if p.startswith(prefix))
+        if matching:
+            return NOTE_PREFIX + matching[0].replace("_", " ").capitalize()
+    return OTHER_NOTE
+
+
+def _current_translations():
+    """language -> localized label -> English, as last generated from the button configs."""
+    return translations.REVERSE
+
+
+class RequestLabeler:
+    """
+    user_input -> (label, kind), and label -> request_labels.id.
+
+    `classify` is TriageEngine.classify (anything returning an object with
+    detected_patterns). Label ids are cached for the life of the process;
+    labels are never renamed or deleted, so the cache can't go stale. Only
+    ids of committed rows are cached: an id from a transaction that later
+    rolled back would point at a label row that no longer exists.
+    """
+
+    def __init__(self, classify, buttons=None, translations=None):
+        self._classify = classify
+        self._ids = {}
+        self._classify_failed = False
+        self.set_buttons(buttons, translations)
+
+    def set_buttons(self, buttons=None, translations=None):
+        """
+        (Re)build the button lookup from button labels (default: button_labels())
+        and the localized -> English maps (default: translations.REVERSE), e.g.
+        after a button config reload.
+        """
+        if translations is None:
+            translations = _current_translations()
+        # Case-insensitive: older app versions logged lower-cased (and untagged Spanish) button text
+        lookup = {}
+        for label in sorted(buttons if buttons is not None else button_labels()):
+            lookup.setdefault(label.casefold(), label)
+        for label in FIXED_LABELS + (EMERGENCY_LABEL,):
+            lookup[label.casefold()] = label
+        for mapping in translations.values():
+            for localized, english in mapping.items():
+                lookup[english.casefold()] = english
+                lookup[localized.casefold()] = english  # prefer the English wording
+        self._buttons = lookup  # swapped whole, so label_for never sees a half-built table
+
+    def label_for(self, user_input):
+        value = _collapse(user_input)
+        if not value:
+            return UNKNOWN_LABEL, "unknown"
+        if value.casefold().startswith(EMERGENCY_PREFIX):
+            return EMERGENCY_LABEL, "button"
+
+        tag = _LANG_TAG.match(value)
+        if tag:
+            value = value[tag.end():]
+        button = self._buttons.get(value.casefold())
+        if button:
+            return button, "button"
+
+        try:
+            patterns = self._classify(value).detected_patterns or []
+        except Exception as e:
+            if not self._classify_failed:
+                print(f"WARN: could not classify note for labeling, filing as {OTHER_NOTE!r}: {e}")
+            self._classify_failed = True
+            patterns = []
+        return _note_label(patterns), "note"
+
+    def _create(self, connection, labels):
+        """{label: kind} -> {label: request_labels id}, inserting any that are missing."""
+        connection.execute(text("""
+            INSERT INTO request_labels (label, kind)
+            SELECT * FROM unnest(CAST(:labels AS TEXT[]), CAST(:kinds AS TEXT[]))
+            ON CONFLICT (label) DO NOTHING;
+        """), {"labels": list(labels), "kinds": list(labels.values())})
+        return {label: label_id for label_id, label in connection.execute(text("""
+            SELECT id, label FROM request_labels WHERE label = ANY(CAST(:labels AS TEXT[]));
+        """), {"labels": list(labels)})}
+
+    def label_id(self, connection, user_input):
+        """
+        Label id for a request about to be written on `connection`. A label not
+        seen before is committed on a connection of its own first, so it
+        survives the request's transaction rolling back.
+        """
+        label, kind = self.label_for(user_input)
+        label_id = self._ids.get(label)
+        if label_id is None:
+            with connection.engine.connect() as own:
+                with own.begin():
+                    label_id = self._create(own, {label: kind})[label]
+            self._ids[label] = label_id
+        return label_id
+
+    def backfill(self, connection, table="requests", batch_size=1000):
+        """Label every row of `table` without a label_id; returns rows labeled."""
+        labeled = connection.execute(text(f"""
+            UPDATE {table} SET label_id = {UNKNOWN_LABEL_ID_SQL}
+            WHERE label_id IS NULL AND NULLIF(btrim(user_input), '') IS NULL;
+        """)).rowcount
+        values = [row[0] for row in connection.execute(text(f"""
+            SELECT DISTINCT user_input FROM {table}
+            WHERE label_id IS NULL AND user_input IS NOT NULL;
+        """))]
+        if not values:
+            return labeled
+
+        # Map every distinct text first, then update the table in one pass
+        connection.execute(text("DROP TABLE IF EXISTS label_backfill;"))
+        connection.execute(text("CREATE TEMP TABLE label_backfill (user_input TEXT PRIMARY KEY, label_id INTEGER);"))
+        created = {}  # not cached: this transaction may still roll back
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+            labels = [self.label_for(v) for v in batch]
+            missing = {label: kind for label, kind in labels if label not in self._ids and label not in created}
+            if missing:
+                created.update(self._create(connection, missing))
+            connection.execute(text("""
+                INSERT INTO label_backfill
+                SELECT * FROM unnest(CAST(:inputs AS TEXT[]), CAST(:ids AS INTEGER[]));
+            """), {"inputs": batch, "ids": [self._ids.get(label) or created[label] for label, _ in labels]})
+        labeled += connection.execute(text(f"""
+            UPDATE {table} t SET label_id = m.label_id
+            FROM label_backfill m
+            WHERE t.label_id IS NULL AND t.user_input = m.user_input;
+        """)).rowcount
+        connection.execute(text("DROP TABLE label_backfill;"))
+        return labeled
@@ -0,0 +1,150 @@
+"""
+Rollback checks for the request label cache (no database needed).
+
+Usage:
+    python request_labels_tests.py
+
+Writes requests the way log_request_to_db does (label_id, then the requests
+INSERT in a transaction that may roll back) over a fake engine with
+real commit/rollback and a foreign key from requests.label_id to
+request_labels, and checks that:
+    - a request whose transaction rolls back after labeling doesn't leave a
+      cached id behind: the next request with that label is stored
+    - labels created by a backfill that rolls back aren't cached either
+    - once committed, a label id is served from the cache with no SQL
+"""
+
+from types import SimpleNamespace
+
+from request_labels import RequestLabeler
+
+
+class FakeEngine:
+    """request_labels + requests with SERIAL ids, per-transaction staging and the label_id foreign key."""
+
+    def __init__(self):
+        self.labels = {}      # label -> id, committed
+        self.requests = []    # (request_id, label_id), committed
+        self.next_id = 0      # a sequence: never rolled back
+        self.unlabeled = []   # user_input of rows waiting for backfill
+        self.statements = 0
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.connection.commit()
+        self.connection._labels, self.connection._requests = {}, []
+        return False
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+        self._labels, self._requests = {}, []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def begin(self):
+        return _Transaction(self)
+
+    def commit(self):
+        self.engine.labels.update(self._labels)
+        self.engine.requests.extend(self._requests)
+
+    def execute(self, statement, params=None):
+        sql, params = " ".join(str(statement).split()), params or {}
+        self.engine.statements += 1
+        visible = {**self.engine.labels, **self._labels}
+        if sql.startswith("INSERT INTO request_labels"):
+            for label in params["labels"]:
+                if label not in visible:
+                    self.engine.next_id += 1
+                    self._labels[label] = visible[label] = self.engine.next_id
+            return None
+        if sql.startswith("SELECT id, label FROM request_labels"):
+            return [(visible[label], label) for label in params["labels"] if label in visible]
+        if sql.startswith("INSERT INTO requests"):
+            if params["label_id"] not in visible.values():
+                raise RuntimeError(f"insert or update on table \"requests\" violates foreign key (label_id={params['label_id']})")
+            self._requests.append((params["request_id"], params["label_id"]))
+            return None
+        if sql.startswith("SELECT DISTINCT user_input"):
+            return [(value,) for value in self.engine.unlabeled]
+        # backfill's UPDATE / temp table statements: nothing to model
+        return SimpleNamespace(rowcount=0)
+
+
+def write_request(engine, labeler, request_id, user_input, fail_after_insert=False):
+    """What log_request_to_db does; True if the request was stored."""
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                label_id = labeler.label_id(connection, user_input)
+                connection.execute("INSERT INTO requests (request_id, label_id) VALUES (:request_id, :label_id);",
+                                   {"request_id": request_id, "label_id": label_id})
+                if fail_after_insert:
+                    raise RuntimeError("could not serialize access")
+        return True
+    except RuntimeError:
+        return False
+
+
+def run_request_labels_tests() -> None:
+    checks = []
+    engine = FakeEngine()
+    labeler = RequestLabeler(lambda value: SimpleNamespace(detected_patterns=[]),
+                             buttons=["Diapers", "Pain"], translations={})
+
+    checks.append(("first request rolled back after labeling",
+                   not write_request(engine, labeler, "req_1", "Diapers", fail_after_insert=True)))
+    checks.append(("...the label it created survives the rollback", "Diapers" in engine.labels))
+    checks.append(("next request with the same label is stored",
+                   write_request(engine, labeler, "req_2", "Diapers")
+                   and engine.requests == [("req_2", engine.labels["Diapers"])]))
+
+    statements = engine.statements
+    write_request(engine, labeler, "req_3", "diapers")
+    checks.append(("committed label id served from the cache", engine.statements == statements + 1))
+
+    # Backfill inside a startup transaction that fails: its new labels go with it
+    engine.unlabeled = ["Pain"]
+    with engine.connect() as connection:
+        try:
+            with connection.begin():
+                labeler.backfill(connection)
+                raise RuntimeError("analytics_rollup.rebuild_if_empty failed")
+        except RuntimeError:
+            pass
+    checks.append(("backfill that rolled back left no label behind", "Pain" not in engine.labels))
+    checks.append(("...and a request with its label is still stored", write_request(engine, labeler, "req_4", "Pain")))
+
+    failures = 0
+    print("\n=== Request label checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"Stored requests: {engine.requests}; labels: {engine.labels}")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL REQUEST LABEL CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_request_labels_tests()
@@ -0,0 +1,257 @@
+"""
+Response-time quantile sketches (DDSketch-style) for /analytics.
+
+A sketch keeps counts in logarithmic bins: a value x lands in bin
+ceil(log(x) / log(gamma)) with gamma = (1 + a) / (1 - a), so any quantile read
+back is within relative accuracy `a` (1%) of the true value. Sketches merge
+by adding bin counts, which is what makes per-bucket storage work.
+
+Every completed request is added to four rows of response_sketches, one
+per granularity (hour, day, month, year), keyed by role, tier and shift
+('day' = 07:00-18:59 by the hour the request was created, 'night' otherwise).
+A date-range query takes whole years where it can, then whole months, days
+and hours, and sums their bins in SQL, so it reads at most a few dozen rows
+per role/tier/shift no matter how many requests are in the range. Buckets
+are cut in the database session time zone, like analytics_rollup. A request
+counts under the role it had when it was completed.
+"""
+
+import math
+
+from sqlalchemy import text
+
+from analytics_rollup import SHIFT_SQL
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+# Anything faster than this is reported as this (response times are seconds to hours)
+MIN_SECONDS = 0.01
+
+GRANULARITIES = ("hour", "day", "month", "year")
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+# Bins are computed in SQL on both the live and the rebuild path (matches bin_index)
+BIN_SQL = (
+    f"CAST(CEIL(LN(GREATEST({{seconds}}, {MIN_SECONDS})) / LN(CAST({GAMMA!r} AS DOUBLE PRECISION))) AS INTEGER)"
+)
+
+# Add EXCLUDED's bin counts into the stored ones
+_MERGE_BINS_SQL = """
+    response_sketches.bins || (
+        SELECT jsonb_object_agg(
+            e.key, COALESCE(CAST(response_sketches.bins ->> e.key AS INTEGER), 0) + CAST(e.value AS INTEGER))
+        FROM jsonb_each_text(EXCLUDED.bins) AS e
+    )
+"""
+
+
+def bin_index(seconds):
+    return math.ceil(math.log(max(seconds, MIN_SECONDS)) / _LOG_GAMMA)
+
+
+def bin_value(index):
+    """Representative value of a bin (relative error <= RELATIVE_ACCURACY)."""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+class DDSketch:
+    def __init__(self, bins=None):
+        self.bins = {}
+        self.count = 0
+        for index, n in (bins or {}).items():
+            self.add_bin(int(index), int(n))
+
+    def add(self, seconds, n=1):
+        self.add_bin(bin_index(seconds), n)
+
+    def add_bin(self, index, n):
+        if n:
+            self.bins[index] = self.bins.get(index, 0) + n
+            self.count += n
+
+    def merge(self, other):
+        for index, n in other.bins.items():
+            self.add_bin(index, n)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return bin_value(index)
+        return bin_value(max(self.bins))
+
+    def to_json(self):
+        return {str(index): n for index, n in self.bins.items()}
+
+
+# --- persistence ---
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS response_sketches (
+            granularity VARCHAR(5) NOT NULL,
+            bucket_start TIMESTAMPTZ NOT NULL,
+            role VARCHAR(255) NOT NULL,
+            tier VARCHAR(20) NOT NULL,
+            shift VARCHAR(10) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            bins JSONB NOT NULL DEFAULT '{}'::jsonb,
+            PRIMARY KEY (granularity, bucket_start, role, tier, shift)
+        );
+    """))
+
+
+def record_completion(connection, created_at, completed_at, role, tier):
+    """Add one response time to its hour, day, month and year sketches."""
+    if created_at is None or completed_at is None:
+        return
+    connection.execute(text(f"""
+        INSERT INTO response_sketches (granularity, bucket_start, role, tier, shift, count, bins)
+        SELECT g, date_trunc(g, CAST(:created_at AS TIMESTAMPTZ)),
+               COALESCE(:role, 'unknown'), COALESCE(:tier, 'unknown'),
+               {SHIFT_SQL.format(col='CAST(:created_at AS TIMESTAMPTZ)')},
+               1, jsonb_build_object({BIN_SQL.format(seconds='CAST(:seconds AS DOUBLE PRECISION)')}, 1)
+        FROM unnest(CAST(:granularities AS TEXT[])) AS g
+        ON CONFLICT (granularity, bucket_start, role, tier, shift)
+        DO UPDATE SET count = response_sketches.count + EXCLUDED.count,
+                      bins = {_MERGE_BINS_SQL};
+    """), {"created_at": created_at, "role": role, "tier": tier,
+           "seconds": (completed_at - created_at).total_seconds(),
+           "granularities": list(GRANULARITIES)})
+
+
+def rebuild(connection):
+    """Recompute all sketches from completed requests. Call inside a transaction."""
+    connection.execute(text("LOCK TABLE requests IN SHARE MODE;"))
+    connection.execute(text("DELETE FROM response_sketches;"))
+    # Bin counts per hour, then roll each level up from the one below it
+    connection.execute(text(f"""
+        WITH hour_bins AS (
+            SELECT date_trunc('hour', timestamp) AS bucket_start,
+                   COALESCE(category, 'unknown') AS role,
+                   COALESCE(tier, 'unknown') AS tier,
+                   {SHIFT_SQL.format(col='timestamp')} AS shift,
+                   {BIN_SQL.format(seconds='EXTRACT(EPOCH FROM (completion_timestamp - timestamp))')} AS bin,
+                   COUNT(*) AS n
+            FROM requests
+            WHERE timestamp IS NOT NULL AND completion_timestamp IS NOT NULL
+            GROUP BY 1, 2, 3, 4, 5
+        ),
+        day_bins AS (
+            SELECT date_trunc('day', bucket_start) AS bucket_start, role, tier, shift, bin, SUM(n) AS n
+            FROM hour_bins GROUP BY 1, 2, 3, 4, 5
+        ),
+        month_bins AS (
+            SELECT date_trunc('month', bucket_start) AS bucket_start, role, tier, shift, bin, SUM(n) AS n
+            FROM day_bins GROUP BY 1, 2, 3, 4, 5
+        ),
+        year_bins AS (
+            SELECT date_trunc('year', bucket_start) AS bucket_start, role, tier, shift, bin, SUM(n) AS n
+            FROM month_bins GROUP BY 1, 2, 3, 4, 5
+        ),
+        all_bins AS (
+            SELECT 'hour' AS granularity, * FROM hour_bins
+            UNION ALL SELECT 'day', * FROM day_bins
+            UNION ALL SELECT 'month', * FROM month_bins
+            UNION ALL SELECT 'year', * FROM year_bins
+        )
+        INSERT INTO response_sketches (granularity, bucket_start, role, tier, shift, count, bins)
+        SELECT granularity, bucket_start, role, tier, shift, SUM(n), jsonb_object_agg(bin, n)
+        FROM all_bins
+        GROUP BY granularity, bucket_start, role, tier, shift;
+    """))
+
+
+def rebuild_if_empty(connection):
+    has_sketches = connection.execute(text("SELECT EXISTS (SELECT 1 FROM response_sketches);")).scalar()
+    has_completed = connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM requests WHERE completion_timestamp IS NOT NULL);"
+    )).scalar()
+    if has_completed and not has_sketches:
+        print("Backfilling response-time sketches from requests...")
+        rebuild(connection)
+        return True
+    return False
+
+
+# --- reads ---
+
+# Rows of one granularity that lie in the range, minus those whose parent bucket
+# (day for hours, month for days, year for months) is itself fully inside the range. Only the
+# partial first and last parent can contribute, so each branch is two short
+# index ranges on the primary key.
+_PICK_SQL = """
+    SELECT {cols}bins
+    FROM response_sketches
+    WHERE granularity = '{granularity}'
+      AND ((bucket_start >= (SELECT s FROM bounds)
+            AND bucket_start < LEAST((SELECT s_{parent}_end FROM bounds), (SELECT e FROM bounds)))
+        OR (bucket_start >= GREATEST((SELECT e_{parent}_start FROM bounds), (SELECT s_{parent}_end FROM bounds),
+                                     (SELECT s FROM bounds))
+            AND bucket_start < (SELECT e FROM bounds)))
+      AND bucket_start + INTERVAL '1 {granularity}' <= (SELECT e FROM bounds)
+      AND NOT (date_trunc('{parent}', bucket_start) >= (SELECT s FROM bounds)
+               AND date_trunc('{parent}', bucket_start) + INTERVAL '1 {parent}' <= (SELECT e FROM bounds))
+      {filters}
+"""
+
+
+def load(connection, start=None, end=None, role=None, tier=None, shift=None, group_by=()):
+    """
+    Merged sketches for [start, end), rounded inward to whole hours.
+    Returns {group key tuple: DDSketch}; group_by is any of "role", "tier", "shift".
+    """
+    group_cols = [c for c in group_by if c in ("role", "tier", "shift")]
+    cols = "".join(f"{c}, " for c in group_cols)
+    params = {"start": start, "end": end}
+    filters = ""
+    for name, value in (("role", role), ("tier", tier), ("shift", shift)):
+        if value is not None:
+            filters += f" AND {name} = :{name}"
+            params[name] = value
+    rows = connection.execute(text(f"""
+        WITH bounds AS MATERIALIZED (
+            SELECT s, e,
+                   date_trunc('day', s) + INTERVAL '1 day' AS s_day_end,
+                   date_trunc('day', e) AS e_day_start,
+                   date_trunc('month', s) + INTERVAL '1 month' AS s_month_end,
+                   date_trunc('month', e) AS e_month_start,
+                   date_trunc('year', s) + INTERVAL '1 year' AS s_year_end,
+                   date_trunc('year', e) AS e_year_start
+            FROM (SELECT COALESCE(CAST(:start AS TIMESTAMPTZ), '-infinity') AS s,
+                         COALESCE(CAST(:end AS TIMESTAMPTZ), 'infinity') AS e) AS r
+        ),
+        picked AS (
+            SELECT {cols}bins
+            FROM response_sketches
+            WHERE granularity = 'year'
+              AND bucket_start >= (SELECT s FROM bounds)
+              AND bucket_start + INTERVAL '1 year' <= (SELECT e FROM bounds)
+              {filters}
+            UNION ALL
+            {_PICK_SQL.format(cols=cols, granularity='month', parent='year', filters=filters)}
+            UNION ALL
+            {_PICK_SQL.format(cols=cols, granularity='day', parent='month', filters=filters)}
+            UNION ALL
+            {_PICK_SQL.format(cols=cols, granularity='hour', parent='day', filters=filters)}
+        )
+        SELECT {cols}CAST(b.key AS INTEGER), SUM(CAST(b.value AS INTEGER))
+        FROM picked, jsonb_each_text(picked.bins) AS b
+        GROUP BY {cols}b.key;
+    """), params)
+    sketches = {}
+    for row in rows:
+        key = tuple(row[:len(group_cols)])
+        sketches.setdefault(key, DDSketch()).add_bin(row[-2], row[-1])
+    return sketches
+
+
+def quantiles(sketch, qs=DEFAULT_QUANTILES):
+    return {f"p{round(q * 100)}": sketch.quantile(q) for q in qs}
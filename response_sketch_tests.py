@@ -0,0 +1,71 @@
+"""
+Accuracy and merge checks for the response-time sketch.
+
+Usage:
+    python response_sketch_tests.py
+
+Feeds a long-tailed set of response times (seconds to an hour) through
+DDSketch and checks that:
+    - p50/p90/p99 are within the sketch's relative accuracy of the exact values
+    - sketches built per bucket and merged answer the same as one big sketch
+    - a JSON round trip (how bins are stored) loses nothing
+"""
+
+import random
+
+from response_sketch import DDSketch, RELATIVE_ACCURACY, bin_index
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def exact_quantile(sorted_values, q):
+    # Same rank rule as DDSketch.quantile
+    return sorted_values[int(q * (len(sorted_values) - 1))]
+
+
+def run_response_sketch_tests() -> None:
+    rng = random.Random(11)
+    values = [min(rng.lognormvariate(5, 1.2), 3600.0) for _ in range(50_000)]
+    checks = []
+
+    whole = DDSketch()
+    buckets = [DDSketch() for _ in range(24)]
+    for i, v in enumerate(values):
+        whole.add(v)
+        buckets[i % 24].add(v)
+
+    ordered = sorted(values)
+    worst = 0.0
+    for q in QUANTILES:
+        exact = exact_quantile(ordered, q)
+        worst = max(worst, abs(whole.quantile(q) - exact) / exact)
+    checks.append((f"p50/p90/p99 within {RELATIVE_ACCURACY:.0%} (worst {worst:.2%})", worst <= RELATIVE_ACCURACY))
+
+    merged = DDSketch()
+    for b in buckets:
+        merged.merge(b)
+    checks.append(("merged buckets == one sketch",
+                   merged.bins == whole.bins and all(merged.quantile(q) == whole.quantile(q) for q in QUANTILES)))
+
+    restored = DDSketch(whole.to_json())
+    checks.append(("JSON round trip keeps every bin", restored.bins == whole.bins and restored.count == whole.count))
+
+    checks.append(("sub-10ms responses share the lowest bin", bin_index(0) == bin_index(0.005) == bin_index(0.01)))
+    checks.append(("empty sketch has no quantiles", DDSketch().quantile(0.5) is None))
+
+    failures = 0
+    print("\n=== Response-time sketch tests ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"{len(values)} values in {len(whole.bins)} bins")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL SKETCH CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_response_sketch_tests()
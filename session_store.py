@@ -0,0 +1,240 @@
+"""
+Server-side Flask sessions: the cookie carries only a signed session id.
+
+Flask's default session is the whole dict in a signed cookie, so every
+request sends it and every response that changes it sends it back. With
+ServerSessionInterface the cookie is `<sid>.<signature>` (about 60 bytes) and
+the dict lives in a store:
+
+    MemorySessionStore  bounded LRU with idle expiry (TTLCache); one worker only,
+                        sessions are lost on restart
+    DbSessionStore      chat_sessions table (JSONB); shared by every worker
+
+Sessions are written only when their contents changed, or when half the TTL
+has passed since the last write, so an idle tablet that keeps reading its
+session does not expire but also does not cost a write per request. The
+cookie (a browser-session cookie, like Flask's default) is only set when a
+session is created. An empty session is deleted along with its cookie
+(session.clear() on /room/<id> starts a fresh one on the next write).
+DbSessionStore.purge_forever() deletes expired rows in the background.
+
+Values must be JSON types (the app stores room, pathway, language,
+is_first_baby and the chat node id).
+"""
+
+import json
+import secrets
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import text
+from werkzeug.datastructures import CallbackDict
+
+from ttl_cache import TTLCache
+
+BACKENDS = ("cookie", "memory", "db")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600  # longer than a postpartum stay
+DEFAULT_MEMORY_MAXSIZE = 10_000
+DEFAULT_PURGE_SECONDS = 3600
+
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            sid VARCHAR(64) PRIMARY KEY,
+            data JSONB NOT NULL,
+            saved_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            expires_at TIMESTAMPTZ NOT NULL
+        );
+    """))
+    connection.execute(text("""
+        CREATE INDEX IF NOT EXISTS chat_sessions_expires_at_idx ON chat_sessions (expires_at);
+    """))
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, data=None, sid=None, saved_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(data, on_update)
+        self.sid = sid
+        self.saved_at = saved_at  # epoch seconds of the last write, None if never stored
+        self.loaded = dict(data or {})
+        self.modified = False
+
+    @property
+    def changed(self):
+        # pop()/clear() on a missing key mark the session modified without changing it
+        return self.modified and dict(self) != self.loaded
+
+
+class MemorySessionStore:
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, maxsize=DEFAULT_MEMORY_MAXSIZE):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.writes = 0
+
+    def load(self, sid):
+        """(data, saved_at) or None if the session is unknown or expired."""
+        entry = self._cache.get(sid)
+        if entry is None:
+            return None
+        data, saved_at = entry
+        # A copy, so a request's edits only land when the session is saved
+        return dict(data), saved_at
+
+    def save(self, sid, data):
+        self._cache.set(sid, (dict(data), time.time()))
+        self.writes += 1
+
+    def delete(self, sid):
+        self._cache.pop(sid)
+
+    def purge(self):
+        """Expired entries go lazily (and by LRU eviction); nothing to do."""
+        return 0
+
+    def stats(self):
+        return {"backend": "memory", "writes": self.writes, **self._cache.stats()}
+
+
+class DbSessionStore:
+    def __init__(self, engine, ttl=DEFAULT_TTL_SECONDS):
+        self.engine = engine
+        self.ttl = ttl
+        self.writes = 0
+        self.purged = 0
+
+    def load(self, sid):
+        with self.engine.connect() as connection:
+            row = connection.execute(text("""
+                SELECT data, EXTRACT(EPOCH FROM saved_at)
+                FROM chat_sessions
+                WHERE sid = :sid AND expires_at > now();
+            """), {"sid": sid}).first()
+        if row is None:
+            return None
+        return row[0], float(row[1])
+
+    def save(self, sid, data):
+        with self.engine.connect() as connection:
+            with connection.begin():
+                connection.execute(text("""
+                    INSERT INTO chat_sessions (sid, data, saved_at, expires_at)
+                    VALUES (:sid, CAST(:data AS JSONB), now(), now() + make_interval(secs => :ttl))
+                    ON CONFLICT (sid)
+                    DO UPDATE SET data = EXCLUDED.data, saved_at = EXCLUDED.saved_at,
+                                  expires_at = EXCLUDED.expires_at;
+                """), {"sid": sid, "data": json.dumps(data), "ttl": self.ttl})
+        self.writes += 1
+
+    def delete(self, sid):
+        with self.engine.connect() as connection:
+            with connection.begin():
+                connection.execute(text("DELETE FROM chat_sessions WHERE sid = :sid;"), {"sid": sid})
+
+    def purge(self):
+        """Delete expired sessions; returns how many."""
+        with self.engine.connect() as connection:
+            with connection.begin():
+                deleted = connection.execute(text("DELETE FROM chat_sessions WHERE expires_at <= now();")).rowcount
+        self.purged += deleted
+        return deleted
+
+    def purge_forever(self, sleep, interval=DEFAULT_PURGE_SECONDS):
+        """Purge expired sessions every `interval` seconds (run as a background task with the server's sleep)."""
+        while True:
+            sleep(interval)
+            try:
+                self.purge()
+            except Exception as e:
+                print(f"ERROR purging expired sessions: {e}")
+
+    def stats(self):
+        return {"backend": "db", "ttl_s": self.ttl, "writes": self.writes, "purged": self.purged}
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask SessionInterface over a MemorySessionStore or DbSessionStore."""
+
+    salt = "server-session"
+
+    def __init__(self, store):
+        self.store = store
+        self.created = 0
+        self.load_errors = 0
+        self.save_errors = 0
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie and app.secret_key:
+            try:
+                sid = self._signer(app).unsign(cookie).decode("ascii")
+            except BadSignature:
+                sid = None  # e.g. an old cookie-session value
+            if sid:
+                try:
+                    stored = self.store.load(sid)
+                except Exception as e:
+                    # Serve the request with an empty session rather than fail it
+                    print(f"ERROR loading session: {e}")
+                    self.load_errors += 1
+                    stored = None
+                if stored is not None:
+                    data, saved_at = stored
+                    return ServerSession(data, sid=sid, saved_at=saved_at)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.sid is not None and session.modified:
+                try:
+                    self.store.delete(session.sid)
+                except Exception as e:
+                    print(f"ERROR deleting session: {e}")
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        stale = session.saved_at is not None and time.time() - session.saved_at > self.store.ttl / 2
+        if session.sid is not None and not session.changed and not stale:
+            return
+
+        new = session.sid is None
+        if new:
+            session.sid = secrets.token_urlsafe(24)
+            self.created += 1
+        try:
+            self.store.save(session.sid, dict(session))
+        except Exception as e:
+            print(f"ERROR saving session: {e}")
+            self.save_errors += 1
+            return
+        if new:
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode("ascii"),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    def stats(self):
+        return {
+            **self.store.stats(),
+            "created": self.created,
+            "load_errors": self.load_errors,
+            "save_errors": self.save_errors,
+        }
@@ -0,0 +1,101 @@
+"""
+Checks for the server-side session interface (memory store; no database needed).
+
+Usage:
+    python session_store_tests.py
+
+Checks that:
+    - the cookie carries only a signed id, and the values round-trip
+    - a request that leaves the session unchanged does not write it, and
+      popping a missing key does not count as a change
+    - an unchanged session is rewritten once half its TTL has passed
+    - a tampered or old cookie-session cookie starts a fresh session
+    - clearing a session deletes it from the store and expires the cookie
+"""
+
+from flask import Flask, session
+
+from session_store import MemorySessionStore, ServerSessionInterface
+
+
+def make_app(store):
+    app = Flask(__name__)
+    app.secret_key = "session-store-tests"
+    app.session_interface = ServerSessionInterface(store)
+
+    @app.post("/set/<key>/<value>")
+    def set_value(key, value):
+        session[key] = value
+        return "ok"
+
+    @app.get("/get/<key>")
+    def get_value(key):
+        return session.get(key, "-")
+
+    @app.get("/pop/<key>")
+    def pop_value(key):
+        return session.pop(key, "-")
+
+    @app.get("/clear")
+    def clear():
+        session.clear()
+        return "ok"
+
+    return app
+
+
+def run_session_store_tests() -> None:
+    checks = []
+    store = MemorySessionStore(ttl=3600)
+    app = make_app(store)
+    client = app.test_client()
+
+    r = client.post("/set/language/zh")
+    cookie = r.headers.get("Set-Cookie", "")
+    sid = app.session_interface._signer(app).unsign(client.get_cookie("session").value).decode()
+    checks.append(("new session sets a cookie with only a signed id",
+                   "zh" not in cookie and len(client.get_cookie("session").value) < 80))
+    checks.append(("values round-trip through the store",
+                   client.get("/get/language").text == "zh" and store.load(sid)[0] == {"language": "zh"}))
+
+    writes = store.writes
+    r = client.get("/get/language")
+    checks.append(("reading does not write or reset the cookie",
+                   store.writes == writes and "Set-Cookie" not in r.headers))
+    client.get("/pop/node")
+    checks.append(("popping a missing key does not write", store.writes == writes))
+    client.post("/set/node/b123")
+    client.get("/pop/node")
+    checks.append(("a change writes without a new cookie",
+                   store.writes == writes + 2 and store.load(sid)[0] == {"language": "zh"}))
+
+    data, saved_at = store.load(sid)
+    store._cache.set(sid, (data, saved_at - 1801))
+    writes = store.writes
+    client.get("/get/language")
+    checks.append(("unchanged session is rewritten after half its TTL",
+                   store.writes == writes + 1 and store.load(sid)[1] > saved_at - 1))
+
+    other = app.test_client()
+    other.set_cookie("session", "eyJsYW5ndWFnZSI6ImVzIn0.ZZZ.tampered")
+    checks.append(("bad cookie starts a fresh session", other.get("/get/language").text == "-"))
+
+    r = client.get("/clear")
+    checks.append(("clear deletes the stored session and the cookie",
+                   store.load(sid) is None and "session=;" in r.headers.get("Set-Cookie", "")))
+
+    failures = 0
+    print("\n=== Session store tests ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL SESSION STORE CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_session_store_tests()
@@ -0,0 +1,294 @@
+"""
+Shift summary reports, precomputed right after each shift ends.
+
+A report covers the requests created during one shift (shift_date + 'day' or
+'night', cut as in analytics_rollup: 'day' is 07:00-18:59 and a night
+belongs to the date it started): volume by role, completions, response-time
+percentiles (from the response sketches), emergent count, busiest rooms and
+top labels. It is stored as JSON in shift_reports, so the manager dashboard
+reads the last few with one indexed query.
+
+ShiftReportScheduler runs inside the app process as a background task
+(socketio.start_background_task, so an eventlet green thread). Each pass
+writes every ended shift in the last `catch_up_days` that has no report or
+whose last attempt failed (up to MAX_ATTEMPTS tries), so shifts missed while
+the worker was down are filled in when it comes back. It then sleeps until
+the next 07:00/19:00 boundary (local time, the same clock as
+_infer_shift_now) plus `delay_seconds`, or, after a failure, for the next
+retry delay. Reports are upserted by
+(shift_date, shift), so two processes doing the same shift is harmless.
+Completions are counted as of generation time (generated_at).
+"""
+
+import json
+from datetime import datetime, timedelta, time as dtime
+
+from sqlalchemy import text
+
+import analytics_rollup
+import response_sketch
+from analytics_rollup import SHIFT_DATE_SQL, SHIFT_SQL, SHIFTS
+
+BUSIEST_ROOMS = 5
+TOP_LABELS = 5
+DEFAULT_CATCH_UP_DAYS = 14
+DEFAULT_DELAY_SECONDS = 300
+DEFAULT_RETRY_DELAYS = (60, 300, 900, 1800)
+# A shift that failed this many times is left alone (last_error says why) until someone looks
+MAX_ATTEMPTS = 5
+
+# Local clock times at which a shift ends (and the next one starts)
+SHIFT_BOUNDARIES = (dtime(7, 0), dtime(19, 0))
+
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS shift_reports (
+            shift_date DATE NOT NULL,
+            shift VARCHAR(10) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            report JSONB,
+            generated_at TIMESTAMPTZ,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            PRIMARY KEY (shift_date, shift)
+        );
+    """))
+    # Report windows (and export date ranges) read requests by creation time
+    connection.execute(text("""
+        CREATE INDEX IF NOT EXISTS requests_timestamp_idx ON requests (timestamp);
+    """))
+
+
+def shift_bounds(connection, shift_date, shift):
+    """[start, end) of a shift in the database session time zone."""
+    offset = 7 if shift == "day" else 19
+    return tuple(connection.execute(text("""
+        SELECT CAST(CAST(:shift_date AS DATE) + make_interval(hours => :offset) AS TIMESTAMPTZ),
+               CAST(CAST(:shift_date AS DATE) + make_interval(hours => :offset + 12) AS TIMESTAMPTZ);
+    """), {"shift_date": shift_date, "offset": offset}).one())
+
+
+def ended_shifts(connection, days=DEFAULT_CATCH_UP_DAYS):
+    """(shift_date, shift) of every shift that ended in the last `days` days, oldest first."""
+    current_date, current_shift = connection.execute(text(f"""
+        SELECT {SHIFT_DATE_SQL.format(col='now()')}, {SHIFT_SQL.format(col='now()')};
+    """)).one()
+    shifts = []
+    for back in range(days, -1, -1):
+        shift_date = current_date - timedelta(days=back)
+        for shift in SHIFTS:
+            if (shift_date, SHIFTS.index(shift)) < (current_date, SHIFTS.index(current_shift)):
+                shifts.append((shift_date, shift))
+    return shifts
+
+
+def build(connection, shift_date, shift):
+    """The report for one shift, as a JSON-ready dict."""
+    start, end = shift_bounds(connection, shift_date, shift)
+    window = {"start": start, "end": end}
+
+    by_role = {}
+    totals = {"requests": 0, "completed": 0, "emergent": 0, "response_seconds_sum": 0.0}
+    for role, requests, completed, emergent, seconds in connection.execute(text("""
+        SELECT COALESCE(category, 'unknown'), COUNT(*), COUNT(completion_timestamp),
+               COUNT(*) FILTER (WHERE tier = 'emergent'),
+               COALESCE(SUM(EXTRACT(EPOCH FROM (completion_timestamp - timestamp))), 0)
+        FROM requests
+        WHERE timestamp >= :start AND timestamp < :end
+        GROUP BY 1
+        ORDER BY 2 DESC, 1;
+    """), window):
+        by_role[role] = {"requests": requests, "completed": completed, "emergent": emergent}
+        totals["requests"] += requests
+        totals["completed"] += completed
+        totals["emergent"] += emergent
+        totals["response_seconds_sum"] += float(seconds)
+
+    busiest_rooms = [
+        {"room": room, "requests": n, "emergent": emergent}
+        for room, n, emergent in connection.execute(text("""
+            SELECT room, COUNT(*), COUNT(*) FILTER (WHERE tier = 'emergent')
+            FROM requests
+            WHERE timestamp >= :start AND timestamp < :end AND room IS NOT NULL
+            GROUP BY room
+            ORDER BY 2 DESC, room
+            LIMIT :limit;
+        """), {**window, "limit": BUSIEST_ROOMS})
+    ]
+
+    # Sketches are bucketed by creation hour and shifts start on the hour, so this is the whole shift
+    sketches = response_sketch.load(connection, start, end, group_by=("tier",))
+    overall = response_sketch.DDSketch()
+    percentiles_by_tier = {}
+    for (tier,), sketch in sorted(sketches.items()):
+        overall.merge(sketch)
+        percentiles_by_tier[tier] = _percentiles(sketch)
+
+    labels = analytics_rollup.summary(connection, shift_date, shift_date, shift=shift, top_n=TOP_LABELS)
+
+    completed = totals["completed"]
+    return {
+        "shift_date": shift_date.isoformat(),
+        "shift": shift,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "requests": totals["requests"],
+        "completed": completed,
+        "open": totals["requests"] - completed,
+        "emergent": totals["emergent"],
+        "avg_response_seconds": round(totals["response_seconds_sum"] / completed, 1) if completed else None,
+        "response_percentiles": _percentiles(overall),
+        "response_percentiles_by_tier": percentiles_by_tier,
+        "by_role": by_role,
+        "busiest_rooms": busiest_rooms,
+        "top_labels": [{"label": label, "requests": n} for label, n in labels["top_labels"]],
+    }
+
+
+def _percentiles(sketch):
+    return {name: (round(v, 1) if v is not None else None) for name, v in response_sketch.quantiles(sketch).items()}
+
+
+def generate(connection, shift_date, shift):
+    """Build and store one shift's report. Call inside a transaction."""
+    report = build(connection, shift_date, shift)
+    connection.execute(text("""
+        INSERT INTO shift_reports (shift_date, shift, status, report, generated_at, attempts, last_error)
+        VALUES (:shift_date, :shift, 'ok', CAST(:report AS JSONB), now(), 1, NULL)
+        ON CONFLICT (shift_date, shift)
+        DO UPDATE SET status = 'ok', report = EXCLUDED.report, generated_at = EXCLUDED.generated_at,
+                      attempts = shift_reports.attempts + 1, last_error = NULL;
+    """), {"shift_date": shift_date, "shift": shift, "report": json.dumps(report)})
+    return report
+
+
+def record_failure(connection, shift_date, shift, error):
+    connection.execute(text("""
+        INSERT INTO shift_reports (shift_date, shift, status, attempts, last_error)
+        VALUES (:shift_date, :shift, 'failed', 1, :error)
+        ON CONFLICT (shift_date, shift)
+        DO UPDATE SET status = CASE WHEN shift_reports.report IS NULL THEN 'failed' ELSE shift_reports.status END,
+                      attempts = shift_reports.attempts + 1, last_error = EXCLUDED.last_error;
+    """), {"shift_date": shift_date, "shift": shift, "error": str(error)[:1000]})
+
+
+def missing(connection, days=DEFAULT_CATCH_UP_DAYS):
+    """Ended shifts in the catch-up window without a stored report (and not given up on)."""
+    done = {(row[0], row[1]) for row in connection.execute(text("""
+        SELECT shift_date, shift FROM shift_reports
+        WHERE (status = 'ok' OR attempts >= :max_attempts)
+          AND shift_date >= CURRENT_DATE - CAST(:days AS INTEGER) - 1;
+    """), {"days": days, "max_attempts": MAX_ATTEMPTS})}
+    return [s for s in ended_shifts(connection, days) if s not in done]
+
+
+def recent(connection, limit=6):
+    """The newest stored reports, newest first (dicts with shift_date/shift/generated_at/report)."""
+    return [
+        {"shift_date": row[0], "shift": row[1], "generated_at": row[2], "report": row[3]}
+        for row in connection.execute(text("""
+            SELECT shift_date, shift, generated_at, report
+            FROM shift_reports
+            WHERE status = 'ok'
+            ORDER BY shift_date DESC, shift = 'night' DESC
+            LIMIT :limit;
+        """), {"limit": limit})
+    ]
+
+
+def next_boundary(now):
+    """The next 07:00 or 19:00 after `now` (naive local time)."""
+    for day in (now.date(), now.date() + timedelta(days=1)):
+        for boundary in SHIFT_BOUNDARIES:
+            candidate = datetime.combine(day, boundary)
+            if candidate > now:
+                return candidate
+
+
+class ShiftReportScheduler:
+    """
+    Background loop that keeps shift_reports filled in. `sleep` must be the
+    server's cooperative sleep (socketio.sleep) so it yields to other green
+    threads; `clock` returns naive local time.
+    """
+
+    def __init__(self, engine, sleep, clock=datetime.now, catch_up_days=DEFAULT_CATCH_UP_DAYS,
+                 delay_seconds=DEFAULT_DELAY_SECONDS, retry_delays=DEFAULT_RETRY_DELAYS):
+        self.engine = engine
+        self._sleep = sleep
+        self._clock = clock
+        self.catch_up_days = catch_up_days
+        self.delay_seconds = delay_seconds
+        self.retry_delays = tuple(retry_delays)
+        self.generated = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.last_run_at = None
+        self.last_error = None
+        self.next_run_at = None
+        self.running = False
+
+    def run_once(self):
+        """Generate every missing report; returns (generated, failed)."""
+        generated = failed = 0
+        with self.engine.connect() as connection:
+            todo = missing(connection, self.catch_up_days)
+            connection.commit()
+            for shift_date, shift in todo:
+                try:
+                    with connection.begin():
+                        generate(connection, shift_date, shift)
+                    generated += 1
+                except Exception as e:
+                    print(f"ERROR generating shift report {shift_date} {shift}: {e}")
+                    self.last_error = f"{shift_date} {shift}: {e}"
+                    failed += 1
+                    try:
+                        with connection.begin():
+                            record_failure(connection, shift_date, shift, e)
+                    except Exception as e2:
+                        print(f"ERROR recording shift report failure: {e2}")
+        self.generated += generated
+        self.failed += failed
+        self.last_run_at = self._clock()
+        return generated, failed
+
+    def seconds_until_next_run(self):
+        """Next retry delay after a failed pass, else until the next boundary plus the delay."""
+        now = self._clock()
+        if self.consecutive_failures:
+            wait = self.retry_delays[min(self.consecutive_failures, len(self.retry_delays)) - 1]
+        else:
+            wait = (next_boundary(now) - now).total_seconds() + self.delay_seconds
+        self.next_run_at = now + timedelta(seconds=wait)
+        return wait
+
+    def run_forever(self):
+        self.running = True
+        while self.running:
+            try:
+                generated, failed = self.run_once()
+                self.consecutive_failures = self.consecutive_failures + 1 if failed else 0
+                if generated:
+                    print(f"Shift reports: generated {generated}.")
+            except Exception as e:
+                # Database unreachable etc.: retry on the backoff schedule
+                print(f"ERROR in shift report scheduler: {e}")
+                self.last_error = str(e)
+                self.consecutive_failures += 1
+            self._sleep(self.seconds_until_next_run())
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "generated": self.generated,
+            "failed": self.failed,
+            "consecutive_failures": self.consecutive_failures,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "next_run_at": self.next_run_at.isoformat() if self.next_run_at else None,
+            "last_error": self.last_error,
+        }
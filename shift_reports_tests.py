@@ -0,0 +1,188 @@
+"""
+Checks for the shift report schedule and catch-up.
+
+Usage:
+    python shift_reports_tests.py
+    TEST_DATABASE_URL=postgresql://localhost/scratch python shift_reports_tests.py
+
+Drives the scheduler with a fake clock, sleep and engine (no database
+needed) and checks that:
+    - ended_shifts() lists every shift that ended in the window, oldest
+      first, and not the one under way
+    - next_boundary() is the next 07:00 or 19:00, strictly after now
+    - seconds_until_next_run() waits for the next boundary plus the delay,
+      and after failed passes steps through the retry delays, staying at the
+      last one
+    - run_forever() backs off while the database is down and goes back to
+      the boundary schedule once a pass succeeds
+With TEST_DATABASE_URL (a scratch Postgres; everything happens in a schema of
+its own inside a transaction that is rolled back) also that missing() keeps
+offering a failed shift until it has failed MAX_ATTEMPTS times, and never
+offers one with a stored report.
+"""
+
+import contextlib
+import io
+import os
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, text
+
+import shift_reports
+from shift_reports import MAX_ATTEMPTS, ShiftReportScheduler, next_boundary
+
+
+class _Row:
+    def __init__(self, row):
+        self.row = row
+
+    def one(self):
+        return self.row
+
+    def __iter__(self):
+        return iter(())
+
+
+class FakeConnection:
+    """Answers the 'current shift' query; no reports stored."""
+
+    def __init__(self, current):
+        self.current = current
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        return _Row(self.current)
+
+    def commit(self):
+        pass
+
+
+class FakeEngine:
+    def __init__(self, current):
+        self.current = current
+        self.down = True
+
+    def connect(self):
+        if self.down:
+            raise ConnectionError("could not connect to server")
+        return FakeConnection(self.current)
+
+
+def schedule_checks():
+    checks = []
+    day = date(2026, 9, 2)
+
+    ended = shift_reports.ended_shifts(FakeConnection((day, "day")), days=1)
+    checks.append(("ended shifts during a day shift", ended == [
+        (date(2026, 9, 1), "day"), (date(2026, 9, 1), "night"),
+    ]))
+    ended = shift_reports.ended_shifts(FakeConnection((day, "night")), days=1)
+    checks.append(("...during a night shift, today's day shift too", ended == [
+        (date(2026, 9, 1), "day"), (date(2026, 9, 1), "night"), (day, "day"),
+    ]))
+
+    checks.append(("next boundary: 07:00 the same morning",
+                   next_boundary(datetime(2026, 9, 2, 6, 59)) == datetime(2026, 9, 2, 7, 0)))
+    checks.append(("...19:00 when it is exactly 07:00",
+                   next_boundary(datetime(2026, 9, 2, 7, 0)) == datetime(2026, 9, 2, 19, 0)))
+    checks.append(("...07:00 the next day after 19:00",
+                   next_boundary(datetime(2026, 9, 2, 23, 30)) == datetime(2026, 9, 3, 7, 0)))
+
+    now = [datetime(2026, 9, 2, 18, 0)]
+    scheduler = ShiftReportScheduler(None, sleep=None, clock=lambda: now[0], delay_seconds=300,
+                                     retry_delays=(60, 300, 900))
+    checks.append(("waits for the boundary plus the delay", scheduler.seconds_until_next_run() == 3600 + 300
+                   and scheduler.next_run_at == datetime(2026, 9, 2, 19, 5)))
+    waits = []
+    for failures in (1, 2, 3, 4, 9):
+        scheduler.consecutive_failures = failures
+        waits.append(scheduler.seconds_until_next_run())
+    checks.append(("retry delays after failures, capped at the last", waits == [60, 300, 900, 900, 900]))
+
+    # Down for three passes, then up with nothing to do
+    engine = FakeEngine((day, "day"))
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        if len(slept) == 3:
+            engine.down = False
+        if len(slept) == 5:
+            scheduler.stop()
+
+    scheduler = ShiftReportScheduler(engine, sleep, clock=lambda: now[0], catch_up_days=0, delay_seconds=300,
+                                     retry_delays=(60, 300))
+    with contextlib.redirect_stdout(io.StringIO()):  # the scheduler logs each failed pass
+        scheduler.run_forever()
+    checks.append(("backs off while the database is down, then follows the boundaries",
+                   slept == [60, 300, 300, 3900, 3900]))
+    checks.append(("a good pass clears the failure count", scheduler.consecutive_failures == 0
+                   and scheduler.stats()["last_error"] == "could not connect to server"))
+    return checks
+
+
+def database_checks(database_url):
+    checks = []
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.execute(text("CREATE SCHEMA shift_reports_tests;"))
+            connection.execute(text("SET LOCAL search_path TO shift_reports_tests;"))
+            connection.execute(text("CREATE TABLE requests (id SERIAL PRIMARY KEY, timestamp TIMESTAMPTZ);"))
+            shift_reports.ensure_tables(connection)
+
+            ended = shift_reports.ended_shifts(connection, days=2)
+            failing, reported, untouched = ended[-3:]
+            for attempt in range(MAX_ATTEMPTS - 1):
+                shift_reports.record_failure(connection, *failing, RuntimeError(f"attempt {attempt}"))
+            still = failing in shift_reports.missing(connection, days=2)
+            shift_reports.record_failure(connection, *failing, RuntimeError("last attempt"))
+            checks.append(("failed shift is retried until MAX_ATTEMPTS",
+                           still and failing not in shift_reports.missing(connection, days=2)))
+
+            connection.execute(text("""
+                INSERT INTO shift_reports (shift_date, shift, status, report, generated_at, attempts)
+                VALUES (:shift_date, :shift, 'ok', CAST('{}' AS JSONB), now(), 1);
+            """), {"shift_date": reported[0], "shift": reported[1]})
+            shift_reports.record_failure(connection, *reported, RuntimeError("regenerating"))
+            todo = shift_reports.missing(connection, days=2)
+            checks.append(("a stored report isn't redone, even after a failed retry",
+                           reported not in todo and untouched in todo))
+            status = connection.execute(text("""
+                SELECT status, attempts, last_error FROM shift_reports WHERE shift_date = :d AND shift = :s;
+            """), {"d": reported[0], "s": reported[1]}).one()
+            checks.append(("...and keeps its status", tuple(status) == ("ok", 2, "regenerating")))
+        finally:
+            transaction.rollback()
+    return checks
+
+
+def run_shift_reports_tests() -> None:
+    checks = schedule_checks()
+    database_url = os.getenv("TEST_DATABASE_URL")
+    if database_url:
+        checks.extend(database_checks(database_url))
+
+    failures = 0
+    print("\n=== Shift report checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    if not database_url:
+        print("Postgres checks skipped: set TEST_DATABASE_URL to a scratch database to run them.")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL SHIFT REPORT CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_shift_reports_tests()
@@ -0,0 +1,234 @@
+"""
+Per-nurse / per-CNA workload facts.
+
+staff_workload has one row per request with the staff it was attributed to
+when it was created: the nurse assigned to its room (assignments) and the
+CNA covering its zone (cna_coverage) for the shift it fell in. staff_name is
+whichever of the two the request was routed to (nurse for 'nurse', CNA for
+'cna'), so "requests per nurse" is a GROUP BY on one narrow table instead of
+a join of requests against two assignment tables per row.
+
+Rows are written right after each request write commits
+(record_request / record_completion / record_category_change). refresh()
+catches up on requests that were written some other way (seed scripts,
+restores) and rebuild() recomputes everything from history.
+
+Assignments are looked up by shift date (a night shift belongs to the date
+it started, as in analytics_rollup), falling back to the calendar date: the
+assignments page saves under date.today(), so a night shift assigned after
+midnight is stored under the next day. Rooms in `front_rooms` are the CNA
+front zone, the rest the back zone (see cna_front_rooms).
+"""
+
+import os
+
+from sqlalchemy import text
+
+from analytics_rollup import SHIFT_DATE_SQL, SHIFT_SQL
+
+UNASSIGNED = "Unassigned"
+
+_FACT_SELECT_SQL = f"""
+    SELECT r.id, r.timestamp, k.shift_date, k.shift, r.room,
+           COALESCE(r.category, 'unknown'), k.zone,
+           nurse.staff_name, cna.cna_name,
+           CASE WHEN r.category = 'cna' THEN cna.cna_name ELSE nurse.staff_name END,
+           r.completion_timestamp
+    FROM requests r
+    CROSS JOIN LATERAL (
+        SELECT {SHIFT_DATE_SQL.format(col='r.timestamp')} AS shift_date,
+               {SHIFT_SQL.format(col='r.timestamp')} AS shift,
+               CASE WHEN r.room = ANY(CAST(:front_rooms AS TEXT[])) THEN 'front' ELSE 'back' END AS zone
+    ) k
+    LEFT JOIN LATERAL (
+        SELECT a.staff_name FROM assignments a
+        WHERE a.shift = k.shift AND a.room_number = r.room
+          AND a.assignment_date IN (k.shift_date, CAST(r.timestamp AS DATE))
+        ORDER BY a.assignment_date = k.shift_date DESC
+        LIMIT 1
+    ) nurse ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT c.cna_name FROM cna_coverage c
+        WHERE c.shift = k.shift AND c.zone = k.zone
+          AND c.assignment_date IN (k.shift_date, CAST(r.timestamp AS DATE))
+        ORDER BY c.assignment_date = k.shift_date DESC
+        LIMIT 1
+    ) cna ON TRUE
+    WHERE r.timestamp IS NOT NULL AND {{where}}
+    {{order_by}}
+"""
+
+# Bulk loads insert in time order so a date range is a few contiguous pages
+_BY_TIME = "ORDER BY r.timestamp"
+
+_INSERT_SQL = f"""
+    INSERT INTO staff_workload (request_pk, created_at, shift_date, shift, room, role, zone,
+                                nurse_name, cna_name, staff_name, completed_at)
+    {_FACT_SELECT_SQL}
+    ON CONFLICT (request_pk) DO NOTHING
+"""
+
+
+def ensure_tables(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS staff_workload (
+            request_pk INTEGER PRIMARY KEY,
+            created_at TIMESTAMPTZ NOT NULL,
+            shift_date DATE NOT NULL,
+            shift VARCHAR(10) NOT NULL,
+            room VARCHAR(255),
+            role VARCHAR(255) NOT NULL,
+            zone VARCHAR(20) NOT NULL,
+            nurse_name VARCHAR(255),
+            cna_name VARCHAR(255),
+            staff_name VARCHAR(255),
+            completed_at TIMESTAMPTZ
+        );
+    """))
+    connection.execute(text("""
+        CREATE INDEX IF NOT EXISTS staff_workload_shift_date_idx ON staff_workload (shift_date);
+    """))
+    connection.execute(text("""
+        CREATE INDEX IF NOT EXISTS staff_workload_staff_idx ON staff_workload (staff_name, created_at);
+    """))
+
+
+def cna_front_rooms(rooms):
+    """
+    Rooms in the CNA front zone: CNA_FRONT_ROOMS ("231-245" or "231,232,...")
+    if set, else the first half of `rooms` in order.
+    """
+    configured = os.getenv("CNA_FRONT_ROOMS", "").strip()
+    if not configured:
+        ordered = sorted(rooms, key=lambda r: (len(r), r))
+        return ordered[:len(ordered) // 2]
+    front = []
+    for part in configured.split(","):
+        low, _, high = part.strip().partition("-")
+        if high and low.isdigit() and high.isdigit():
+            front += [str(n) for n in range(int(low), int(high) + 1)]
+        elif low:
+            front.append(low)
+    return front
+
+
+# --- incremental maintenance (call once the request write has committed) ---
+
+def record_request(connection, request_id, front_rooms):
+    """Attribute a newly inserted request to the nurse and CNA on duty for its room."""
+    connection.execute(text(_INSERT_SQL.format(where="r.request_id = :request_id", order_by="")),
+                       {"request_id": request_id, "front_rooms": list(front_rooms)})
+
+
+def record_completion(connection, request_pk, completed_at):
+    connection.execute(text("""
+        UPDATE staff_workload SET completed_at = :completed_at
+        WHERE request_pk = :request_pk AND completed_at IS NULL;
+    """), {"request_pk": request_pk, "completed_at": completed_at})
+
+
+def record_category_change(connection, request_pk, new_role):
+    """A deferred request now counts against the other role's staff member."""
+    connection.execute(text("""
+        UPDATE staff_workload
+        SET role = COALESCE(:role, 'unknown'),
+            staff_name = CASE WHEN :role = 'cna' THEN cna_name ELSE nurse_name END
+        WHERE request_pk = :request_pk;
+    """), {"request_pk": request_pk, "role": new_role})
+
+
+# --- batch maintenance ---
+
+def refresh(connection, front_rooms):
+    """Add facts for requests newer than the table, and completions it missed. Returns rows added."""
+    added = connection.execute(text(_INSERT_SQL.format(
+        where="r.id > (SELECT COALESCE(MAX(request_pk), 0) FROM staff_workload)", order_by=_BY_TIME,
+    )), {"front_rooms": list(front_rooms)}).rowcount
+    connection.execute(text("""
+        UPDATE staff_workload w
+        SET completed_at = r.completion_timestamp
+        FROM requests r
+        WHERE w.completed_at IS NULL AND r.id = w.request_pk AND r.completion_timestamp IS NOT NULL;
+    """))
+    return added
+
+
+def rebuild(connection, front_rooms):
+    """Recompute every fact from requests and the assignment tables. Call inside a transaction."""
+    connection.execute(text("LOCK TABLE requests IN SHARE MODE;"))
+    connection.execute(text("DELETE FROM staff_workload;"))
+    connection.execute(text(_INSERT_SQL.format(where="TRUE", order_by=_BY_TIME)), {"front_rooms": list(front_rooms)})
+
+
+# --- reads ---
+
+def summary(connection, start_date, end_date, role=None, shift=None):
+    """
+    Per staff member over shift dates start_date..end_date: requests, response
+    times, their busiest clock hour and the most requests they had open at once.
+    A request never completed counts as open until the end of the range.
+    """
+    params = {"start_date": start_date, "end_date": end_date, "role": role, "shift": shift}
+    where = "shift_date BETWEEN :start_date AND :end_date"
+    if role is not None:
+        where += " AND role = :role"
+    if shift is not None:
+        where += " AND shift = :shift"
+
+    staff = {}
+    for row in connection.execute(text(f"""
+        SELECT COALESCE(staff_name, '{UNASSIGNED}'), role, COUNT(*), COUNT(completed_at),
+               AVG(EXTRACT(EPOCH FROM (completed_at - created_at))),
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM (completed_at - created_at))),
+               percentile_cont(0.9) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM (completed_at - created_at)))
+        FROM staff_workload
+        WHERE {where}
+        GROUP BY 1, 2;
+    """), params):
+        staff[(row[0], row[1])] = {
+            "staff_name": row[0],
+            "role": row[1],
+            "requests": row[2],
+            "completed": row[3],
+            "avg_response_seconds": float(row[4]) if row[4] is not None else None,
+            "p50_response_seconds": row[5],
+            "p90_response_seconds": row[6],
+            "peak_hour": None,
+            "peak_open": None,
+        }
+
+    for name, role_, hour, n in connection.execute(text(f"""
+        SELECT DISTINCT ON (1, 2) COALESCE(staff_name, '{UNASSIGNED}'), role, date_trunc('hour', created_at), COUNT(*)
+        FROM staff_workload
+        WHERE {where}
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 4 DESC, 3;
+    """), params):
+        staff[(name, role_)]["peak_hour"] = {"hour": hour.isoformat(), "requests": n}
+
+    # Sweep +1 at creation / -1 at completion (completions first at equal times); peaks are at creations
+    for name, role_, at, n in connection.execute(text(f"""
+        WITH facts AS (
+            SELECT COALESCE(staff_name, '{UNASSIGNED}') AS staff_name, role, created_at, completed_at
+            FROM staff_workload
+            WHERE {where}
+        ),
+        events AS (
+            SELECT staff_name, role, created_at AS at, 1 AS delta FROM facts
+            UNION ALL
+            SELECT staff_name, role, completed_at, -1 FROM facts WHERE completed_at IS NOT NULL
+        ),
+        running AS (
+            SELECT staff_name, role, at, delta,
+                   SUM(delta) OVER (PARTITION BY staff_name, role ORDER BY at, delta
+                                    ROWS UNBOUNDED PRECEDING) AS open_count
+            FROM events
+        )
+        SELECT DISTINCT ON (staff_name, role) staff_name, role, at, open_count
+        FROM running
+        WHERE delta = 1
+        ORDER BY staff_name, role, open_count DESC, at;
+    """), params):
+        staff[(name, role_)]["peak_open"] = {"at": at.isoformat(), "requests": int(n)}
+
+    return sorted(staff.values(), key=lambda s: (-s["requests"], s["staff_name"], s["role"]))
@@ -0,0 +1,193 @@
+"""
+Checks for the per-staff workload facts behind /api/analytics/staff.
+
+Usage:
+    TEST_DATABASE_URL=postgresql://localhost/scratch python staff_workload_tests.py
+
+The attribution and aggregation are Postgres SQL (LATERAL joins,
+percentile_cont, DISTINCT ON), so those checks need a Postgres; they run in
+a schema of their own inside one transaction that is rolled back, leaving
+the database as it was. Without TEST_DATABASE_URL only cna_front_rooms() is
+checked. Checks that:
+    - CNA_FRONT_ROOMS ranges and lists are parsed, and the default is the
+      first half of the rooms
+    - record_request() attributes a request to the nurse assigned to its room
+      and the CNA covering its zone for its shift, preferring the shift date
+      and falling back to the calendar date (a night shift assigned after
+      midnight), and routes staff_name by category
+    - record_completion() keeps the first completion; record_category_change()
+      moves a deferred request to the other role's staff member
+    - refresh() adds requests written some other way, and completions it missed
+    - summary() counts requests, completions, response times, the busiest
+      hour and the most open at once per staff member
+"""
+
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+import staff_workload
+
+FRONT_ROOMS = ["231", "232"]
+DAY = date(2026, 9, 1)
+
+
+def at(day_offset, hour, minute=0):
+    return datetime(2026, 9, 1 + day_offset, hour, minute, tzinfo=timezone.utc)
+
+
+def front_room_checks():
+    checks = []
+    saved = os.environ.pop("CNA_FRONT_ROOMS", None)
+    try:
+        checks.append(("default front zone is the first half of the rooms",
+                       staff_workload.cna_front_rooms(["240", "231", "1000", "232"]) == ["231", "232"]))
+        os.environ["CNA_FRONT_ROOMS"] = "231-233, 250"
+        checks.append(("CNA_FRONT_ROOMS ranges and single rooms",
+                       staff_workload.cna_front_rooms(["231"]) == ["231", "232", "233", "250"]))
+    finally:
+        os.environ.pop("CNA_FRONT_ROOMS", None)
+        if saved is not None:
+            os.environ["CNA_FRONT_ROOMS"] = saved
+    return checks
+
+
+def _setup(connection):
+    connection.execute(text("CREATE SCHEMA staff_workload_tests;"))
+    connection.execute(text("SET LOCAL search_path TO staff_workload_tests;"))
+    connection.execute(text("SET LOCAL TimeZone TO 'UTC';"))
+    connection.execute(text("""
+        CREATE TABLE requests (id SERIAL PRIMARY KEY, request_id VARCHAR(255), timestamp TIMESTAMPTZ,
+                               room VARCHAR(255), category VARCHAR(255), completion_timestamp TIMESTAMPTZ);
+        CREATE TABLE assignments (assignment_date DATE, shift VARCHAR(10), room_number VARCHAR(255),
+                                  staff_name VARCHAR(255));
+        CREATE TABLE cna_coverage (assignment_date DATE, shift VARCHAR(10), zone VARCHAR(20), cna_name VARCHAR(255));
+    """))
+    staff_workload.ensure_tables(connection)
+    for assignment_date, shift, room, name in (
+        (DAY, "day", "231", "Nurse Ana"),
+        (DAY + timedelta(days=1), "night", "241", "Nurse Bo"),   # night of 9/1, saved after midnight
+        (DAY, "night", "242", "Nurse Cy"),
+        (DAY + timedelta(days=1), "night", "242", "Nurse Dee"),  # the night of 9/2
+    ):
+        connection.execute(text("INSERT INTO assignments VALUES (:d, :s, :r, :n);"),
+                           {"d": assignment_date, "s": shift, "r": room, "n": name})
+    for zone, name in (("front", "CNA Eve"), ("back", "CNA Fay")):
+        connection.execute(text("INSERT INTO cna_coverage VALUES (:d, 'day', :z, :n);"),
+                           {"d": DAY, "z": zone, "n": name})
+
+
+def _request(connection, request_id, room, category, created_at, record=True):
+    pk = connection.execute(text("""
+        INSERT INTO requests (request_id, timestamp, room, category)
+        VALUES (:request_id, :created_at, :room, :category) RETURNING id;
+    """), {"request_id": request_id, "created_at": created_at, "room": room, "category": category}).scalar()
+    if record:
+        staff_workload.record_request(connection, request_id, FRONT_ROOMS)
+    return pk
+
+
+def _complete(connection, pk, completed_at, record=True):
+    connection.execute(text("UPDATE requests SET completion_timestamp = :at WHERE id = :pk;"),
+                       {"at": completed_at, "pk": pk})
+    if record:
+        staff_workload.record_completion(connection, pk, completed_at)
+
+
+def _facts(connection):
+    return {row[0]: row[1:] for row in connection.execute(text("""
+        SELECT r.request_id, w.shift_date, w.shift, w.zone, w.nurse_name, w.cna_name, w.staff_name, w.role
+        FROM staff_workload w JOIN requests r ON r.id = w.request_pk;
+    """))}
+
+
+def database_checks(database_url):
+    checks = []
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            _setup(connection)
+            pk = {}
+            pk["a"] = _request(connection, "req_a", "231", "cna", at(0, 10))
+            pk["b"] = _request(connection, "req_b", "231", "nurse", at(0, 10, 30))
+            pk["c"] = _request(connection, "req_c", "241", "nurse", at(1, 2))
+            pk["d"] = _request(connection, "req_d", "242", "nurse", at(1, 3))
+            pk["g"] = _request(connection, "req_g", "250", "nurse", at(0, 20))
+            facts = _facts(connection)
+            checks.append(("cna request goes to the CNA covering the room's zone",
+                           facts["req_a"] == (DAY, "day", "front", "Nurse Ana", "CNA Eve", "CNA Eve", "cna")))
+            checks.append(("nurse request goes to the room's nurse", facts["req_b"][5] == "Nurse Ana"))
+            checks.append(("night shift assigned after midnight is found by calendar date",
+                           facts["req_c"][:2] == (DAY, "night") and facts["req_c"][5] == "Nurse Bo"))
+            checks.append(("the shift date's assignment wins over the calendar date's",
+                           facts["req_d"][5] == "Nurse Cy"))
+            checks.append(("no assignment -> no staff name", facts["req_g"][3:6] == (None, None, None)))
+
+            _complete(connection, pk["a"], at(0, 10, 2))
+            _complete(connection, pk["b"], at(0, 10, 31))
+            _complete(connection, pk["c"], at(1, 2, 5))
+            staff_workload.record_completion(connection, pk["a"], at(0, 11))  # a repeat completion
+            staff_workload.record_category_change(connection, pk["a"], "nurse")  # deferred to the nurse
+
+            # Written some other way: refresh() picks them up, with their completions
+            pk["e"] = _request(connection, "req_e", "241", "cna", at(0, 11), record=False)
+            pk["f"] = _request(connection, "req_f", "250", "cna", at(0, 12), record=False)
+            _complete(connection, pk["e"], at(0, 12, 30), record=False)
+            added = staff_workload.refresh(connection, FRONT_ROOMS)
+            checks.append(("refresh adds requests written elsewhere", added == 2
+                           and _facts(connection)["req_e"][4:] == ("CNA Fay", "CNA Fay", "cna")))
+            checks.append(("refresh adds nothing twice", staff_workload.refresh(connection, FRONT_ROOMS) == 0))
+
+            summary = {(s["staff_name"], s["role"]): s
+                       for s in staff_workload.summary(connection, DAY, DAY)}
+            checks.append(("one row per staff member and role", set(summary) == {
+                ("Nurse Ana", "nurse"), ("Nurse Bo", "nurse"), ("Nurse Cy", "nurse"),
+                ("CNA Fay", "cna"), (staff_workload.UNASSIGNED, "nurse"),
+            }))
+            ana, fay = summary[("Nurse Ana", "nurse")], summary[("CNA Fay", "cna")]
+            checks.append(("deferred request counts for the room's nurse", ana["requests"] == 2))
+            checks.append(("first completion counts, repeats don't",
+                           ana["completed"] == 2 and ana["avg_response_seconds"] == 90
+                           and ana["p50_response_seconds"] == 90))
+            checks.append(("open requests count, response times only completed ones",
+                           (fay["requests"], fay["completed"], fay["p90_response_seconds"]) == (2, 1, 5400)))
+            checks.append(("busiest hour and most open at once",
+                           fay["peak_hour"]["requests"] == 1 and fay["peak_open"]["requests"] == 2
+                           and fay["peak_open"]["at"] == at(0, 12).isoformat()))
+            checks.append(("role and shift filters",
+                           {s["staff_name"] for s in staff_workload.summary(connection, DAY, DAY, role="nurse",
+                                                                           shift="night")}
+                           == {"Nurse Bo", "Nurse Cy", staff_workload.UNASSIGNED}))
+            checks.append(("never-completed request leaves the averages empty",
+                           ("Nurse Cy", "nurse") in summary
+                           and summary[("Nurse Cy", "nurse")]["avg_response_seconds"] is None))
+        finally:
+            transaction.rollback()
+    return checks
+
+
+def run_staff_workload_tests() -> None:
+    checks = front_room_checks()
+    database_url = os.getenv("TEST_DATABASE_URL")
+    if database_url:
+        checks.extend(database_checks(database_url))
+
+    failures = 0
+    print("\n=== Staff workload checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    if not database_url:
+        print("Postgres checks skipped: set TEST_DATABASE_URL to a scratch database to run them.")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL STAFF WORKLOAD CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_staff_workload_tests()
@@ -0,0 +1,142 @@
+"""
+Localized button label -> English maps for structured buttons.
+
+Requests are stored with the English label so analytics, triage and the
+dashboards see one string per button whatever language the patient chose.
+Text that isn't a known button (free-text notes) is kept as typed, tagged
+[ES] / [ZH]. Shared by app.py and request_labels.py.
+
+The maps are generated at import from the button configs rather than kept
+by hand: each language's config is aligned with the English one of the same
+pathway on structure, i.e. main_buttons position by position, then each
+aligned button's options position by position. Buttons no menu leads to
+(the emergency button) are paired when exactly one entry on each side has
+the same action, tier and sub-menu shape. Anything that can't be aligned is
+listed in COVERAGE_GAPS (app.py prints them at startup and /debug/metrics
+has coverage()), so a config edit that drifts shows up instead of turning
+into [ES]/[ZH] text in analytics. rebuild() regenerates the maps when the
+button registry reloads an edited config.
+"""
+
+import importlib
+from types import MappingProxyType
+
+from button_registry import LANGUAGES, PATHWAYS, module_name
+
+SOURCE_LANGUAGE = "en"
+
+
+def _shape(entry):
+    return entry.get("action"), entry.get("escalation_tier", "routine"), bool(entry.get("options"))
+
+
+def align(english, localized):
+    """
+    localized label -> English label for one pathway's pair of button_data
+    dicts, plus a list of what could not be aligned.
+    """
+    pairs = {}
+    gaps = []
+    seen = set()
+
+    def walk(english_labels, localized_labels, where):
+        if len(english_labels) != len(localized_labels):
+            gaps.append(f"{where}: {len(english_labels)} options in {SOURCE_LANGUAGE}, {len(localized_labels)} here")
+        for english_label, localized_label in zip(english_labels, localized_labels):
+            if pairs.setdefault(localized_label, english_label) != english_label:
+                gaps.append(f"{localized_label!r} is both {pairs[localized_label]!r} and {english_label!r}")
+            if (english_label, localized_label) in seen:
+                continue
+            seen.add((english_label, localized_label))
+            english_entry, localized_entry = english.get(english_label), localized.get(localized_label)
+            if isinstance(english_entry, dict) and isinstance(localized_entry, dict):
+                walk(english_entry.get("options", []), localized_entry.get("options", []), repr(english_label))
+
+    walk(english.get("main_buttons", []), localized.get("main_buttons", []), "main_buttons")
+
+    # Entries no menu leads to: pair them when their shape is unique on both sides
+    aligned = set(pairs.values())
+    english_rest = {}
+    for label, entry in english.items():
+        if isinstance(entry, dict) and label not in aligned:
+            english_rest.setdefault(_shape(entry), []).append(label)
+    localized_rest = {}
+    for label, entry in localized.items():
+        if isinstance(entry, dict) and label not in pairs:
+            localized_rest.setdefault(_shape(entry), []).append(label)
+    for shape, labels in localized_rest.items():
+        candidates = english_rest.get(shape, [])
+        if len(labels) == 1 and len(candidates) == 1:
+            pairs[labels[0]] = candidates[0]
+        else:
+            gaps.extend(f"{label!r} has no matching {SOURCE_LANGUAGE} entry" for label in labels)
+    return pairs, gaps
+
+
+def build(configs):
+    """
+    ({language: frozen localized -> English map}, gaps) from a
+    {(pathway, language): button_data} dict.
+    """
+    maps = {}
+    gaps = []
+    for language in sorted({language for _, language in configs} - {SOURCE_LANGUAGE}):
+        mapping = {}
+        for pathway in PATHWAYS:
+            english, localized = configs.get((pathway, SOURCE_LANGUAGE)), configs.get((pathway, language))
+            if english is None or localized is None:
+                if localized is not None:
+                    gaps.append(f"{pathway}/{language}: no {SOURCE_LANGUAGE} config to align with")
+                continue
+            pairs, pathway_gaps = align(english, localized)
+            gaps.extend(f"{pathway}/{language}: {gap}" for gap in pathway_gaps)
+            for localized_label, english_label in pairs.items():
+                if mapping.setdefault(localized_label, english_label) != english_label:
+                    gaps.append(f"{pathway}/{language}: {localized_label!r} means {mapping[localized_label]!r} "
+                                f"in another pathway, {english_label!r} here")
+        maps[language] = MappingProxyType(mapping)
+    return maps, gaps
+
+
+def _load_configs():
+    configs = {}
+    for pathway in PATHWAYS:
+        for language in LANGUAGES:
+            name = module_name(pathway, language)
+            try:
+                configs[(pathway, language)] = importlib.import_module(name).button_data
+            except (ImportError, AttributeError) as e:
+                print(f"WARN: translations could not read {name}: {e}")
+    return configs
+
+
+def rebuild(configs=None):
+    """
+    Regenerate the maps from a {(pathway, language): button_data} dict (by
+    default the button_config_* modules); returns the coverage gaps.
+    """
+    global REVERSE, COVERAGE_GAPS, ES_TO_EN, ZH_TO_EN
+    REVERSE, COVERAGE_GAPS = build(_load_configs() if configs is None else configs)
+    ES_TO_EN = REVERSE.get("es", MappingProxyType({}))
+    ZH_TO_EN = REVERSE.get("zh", MappingProxyType({}))
+    return COVERAGE_GAPS
+
+
+rebuild()
+
+
+def coverage():
+    return {
+        "labels": {language: len(mapping) for language, mapping in REVERSE.items()},
+        "gaps": COVERAGE_GAPS,
+    }
+
+
+def to_english_label(text: str, lang: str) -> str:
+    """Return an English label for structured buttons. For unknown/custom notes, tag language."""
+    if not text:
+        return text
+    mapping = REVERSE.get(lang)
+    if mapping is None:
+        return text
+    return mapping.get(text) or f"[{lang.upper()}] {text}"
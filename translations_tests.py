@@ -0,0 +1,145 @@
+"""
+Checks for the generated localized -> English label maps.
+
+Usage:
+    python translations_tests.py
+
+Checks that:
+    - the shipped configs align: main buttons, nested options and the
+      emergency button (reached by no menu) all map to their English label
+    - the only coverage gaps are the ones known below; a new gap means a
+      config drifted from its English counterpart
+    - align() reports options missing on one side and unpaired entries
+    - the maps are read-only and unknown text is tagged with the language
+    - a button added by a config reload gets its translation and request
+      label in the same reload, with no restart
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+import request_labels
+import translations
+from button_registry import ButtonRegistry, module_name
+from translations import REVERSE, align, to_english_label
+
+# Follow-up options only the English configs have so far
+KNOWN_GAPS = {
+    f"{pathway}/{language}: 'Can I take a shower?': 2 options in en, 0 here"
+    for pathway in ("standard", "bereavement") for language in ("es", "zh")
+}
+
+ENGLISH = {
+    "greeting": "Hello",
+    "main_buttons": ["Supplies", "Ice"],
+    "Emergency": {"action": "Notify Nurse", "escalation_tier": "emergent"},
+    "Supplies": {"question": "Which?", "options": ["Pads", "Wipes"]},
+    "Ice": {"action": "Notify CNA"},
+    "Pads": {"action": "Notify CNA"},
+    "Wipes": {"action": "Notify CNA"},
+}
+SPANISH = {
+    "greeting": "Hola",
+    "main_buttons": ["Suministros", "Hielo"],
+    "Emergencia": {"action": "Notify Nurse", "escalation_tier": "emergent"},
+    "Suministros": {"question": "¿Cuál?", "options": ["Toallas"]},
+    "Hielo": {"action": "Notify CNA"},
+    "Toallas": {"action": "Notify CNA"},
+    "Sobrante": {"note": "Sin pareja"},
+}
+
+
+def _write_config(directory, language, data):
+    path = os.path.join(directory, f"{module_name('standard', language)}.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"button_data = {data!r}\n")
+    # Make sure the mtime moves even on coarse-grained file systems
+    stamp = time.time() + 1 + os.stat(path).st_mtime % 1
+    os.utime(path, (stamp, stamp))
+
+
+def reload_checks():
+    """A button added on disk, through ButtonRegistry.on_reload the way app.py wires it."""
+    checks = []
+    labeler = request_labels.RequestLabeler(lambda value: SimpleNamespace(detected_patterns=[]))
+
+    def rebuild_label_maps(registry):
+        configs = registry.button_data()
+        translations.rebuild(configs)
+        labeler.set_buttons(request_labels.button_labels(configs.values()))
+
+    directory = tempfile.mkdtemp(prefix="translations_tests_")
+    try:
+        _write_config(directory, "en", ENGLISH)
+        _write_config(directory, "es", SPANISH)
+        registry = ButtonRegistry(directory, pathways=("standard",), languages=("en", "es"))
+        registry.load()
+        registry.on_reload.append(rebuild_label_maps)
+        checks.append(("new button unknown before the edit", to_english_label("Manta", "es") == "[ES] Manta"))
+
+        _write_config(directory, "en", dict(ENGLISH, main_buttons=ENGLISH["main_buttons"] + ["Blanket"],
+                                            Blanket={"action": "Notify CNA"}))
+        _write_config(directory, "es", dict(SPANISH, main_buttons=SPANISH["main_buttons"] + ["Manta"],
+                                            Manta={"action": "Notify CNA"}))
+        reloaded = registry.reload_changed()
+        checks.append(("reload rebuilds the translation map",
+                       len(reloaded) == 2 and to_english_label("Manta", "es") == "Blanket"))
+        checks.append(("...and the request labels", labeler.label_for("[ES] Manta") == ("Blanket", "button")
+                       and labeler.label_for("blanket") == ("Blanket", "button")))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        translations.rebuild()  # back to the shipped configs
+    checks.append(("rebuild() restores the shipped maps", to_english_label("Tengo una emergencia", "es")
+                   == "I'm having an emergency"))
+    return checks
+
+
+def run_translations_tests() -> None:
+    checks = []
+
+    for text, lang, english in (
+        ("Necesito suministros", "es", "I need supplies"),
+        ("Toallas azules", "es", "Blue pads"),
+        ("Tengo una emergencia", "es", "I'm having an emergency"),
+        ("Quiero ver a mi bebé", "es", "I want to see my baby"),
+        ("我需要包裹静脉输液管以便洗澡", "zh", "I need my IV covered to shower"),
+        ("我有紧急情况", "zh", "I'm having an emergency"),
+    ):
+        checks.append((f"{lang}: {text!r} -> {english!r}", to_english_label(text, lang) == english))
+    checks.append(("coverage gaps are only the known ones", set(translations.COVERAGE_GAPS) == KNOWN_GAPS))
+
+    pairs, gaps = align(ENGLISH, SPANISH)
+    checks.append(("align pairs menus, options and the unreached emergency entry",
+                   pairs == {"Suministros": "Supplies", "Hielo": "Ice", "Toallas": "Pads", "Emergencia": "Emergency"}))
+    checks.append(("align reports a shorter option list", "'Supplies': 2 options in en, 1 here" in gaps))
+    checks.append(("align reports an entry with no counterpart", "'Sobrante' has no matching en entry" in gaps))
+
+    try:
+        REVERSE["es"]["Nuevo"] = "New"
+        frozen = False
+    except TypeError:
+        frozen = True
+    checks.append(("maps are read-only", frozen))
+    checks.append(("unknown text is tagged", to_english_label("una manta, por favor", "es") == "[ES] una manta, por favor"
+                   and to_english_label("一条毯子", "zh") == "[ZH] 一条毯子"))
+    checks.append(("English passes through", to_english_label("I need a blanket", "en") == "I need a blanket"))
+    checks.extend(reload_checks())
+
+    failures = 0
+    print("\n=== Translation map tests ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL TRANSLATION MAP CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_translations_tests()
@@ -0,0 +1,80 @@
+"""
+Checks for the TTL + LRU cache behind request_rooms, analytics_cache and the
+memory session store.
+
+Usage:
+    python ttl_cache_tests.py
+
+Drives TTLCache with a fake clock and checks that:
+    - entries expire after the cache's ttl, or a per-entry ttl
+    - past maxsize the least recently used entry is evicted, and a get()
+      counts as a use
+    - pop() removes and returns an entry (the default when it is missing or
+      expired); invalidate() drops matching keys
+    - stats() counts hits, misses, expiries, evictions and invalidations
+"""
+
+from ttl_cache import TTLCache
+
+
+def run_ttl_cache_tests() -> None:
+    checks = []
+    now = [0.0]
+    cache = TTLCache(maxsize=3, ttl=10.0, clock=lambda: now[0])
+
+    cache.set("a", 1)
+    cache.set("short", 2, ttl=2.0)
+    checks.append(("fresh entry is returned", cache.get("a") == 1))
+    now[0] = 2.0
+    checks.append(("per-entry ttl expires first", cache.get("short") is None and cache.get("a") == 1))
+    now[0] = 9.9
+    checks.append(("entry lives until its ttl", cache.get("a") == 1))
+    now[0] = 10.0
+    checks.append(("entry expires at its ttl", cache.get("a", "gone") == "gone" and len(cache) == 0))
+    cache.set("a", 3)
+    checks.append(("set after expiry starts a new ttl", cache.get("a") == 3))
+
+    lru = TTLCache(maxsize=3, ttl=100.0, clock=lambda: now[0])
+    for key in ("x", "y", "z"):
+        lru.set(key, key)
+    lru.get("x")          # x is now the most recent
+    lru.set("w", "w")     # evicts y, the least recently used
+    checks.append(("LRU eviction at maxsize", len(lru) == 3 and lru.get("y") is None
+                   and all(lru.get(k) == k for k in ("x", "z", "w"))))
+    lru.set("x", "x2")    # overwriting doesn't grow the cache
+    checks.append(("overwrite keeps the size", len(lru) == 3 and lru.get("x") == "x2"))
+
+    checks.append(("pop returns and removes", lru.pop("z") == "z" and lru.get("z") is None))
+    checks.append(("pop of a missing key returns the default", lru.pop("nope", "dflt") == "dflt"))
+    lru.set("old", 1, ttl=1.0)
+    now[0] += 5
+    checks.append(("pop of an expired entry returns the default", lru.pop("old", "dflt") == "dflt"))
+    lru.set(("241", "a"), 1)
+    lru.set(("241", "b"), 2)  # evicts w
+    checks.append(("invalidate drops matching keys", lru.invalidate(lambda k: isinstance(k, tuple)) == 2
+                   and lru.get(("241", "a")) is None))
+
+    stats = cache.stats()
+    checks.append(("stats count hits, misses and expiries",
+                   (stats["hits"], stats["misses"], stats["expired"]) == (4, 2, 2) and stats["hit_rate"] == round(4 / 6, 4)))
+    stats = lru.stats()
+    checks.append(("stats count evictions and invalidations",
+                   stats["evicted"] == 2 and stats["invalidated"] == 2 and stats["size"] == len(lru) == 1))
+    checks.append(("no lookups -> no hit rate", TTLCache().stats()["hit_rate"] is None))
+
+    failures = 0
+    print("\n=== TTL cache checks ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"Stats: {cache.stats()}")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL TTL CACHE CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_ttl_cache_tests()
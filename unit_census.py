@@ -0,0 +1,190 @@
+"""
+Live census of open call lights for /metrics/unit.
+
+Every open request is held in memory (request_id -> role, tier, room,
+created at) together with running open counts per role/tier and lifetime
+opened/completed/deferred totals. The request handlers update it right after
+their DB write commits (opened / rerouted / closed), and app startup loads the
+open requests once from Postgres, so serving the census never queries the
+database: role/tier counts are kept as they change, and ages, age buckets and
+SLA breaches come from one pass over the open requests (a unit's worth, not
+history).
+
+The census is per process, like the other in-memory state here; the app
+runs a single worker (see Procfile).
+"""
+
+import threading
+import time
+
+ROLES = ("nurse", "cna")
+TIERS = ("emergent", "routine")
+
+# Upper edges (seconds) of the open-request age buckets; the last bucket is open-ended
+AGE_BUCKETS = (120, 300, 600, 1800)
+
+DEFAULT_SLA_SECONDS = {"emergent": 120, "routine": 600}
+
+
+def _bucket_label(low, high):
+    def fmt(seconds):
+        return f"{seconds // 60}m" if seconds % 60 == 0 else f"{seconds}s"
+    return f"{fmt(low)}+" if high is None else f"{fmt(low)}-{fmt(high)}"
+
+
+class UnitCensus:
+    def __init__(self, sla_seconds=None, age_buckets=AGE_BUCKETS, clock=time.time):
+        self.sla_seconds = dict(DEFAULT_SLA_SECONDS, **(sla_seconds or {}))
+        self.age_buckets = tuple(age_buckets)
+        self._clock = clock
+        self._open = {}  # request_id -> [role, tier, room, created_at (epoch seconds)]
+        self._counts = {}  # (role, tier) -> open requests
+        self._totals = {"opened": {}, "completed": {}, "deferred": {}}  # kind -> role -> n
+        self._lock = threading.Lock()
+        self.loaded_at = None
+
+    @staticmethod
+    def _key(role, tier):
+        return (role or "unknown", tier or "routine")
+
+    def _bump(self, key, n):
+        self._counts[key] = self._counts.get(key, 0) + n
+        if not self._counts[key]:
+            del self._counts[key]
+
+    def _total(self, kind, role):
+        totals = self._totals[kind]
+        totals[role] = totals.get(role, 0) + 1
+
+    # --- updates (call after the DB write commits) ---
+    def load(self, rows):
+        """Replace the open set with (request_id, role, tier, room, created_at datetime) rows."""
+        with self._lock:
+            self._open.clear()
+            self._counts.clear()
+            for request_id, role, tier, room, created_at in rows:
+                role, tier = self._key(role, tier)
+                ts = created_at.timestamp() if created_at is not None else self._clock()
+                self._open[str(request_id)] = [role, tier, room, ts]
+                self._bump((role, tier), 1)
+            self.loaded_at = self._clock()
+
+    def opened(self, request_id, role, tier, room=None, created_at=None):
+        role, tier = self._key(role, tier)
+        ts = created_at.timestamp() if created_at is not None else self._clock()
+        with self._lock:
+            if str(request_id) in self._open:
+                return
+            self._open[str(request_id)] = [role, tier, room, ts]
+            self._bump((role, tier), 1)
+            self._total("opened", role)
+
+    def rerouted(self, request_id, role):
+        """A deferred request now waits on `role`."""
+        with self._lock:
+            entry = self._open.get(str(request_id))
+            if entry is None or entry[0] == role:
+                return
+            self._bump((entry[0], entry[1]), -1)
+            entry[0] = role
+            self._bump((role, entry[1]), 1)
+            self._total("deferred", role)
+
+    def closed(self, request_id):
+        with self._lock:
+            entry = self._open.pop(str(request_id), None)
+            if entry is None:
+                return
+            self._bump((entry[0], entry[1]), -1)
+            self._total("completed", entry[0])
+
+    # --- reads ---
+    def snapshot(self):
+        now = self._clock()
+        edges = self.age_buckets
+        with self._lock:
+            counts = dict(self._counts)
+            totals = {kind: dict(by_role) for kind, by_role in self._totals.items()}
+            open_requests = [(request_id, *entry) for request_id, entry in self._open.items()]
+
+        by_role = {}
+        for (role, tier), n in counts.items():
+            by_role.setdefault(role, {t: 0 for t in TIERS})[tier] = n
+        for role in ROLES:
+            by_role.setdefault(role, {t: 0 for t in TIERS})
+
+        buckets = [0] * (len(edges) + 1)
+        breaches = {t: 0 for t in TIERS}
+        oldest = None
+        for request_id, role, tier, room, ts in open_requests:
+            age = max(now - ts, 0.0)
+            i = 0
+            while i < len(edges) and age >= edges[i]:
+                i += 1
+            buckets[i] += 1
+            if age >= self.sla_seconds.get(tier, self.sla_seconds["routine"]):
+                breaches[tier] = breaches.get(tier, 0) + 1
+            if oldest is None or age > oldest["age_seconds"]:
+                oldest = {"request_id": request_id, "room": room, "role": role, "tier": tier,
+                          "age_seconds": age}
+        if oldest:
+            oldest["age_seconds"] = round(oldest["age_seconds"], 1)
+
+        lows = (0,) + edges
+        highs = edges + (None,)
+        return {
+            "open": len(open_requests),
+            "open_by_role": by_role,
+            "oldest_open": oldest,
+            "age_buckets": [
+                {"bucket": _bucket_label(low, high), "max_age_seconds": high, "requests": n}
+                for low, high, n in zip(lows, highs, buckets)
+            ],
+            "sla_seconds": dict(self.sla_seconds),
+            "sla_breaches": breaches,
+            "sla_breaches_total": sum(breaches.values()),
+            "totals": totals,
+            "loaded_at": self.loaded_at,
+            "generated_at": now,
+        }
+
+    def prometheus(self, prefix="calllight"):
+        """The snapshot in Prometheus text exposition format (0.0.4)."""
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text
+                             else f"{prefix}_{name} {value}")
+
+        metric("open_requests", "gauge", "Open call-light requests.", [
+            ((("role", role), ("tier", tier)), n)
+            for role, tiers in sorted(snap["open_by_role"].items()) for tier, n in sorted(tiers.items())
+        ])
+        oldest = snap["oldest_open"]
+        metric("oldest_open_request_age_seconds", "gauge", "Age of the oldest open request.",
+               [((), oldest["age_seconds"] if oldest else 0)])
+
+        # Cumulative, like a histogram's buckets
+        cumulative = 0
+        samples = []
+        for bucket in snap["age_buckets"]:
+            cumulative += bucket["requests"]
+            le = "+Inf" if bucket["max_age_seconds"] is None else bucket["max_age_seconds"]
+            samples.append(((("le", le),), cumulative))
+        metric("open_requests_age_le_seconds", "gauge",
+               "Open requests younger than `le` seconds.", samples)
+
+        metric("sla_breaches", "gauge", "Open requests older than their tier's response SLA.",
+               [((("tier", tier),), n) for tier, n in sorted(snap["sla_breaches"].items())])
+        metric("sla_seconds", "gauge", "Response SLA per tier.",
+               [((("tier", tier),), s) for tier, s in sorted(snap["sla_seconds"].items())])
+        for kind, help_text in (("opened", "Requests opened"), ("completed", "Requests completed"),
+                                ("deferred", "Requests deferred to another role")):
+            metric(f"requests_{kind}_total", "counter", f"{help_text} since the process started.",
+                   [((("role", role),), n) for role, n in sorted(snap["totals"][kind].items())])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,123 @@
+"""
+Consistency checks for the in-memory unit census behind /metrics/unit.
+
+Usage:
+    python unit_census_tests.py
+
+Replays a shift's worth of random creates, defers and completions (with
+duplicate completions, the way two dashboards can both press Done) against
+UnitCensus and a plain list of open requests, and checks that:
+    - open counts per role/tier match the list after every step
+    - oldest age, age buckets and SLA breaches match a brute-force recount
+    - the Prometheus text carries the same numbers
+    - load() from the database replaces the open set without touching totals
+"""
+
+import random
+from datetime import datetime, timezone
+
+from unit_census import TIERS, UnitCensus
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def recount(open_requests, now, census):
+    counts = {}
+    breaches = {t: 0 for t in TIERS}
+    ages = []
+    for role, tier, created in open_requests.values():
+        counts[(role, tier)] = counts.get((role, tier), 0) + 1
+        age = now - created
+        ages.append(age)
+        if age >= census.sla_seconds[tier]:
+            breaches[tier] += 1
+    buckets = []
+    low = 0
+    for high in census.age_buckets + (None,):
+        buckets.append(sum(1 for a in ages if a >= low and (high is None or a < high)))
+        low = high
+    return counts, breaches, buckets, max(ages) if ages else None
+
+
+def run_unit_census_tests() -> None:
+    rng = random.Random(5)
+    clock = FakeClock()
+    census = UnitCensus(clock=clock)
+    expected = {}  # request_id -> (role, tier, created)
+    checks = []
+    steps = 0
+    mismatches = 0
+
+    for n in range(3000):
+        clock.now += rng.uniform(0, 30)
+        action = rng.random()
+        if action < 0.45 or not expected:
+            request_id = f"req_{n}"
+            role, tier = rng.choice(("nurse", "cna")), rng.choice(TIERS)
+            census.opened(request_id, role, tier, room=str(rng.randint(231, 260)))
+            expected[request_id] = (role, tier, clock.now)
+        elif action < 0.55:
+            request_id = rng.choice(list(expected))
+            census.rerouted(request_id, "nurse")
+            _, tier, created = expected[request_id]
+            expected[request_id] = ("nurse", tier, created)
+        else:
+            request_id = rng.choice(list(expected))
+            census.closed(request_id)
+            census.closed(request_id)  # duplicate Done
+            del expected[request_id]
+
+        steps += 1
+        snap = census.snapshot()
+        counts, breaches, buckets, oldest = recount(expected, clock.now, census)
+        got = {(role, tier): c for role, tiers in snap["open_by_role"].items() for tier, c in tiers.items() if c}
+        ok = (got == counts and snap["open"] == len(expected) and snap["sla_breaches"] == breaches
+              and [b["requests"] for b in snap["age_buckets"]] == buckets
+              and (oldest is None if snap["oldest_open"] is None
+                   else abs(snap["oldest_open"]["age_seconds"] - oldest) < 0.1))
+        mismatches += 0 if ok else 1
+
+    checks.append((f"snapshot matches a recount after each of {steps} steps", mismatches == 0))
+
+    text_lines = census.prometheus().splitlines()
+    snap = census.snapshot()
+    total_le_inf = next(line for line in text_lines if 'le="+Inf"' in line)
+    checks.append(("Prometheus +Inf bucket == open requests", total_le_inf.endswith(f" {snap['open']}")))
+    checks.append(("Prometheus breach gauges match",
+                   all(f'calllight_sla_breaches{{tier="{t}"}} {n}' in text_lines
+                       for t, n in snap["sla_breaches"].items())))
+    checks.append(("every Prometheus sample line has a value",
+                   all(line.startswith("#") or len(line.rsplit(" ", 1)) == 2 for line in text_lines)))
+
+    totals_before = snap["totals"]
+    created = datetime.fromtimestamp(clock.now - 900, tz=timezone.utc)
+    census.load([("a", "cna", "routine", "231", created), ("b", None, None, None, None)])
+    snap = census.snapshot()
+    checks.append(("load() replaces the open set", snap["open"] == 2 and snap["open_by_role"]["cna"]["routine"] == 1
+                   and snap["open_by_role"]["unknown"]["routine"] == 1))
+    checks.append(("load() keeps lifetime totals", snap["totals"] == totals_before))
+    checks.append(("loaded request past routine SLA is a breach", snap["sla_breaches"]["routine"] == 1))
+
+    failures = 0
+    print("\n=== Unit census tests ===")
+    for name, ok in checks:
+        print(f"[{'OK' if ok else 'FAIL'}]   {name}")
+        failures += 0 if ok else 1
+
+    print("\n" + "-" * 70)
+    print(f"{steps} steps, {sum(totals_before['opened'].values())} opened, "
+          f"{sum(totals_before['completed'].values())} completed")
+    if failures:
+        print(f"\n{failures} check(s) failed.")
+        raise SystemExit(1)
+    print("\n✅ ALL CENSUS CHECKS PASSED.")
+
+
+if __name__ == "__main__":
+    run_unit_census_tests()